@@ -0,0 +1,478 @@
+"""Statistiques de fréquentation à partir des journaux de requêtes JSONL.
+
+Chaque ligne des journaux (logs/requests.jsonl et ses rotations
+requests.jsonl.1, .2...) est un événement JSON :
+
+    {"ts": 1760000000, "event": "view", "id": 12}
+    {"ts": "2025-10-19T08:00:00Z", "event": "add_to_cart", "id": 12}
+    {"ts": 1760000000, "event": "search", "q": "écouteurs sans fil"}
+
+Les journaux sont lus en continu : la position déjà traitée de chaque
+fichier est gardée (par numéro d'inode, ce qui suit les renommages de la
+rotation) et seules les lignes complètes ajoutées depuis sont lues. Les gros
+fichiers sont lus par mmap, par tranches, sans être chargés en mémoire.
+
+La mémoire reste bornée quel que soit le volume :
+  - vues et ajouts au panier : compteurs exacts par produit du catalogue sur
+    une fenêtre glissante (tranches de 6 h sur 7 jours) ;
+  - recherches (texte libre, en nombre illimité) : une esquisse count-min par
+    jour sur 7 jours, plus une liste bornée des requêtes les plus fréquentes.
+
+Le classement de popularité (vues + 5 × ajouts au panier) est publié dans
+data/popularite.json ; le gestionnaire l'affiche et les pages catégorie du
+site trient les produits dans cet ordre.
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+from array import array
+from datetime import datetime
+
+from catalog_index import fold_text
+
+LOG_PATTERN = "logs/requests.jsonl*"
+STATE_FILE = ".cache/analytics_state.json"
+SKETCH_FILE = ".cache/analytics_queries.bin"
+PUBLISHED_FILE = "data/popularite.json"
+
+HOUR = 3600
+DAY = 24 * HOUR
+BUCKET_SECONDS = 6 * HOUR
+WINDOW_BUCKETS = 28
+SKETCH_WIDTH = 1 << 14
+SKETCH_DEPTH = 4
+SKETCH_BUCKETS = 7
+TOP_QUERIES = 50
+# requêtes candidates suivies pour le classement des recherches
+QUERY_CANDIDATES = 4 * TOP_QUERIES
+QUERY_MAX_CHARS = 80
+
+CART_WEIGHT = 5
+EVENTS = {
+    'view': 'view', 'product_view': 'view',
+    'add_to_cart': 'add_to_cart', 'cart': 'add_to_cart',
+    'search': 'search',
+}
+
+# au-delà, un journal est lu par mmap plutôt que chargé d'un bloc
+MMAP_THRESHOLD = 8 << 20
+CHUNK_SIZE = 8 << 20
+
+_SPACES = re.compile(r'\s+')
+
+
+def parse_ts(value):
+    """Date d'un événement (secondes epoch ou ISO 8601) -> entier, ou None."""
+    if isinstance(value, (int, float)):
+        # NaN, Infinity (acceptés par json.loads) : pas une date
+        return int(value) if math.isfinite(value) else None
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def normalize_query(text):
+    """Requête comparable : sans accents, minuscules, espaces réduits."""
+    return _SPACES.sub(' ', fold_text(text)).strip()[:QUERY_MAX_CHARS]
+
+
+class SlidingCounter:
+    """Compteurs par clé sur les `size` dernières tranches de `bucket_seconds`.
+
+    Les totaux sont tenus à jour à l'ajout ; une tranche qui sort de la
+    fenêtre est soustraite en une fois.
+    """
+
+    def __init__(self, bucket_seconds=BUCKET_SECONDS, size=WINDOW_BUCKETS):
+        self.bucket_seconds = bucket_seconds
+        self.size = size
+        # tranche -> {clé: nombre}
+        self.buckets = {}
+        self.totals = {}
+        self.newest = None
+
+    def add(self, key, ts, n=1):
+        """Compter un événement ; retourne False s'il est trop ancien pour la fenêtre."""
+        b = ts // self.bucket_seconds
+        if self.newest is None or b > self.newest:
+            self._advance(b)
+        elif b <= self.newest - self.size:
+            return False
+        bucket = self.buckets.get(b)
+        if bucket is None:
+            bucket = self.buckets[b] = {}
+        bucket[key] = bucket.get(key, 0) + n
+        self.totals[key] = self.totals.get(key, 0) + n
+        return True
+
+    def advance(self, ts):
+        """Faire glisser la fenêtre jusqu'à `ts` (sans événement)."""
+        b = ts // self.bucket_seconds
+        if self.newest is None or b > self.newest:
+            self._advance(b)
+
+    def _advance(self, b):
+        self.newest = b
+        totals = self.totals
+        for old in [k for k in self.buckets if k <= b - self.size]:
+            for key, n in self.buckets.pop(old).items():
+                left = totals[key] - n
+                if left:
+                    totals[key] = left
+                else:
+                    del totals[key]
+
+    def to_json(self):
+        return {"newest": self.newest,
+                "buckets": [[b, list(counts.items())] for b, counts in self.buckets.items()]}
+
+    def load_json(self, data):
+        self.buckets, self.totals = {}, {}
+        self.newest = data.get("newest")
+        for b, items in data.get("buckets", []):
+            bucket = self.buckets[b] = {}
+            for key, n in items:
+                bucket[key] = n
+                self.totals[key] = self.totals.get(key, 0) + n
+
+
+class WindowedSketch:
+    """Esquisse count-min par tranche (un jour), sur une fenêtre glissante.
+
+    Chaque tranche est un tableau de `depth` lignes de `width` compteurs ;
+    l'estimation d'une clé est la somme, sur les tranches de la fenêtre, du
+    minimum de ses compteurs (une surestimation, jamais une sous-estimation).
+    """
+
+    _HEADER = struct.Struct('<IIIq')
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, bucket_seconds=DAY,
+                 size=SKETCH_BUCKETS):
+        self.width = width
+        self.depth = depth
+        self.mask = width - 1
+        self.bucket_seconds = bucket_seconds
+        self.size = size
+        # tranche -> array('I') de depth * width compteurs
+        self.tables = {}
+        self.newest = None
+
+    def _positions(self, data):
+        mask, width = self.mask, self.width
+        return [row * width + (zlib.crc32(data, row + 1) & mask) for row in range(self.depth)]
+
+    def add(self, data, ts):
+        b = ts // self.bucket_seconds
+        if self.newest is None or b > self.newest:
+            self.advance(ts)
+        elif b <= self.newest - self.size:
+            return False
+        table = self.tables.get(b)
+        if table is None:
+            table = self.tables[b] = array('I', bytes(4 * self.width * self.depth))
+        for pos in self._positions(data):
+            table[pos] += 1
+        return True
+
+    def advance(self, ts):
+        b = ts // self.bucket_seconds
+        if self.newest is not None and b <= self.newest:
+            return
+        self.newest = b
+        for old in [k for k in self.tables if k <= b - self.size]:
+            del self.tables[old]
+
+    def estimate(self, data):
+        positions = self._positions(data)
+        return sum(min(table[pos] for pos in positions) for table in self.tables.values())
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(self._HEADER.pack(self.width, self.depth, len(self.tables),
+                                      -1 if self.newest is None else self.newest))
+            for b, table in self.tables.items():
+                f.write(struct.pack('<q', b))
+                f.write(table.tobytes())
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Recharger une esquisse enregistrée ; ignorée si absente ou d'un autre format."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        try:
+            width, depth, count, newest = self._HEADER.unpack_from(data)
+        except struct.error:
+            return
+        if (width, depth) != (self.width, self.depth) or \
+                len(data) != self._HEADER.size + count * (8 + 4 * width * depth):
+            return
+        self.newest = None if newest == -1 else newest
+        pos = self._HEADER.size
+        length = 4 * width * depth
+        for _ in range(count):
+            (b,) = struct.unpack_from('<q', data, pos)
+            table = array('I')
+            table.frombytes(data[pos + 8:pos + 8 + length])
+            self.tables[b] = table
+            pos += 8 + length
+
+
+def log_files(pattern=LOG_PATTERN):
+    """Journaux correspondant au motif, du plus ancien au plus récent (les .gz sont ignorés)."""
+    paths = [p for p in glob.glob(pattern) if not p.endswith('.gz') and os.path.isfile(p)]
+    return sorted(paths, key=lambda p: (os.path.getmtime(p), p))
+
+
+def read_chunks(path, offset=0, chunk_size=CHUNK_SIZE):
+    """Lire les lignes complètes d'un journal à partir de `offset`.
+
+    Produit des (octets, position après la dernière ligne complète) ; une
+    ligne en cours d'écriture est laissée pour la lecture suivante.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= offset:
+            return
+        if size - offset > MMAP_THRESHOLD:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            pos, base = offset, 0
+        else:
+            f.seek(offset)
+            buf = f.read()
+            size = len(buf)
+            # positions relatives au début de la lecture
+            pos, base = 0, offset
+        try:
+            while pos < size:
+                end = min(pos + chunk_size, size)
+                cut = buf.rfind(b'\n', pos, end)
+                if cut == -1:
+                    # ligne plus longue qu'une tranche
+                    cut = buf.find(b'\n', end)
+                    if cut == -1:
+                        return
+                yield buf[pos:cut + 1], base + cut + 1
+                pos = cut + 1
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+
+class Analytics:
+    """État des statistiques : compteurs, esquisse des recherches, positions des journaux."""
+
+    def __init__(self, state_file=STATE_FILE, sketch_file=SKETCH_FILE):
+        self.state_file = state_file
+        self.sketch_file = sketch_file
+        self.views = SlidingCounter()
+        self.carts = SlidingCounter()
+        self.searches = WindowedSketch()
+        # requête -> estimation, bornée à QUERY_CANDIDATES
+        self.candidates = {}
+        # "dev:inode" -> {"path", "offset"}
+        self.files = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.views.load_json(data["views"])
+            self.carts.load_json(data["carts"])
+            self.candidates = dict(data["candidates"])
+            self.files = data["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.files = {}
+            return
+        self.searches.load(self.sketch_file)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        tmp = self.state_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"views": self.views.to_json(), "carts": self.carts.to_json(),
+                       "candidates": list(self.candidates.items()), "files": self.files}, f)
+        os.replace(tmp, self.state_file)
+        self.searches.save(self.sketch_file)
+
+    def ingest(self, product_ids, pattern=LOG_PATTERN):
+        """Lire la suite des journaux ; retourne (lignes lues, lignes ignorées).
+
+        Seuls les ids de `product_ids` sont comptés : la mémoire des compteurs
+        reste bornée par la taille du catalogue.
+        """
+        known = set(product_ids)
+        seen = {}
+        lines = skipped = 0
+        for path in log_files(pattern):
+            st = os.stat(path)
+            key = f"{st.st_dev}:{st.st_ino}"
+            offset = self.files.get(key, {}).get("offset", 0)
+            if st.st_size < offset:
+                # fichier tronqué sur place (copytruncate) : reprise au début
+                offset = 0
+            for data, end in read_chunks(path, offset):
+                n, bad = self._consume(data, known)
+                lines += n
+                skipped += bad
+                offset = end
+            seen[key] = {"path": path, "offset": offset}
+        # les journaux supprimés par la rotation sont oubliés
+        self.files = seen
+        return lines, skipped
+
+    def _consume(self, data, known):
+        """Compter les événements d'un bloc de lignes ; retourne (lignes, ignorées)."""
+        loads = json.loads
+        events = EVENTS
+        add_view, add_cart = self.views.add, self.carts.add
+        lines = skipped = 0
+        for line in data.split(b'\n'):
+            if not line:
+                continue
+            lines += 1
+            try:
+                event = loads(line)
+                kind = events.get(event.get('event') or event.get('type'))
+            except (ValueError, AttributeError, TypeError):
+                # JSON invalide, ligne qui n'est pas un objet, type d'événement non hachable
+                skipped += 1
+                continue
+            ts = event.get('ts')
+            if type(ts) is not int:
+                ts = parse_ts(ts)
+                if ts is None:
+                    skipped += 1
+                    continue
+            if kind == 'view' or kind == 'add_to_cart':
+                pid = event.get('id', event.get('productId'))
+                if type(pid) is not int:
+                    try:
+                        pid = int(pid)
+                    except (TypeError, ValueError, OverflowError):
+                        skipped += 1
+                        continue
+                if pid not in known:
+                    skipped += 1
+                    continue
+                (add_view if kind == 'view' else add_cart)(pid, ts)
+            elif kind == 'search':
+                query = normalize_query(event.get('q') or event.get('query') or '')
+                if query:
+                    self._count_query(query, ts)
+            else:
+                skipped += 1
+        return lines, skipped
+
+    def _count_query(self, query, ts):
+        data = query.encode('utf-8')
+        if not self.searches.add(data, ts):
+            return
+        candidates = self.candidates
+        estimate = self.searches.estimate(data)
+        if query in candidates or len(candidates) < QUERY_CANDIDATES:
+            candidates[query] = estimate
+            return
+        weakest = min(candidates, key=candidates.get)
+        if estimate > candidates[weakest]:
+            del candidates[weakest]
+            candidates[query] = estimate
+
+    def ranking(self, now=None):
+        """[(id, vues, ajouts au panier, score)] par score décroissant."""
+        now = int(time.time() if now is None else now)
+        self.views.advance(now)
+        self.carts.advance(now)
+        views, carts = self.views.totals, self.carts.totals
+        rows = [(pid, views.get(pid, 0), carts.get(pid, 0),
+                 views.get(pid, 0) + CART_WEIGHT * carts.get(pid, 0))
+                for pid in views.keys() | carts.keys()]
+        rows.sort(key=lambda row: (-row[3], row[0]))
+        return rows
+
+    def top_queries(self, limit=TOP_QUERIES, now=None):
+        """[(requête, nombre estimé)] sur la fenêtre, les plus fréquentes d'abord."""
+        self.searches.advance(int(time.time() if now is None else now))
+        estimates = {q: self.searches.estimate(q.encode('utf-8')) for q in self.candidates}
+        self.candidates = {q: n for q, n in estimates.items() if n}
+        return sorted(self.candidates.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def publish(self, products, published_file=PUBLISHED_FILE, now=None):
+        """Écrire le classement pour le site et le gestionnaire ; retourne les données publiées."""
+        current = {p.get('id') for p in products}
+        ranking = [row for row in self.ranking(now) if row[0] in current]
+        data = {
+            "generated": int(time.time() if now is None else now),
+            "windowDays": BUCKET_SECONDS * WINDOW_BUCKETS // DAY,
+            "ranking": [row[0] for row in ranking],
+            "products": {str(pid): [views, carts] for pid, views, carts, _ in ranking},
+            "queries": self.top_queries(now=now),
+        }
+        os.makedirs(os.path.dirname(published_file) or ".", exist_ok=True)
+        tmp = published_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, published_file)
+        return data
+
+
+def load_popularity(published_file=PUBLISHED_FILE):
+    """Classement publié, ou un classement vide s'il n'existe pas encore."""
+    try:
+        with open(published_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"ranking": [], "products": {}, "queries": []}
+
+
+def refresh(products, pattern=LOG_PATTERN):
+    """Lire les nouvelles lignes des journaux puis publier ; retourne (données, lignes lues)."""
+    stats = Analytics()
+    lines, _ = stats.ingest([p.get('id') for p in products], pattern)
+    data = stats.publish(products)
+    stats.save()
+    return data, lines
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from catalog import Catalog, DEFAULT_JSON_FILE
+
+    parser = argparse.ArgumentParser(description="Popularité des produits à partir des journaux")
+    parser.add_argument("--file", default=DEFAULT_JSON_FILE)
+    parser.add_argument("--logs", default=LOG_PATTERN, help="motif des journaux JSONL")
+    parser.add_argument("--top", type=int, default=20, help="nombre de lignes affichées")
+    args = parser.parse_args()
+
+    catalog = Catalog(args.file)
+    catalog.load()
+    titles = {p.get('id'): p.get('title', '') for p in catalog.products}
+    stats = Analytics()
+    start = time.perf_counter()
+    lines, skipped = stats.ingest(titles, args.logs)
+    elapsed = time.perf_counter() - start
+    data = stats.publish(catalog.products)
+    stats.save()
+    rate = lines / elapsed * 60 if elapsed else 0
+    print(f"{lines} ligne(s) lue(s), {skipped} ignorée(s) en {elapsed:.2f}s "
+          f"({rate / 1e6:.1f} M lignes/min)")
+    for rank, pid in enumerate(data["ranking"][:args.top], 1):
+        views, carts = data["products"][str(pid)]
+        print(f"{rank:3}. [{pid}] {titles.get(pid, '')}  vues={views} paniers={carts}")
+    if data["queries"]:
+        print("Recherches :")
+        for query, count in data["queries"][:args.top]:
+            print(f"  {count:6}  {query}")
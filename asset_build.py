@@ -0,0 +1,794 @@
+"""Construction des fichiers du site à déployer dans dist/ (sans Node).
+
+Pour chaque page (index.html, admin.html et page/**.html, pages générées
+comprises) :
+
+  - les scripts locaux qui se suivent (scriptCommon.js puis le script de la
+    page) sont regroupés et minifiés en un seul fichier ;
+  - chaque feuille de style est minifiée ; les règles utilisées par le
+    balisage de la page (balises, ids et classes présents dans le HTML) sont
+    insérées dans un <style>, la feuille complète étant chargée sans bloquer
+    l'affichage (preload). Au-delà de CRITICAL_BUDGET, la feuille reste un
+    simple <link> : un <style> plus gros que la première réponse réseau
+    retarderait l'affichage au lieu de l'avancer ;
+  - les fichiers produits portent l'empreinte de leur contenu
+    (scripts/scriptCart.3f9a0c1b2d.js) : ils peuvent être mis en cache
+    indéfiniment, et les références du HTML sont réécrites.
+
+data/ (fichiers .json, .csv et .xml, hors data/boutiques/), img/ et les plans
+du site (sitemap*.xml) sont recopiés dans dist/ par lien physique quand c'est
+possible. dist/assets.json associe chaque source (ou groupe de sources) au
+fichier produit.
+
+Reconstruction incrémentale : l'empreinte SHA-1 de chaque entrée est gardée
+dans .cache/assets_state.json avec sa taille et sa date ; un fichier dont la
+taille et la date n'ont pas changé n'est pas relu, et une sortie n'est
+refaite que si l'empreinte de ses entrées a changé. Les sorties qui ne sont
+plus produites sont supprimées de dist/.
+
+Usage : python asset_build.py [--force] [--dist DOSSIER]
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+from html.parser import HTMLParser
+
+DIST_DIR = "dist"
+STATE_FILE = ".cache/assets_state.json"
+MANIFEST_FILE = "assets.json"
+# à changer quand la minification ou la réécriture change : tout est refait
+BUILD_VERSION = 2
+HASH_LENGTH = 10
+# environ la première réponse réseau (10 segments TCP)
+CRITICAL_BUDGET = 14 * 1024
+PAGE_DIRS = ("page",)
+ROOT_PAGES = ("index.html", "admin.html")
+# recopiés tels quels : (dossier, extensions ou None pour tout, sous-dossiers exclus)
+COPY_TREES = (("data", (".json", ".csv", ".xml"), ("boutiques",)), ("img", None, ()))
+# plans du site (site_feeds.py), recopiés tels quels à la racine de dist/
+COPY_ROOT_FILES = ("sitemap.xml", "sitemap-*.xml")
+
+
+# --- minification JavaScript ---
+
+_PUNCTUATORS = sorted("""
+>>>= ... === !== **= <<= >>= >>> &&= ||= ??= => == != <= >= && || ?? ?. ++ -- += -= *= /= %=
+&= |= ^= ** << >> { } ( ) [ ] ; , < > + - * / % & | ^ ! ~ ? : = . @ #
+""".split(), key=len, reverse=True)
+_NUMBER = re.compile(r"0[xXbBoO][0-9a-fA-F_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d[\d_]*)?n?")
+_IDENT = re.compile(r"[A-Za-z_$\\\u0080-\uffff][\w$\\\u0080-\uffff]*")
+# après ces mots, « / » commence une expression régulière et non une division
+_EXPR_KEYWORDS = frozenset("return typeof instanceof in of new delete void throw case do else "
+                           "yield await".split())
+# un saut de ligne après ces mots termine l'instruction
+_RESTRICTED = frozenset("return break continue throw yield async".split())
+# saut de ligne nécessaire avant ces signes (l'instruction précédente se termine)
+_STATEMENT_START = frozenset(("{", "++", "--", "!", "~", "...", "#", "@"))
+_LINE_BREAKS = "\n\r\u2028\u2029"
+
+
+class JSSyntaxError(ValueError):
+    pass
+
+
+class _Token:
+    __slots__ = ("kind", "text", "space", "newline")
+
+    def __init__(self, kind, text, space, newline):
+        self.kind = kind          # 'word', 'punct', 'string', 'template', 'regex'
+        self.text = text
+        self.space = space        # espace ou commentaire avant le jeton
+        self.newline = newline    # saut de ligne avant le jeton
+
+
+def _regex_allowed(prev):
+    if prev is None:
+        return True
+    if prev.kind == 'word':
+        return prev.text in _EXPR_KEYWORDS
+    if prev.kind == 'punct':
+        return prev.text not in (")", "]", "}", "++", "--")
+    return False
+
+
+def _skip_string(src, i):
+    quote = src[i]
+    i += 1
+    while i < len(src):
+        c = src[i]
+        if c == "\\":
+            i += 2
+        elif c == quote:
+            return i + 1
+        elif c in "\n\r":
+            break
+        else:
+            i += 1
+    raise JSSyntaxError(f"Chaîne non terminée à la position {i}")
+
+
+def _skip_regex(src, i):
+    i += 1
+    in_class = False
+    while i < len(src):
+        c = src[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c in "\n\r":
+            break
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            i += 1
+            while i < len(src) and (src[i].isalnum() or src[i] in "_$"):
+                i += 1
+            return i
+        i += 1
+    raise JSSyntaxError(f"Expression régulière non terminée à la position {i}")
+
+
+def _skip_template(src, i):
+    i += 1
+    while i < len(src):
+        c = src[i]
+        if c == "\\":
+            i += 2
+        elif c == "`":
+            return i + 1
+        elif c == "$" and src.startswith("${", i):
+            # expression insérée : lue comme du code jusqu'à l'accolade fermante
+            _, i = _tokenize(src, i + 2, nested=True)
+            i += 1
+        else:
+            i += 1
+    raise JSSyntaxError("Gabarit (`) non terminé")
+
+
+def _tokenize(src, i=0, nested=False):
+    """Jetons de `src` à partir de `i` ; avec `nested`, s'arrête sur l'accolade
+    fermante non appariée (fin d'une expression ${...}). Retourne (jetons, position)."""
+    tokens = []
+    depth = 0
+    space = newline = False
+    prev = None
+    n = len(src)
+    while i < n:
+        c = src[i]
+        if c in " \t\f\v\ufeff\xa0" or c in _LINE_BREAKS:
+            space = True
+            newline = newline or c in _LINE_BREAKS
+            i += 1
+            continue
+        if src.startswith("//", i):
+            while i < n and src[i] not in _LINE_BREAKS:
+                i += 1
+            space = True
+            continue
+        if src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            if end < 0:
+                raise JSSyntaxError("Commentaire non terminé")
+            comment = src[i:end]
+            space = True
+            newline = newline or any(b in comment for b in _LINE_BREAKS)
+            i = end + 2
+            continue
+        start = i
+        if c in "'\"":
+            kind, i = 'string', _skip_string(src, i)
+        elif c == "`":
+            kind, i = 'template', _skip_template(src, i)
+        elif c == "/" and _regex_allowed(prev):
+            kind, i = 'regex', _skip_regex(src, i)
+        elif c.isdigit() or (c == "." and i + 1 < n and src[i + 1].isdigit()):
+            kind, i = 'word', _NUMBER.match(src, i).end()
+        else:
+            m = _IDENT.match(src, i)
+            if m:
+                kind, i = 'word', m.end()
+            else:
+                for p in _PUNCTUATORS:
+                    if src.startswith(p, i):
+                        break
+                else:
+                    raise JSSyntaxError(f"Caractère inattendu {c!r} à la position {i}")
+                if p == "?." and i + 2 < n and src[i + 2].isdigit():
+                    p = "?"
+                if nested:
+                    if p == "{":
+                        depth += 1
+                    elif p == "}":
+                        if depth == 0:
+                            return tokens, i
+                        depth -= 1
+                kind, i = 'punct', i + len(p)
+        prev = _Token(kind, src[start:i], space, newline)
+        tokens.append(prev)
+        space = newline = False
+    if nested:
+        raise JSSyntaxError("Expression ${...} non terminée")
+    return tokens, i
+
+
+def _word_char(c):
+    return c.isalnum() or c in "_$\\" or c > "\x7f"
+
+
+def _needs_newline(prev, tok):
+    """Le saut de ligne d'origine change-t-il le sens (insertion automatique de « ; ») ?"""
+    if prev.kind == 'word' and prev.text in _RESTRICTED:
+        return True
+    if prev.kind == 'punct' and prev.text not in (")", "]", "}", "++", "--"):
+        return False
+    if tok.kind == 'template' or (tok.kind == 'punct' and tok.text not in _STATEMENT_START):
+        return False
+    return True
+
+
+def _needs_space(prev, tok):
+    a, b = prev.text[-1], tok.text[0]
+    if _word_char(a) and _word_char(b):
+        return True
+    if a in "+-" and b == a:
+        return True
+    if a == "/" and b in "/*":
+        return True
+    # 1 .toString() : le point ferait partie du nombre
+    return prev.kind == 'word' and prev.text[0].isdigit() and b == "."
+
+
+# directive « use strict » en tête d'un script minifié
+_USE_STRICT = re.compile(r"""(["'])use strict\1(?:;\n?|\n|$)""")
+
+
+def bundle_js(sources):
+    """Concaténer des scripts minifiés en gardant à chacun son mode.
+
+    Une directive « use strict » en tête du premier script s'appliquerait à tout le
+    groupe : elle est retirée de chaque script et remise une seule fois en tête si
+    tous les scripts l'avaient. Les scripts ne sont pas enveloppés dans une fonction :
+    leurs déclarations restent globales, comme chargés séparément.
+    """
+    if len(sources) == 1:
+        return sources[0]
+    bodies = []
+    strict = True
+    for src in sources:
+        match = _USE_STRICT.match(src)
+        strict = strict and match is not None
+        bodies.append(src[match.end():] if match else src)
+    content = ";\n".join(bodies)
+    return '"use strict";\n' + content if strict else content
+
+
+def minify_js(src):
+    """Retirer commentaires et espaces superflus, sans renommer ni réordonner."""
+    tokens, _ = _tokenize(src)
+    out = []
+    prev = None
+    for tok in tokens:
+        if prev is not None:
+            if tok.newline and _needs_newline(prev, tok):
+                out.append("\n")
+            elif tok.space and _needs_space(prev, tok):
+                out.append(" ")
+        out.append(tok.text)
+        prev = tok
+    return "".join(out)
+
+
+# --- CSS ---
+
+_CSS_TOKEN = re.compile(r"""("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')|(/\*.*?\*/)""", re.S)
+
+
+def minify_css(src):
+    """Retirer commentaires et espaces superflus (chaînes conservées telles quelles)."""
+    out = []
+    pos = 0
+
+    def code(text):
+        text = re.sub(r"\s+", " ", text)
+        text = re.sub(r" ?([{};,>]) ?", r"\1", text)
+        return re.sub(r": ", ":", text)
+
+    for m in _CSS_TOKEN.finditer(src):
+        out.append(code(src[pos:m.start()]))
+        out.append(m.group(1) if m.group(1) else " ")
+        pos = m.end()
+    out.append(code(src[pos:]))
+    text = "".join(out)
+    # seconde passe pour les espaces laissés par les commentaires retirés
+    parts = _CSS_TOKEN.split(text)
+    text = "".join(p if p and p[0] in "'\"" else code(p) for p in parts if p is not None)
+    return text.replace(";}", "}").strip()
+
+
+def _css_blocks(css, i=0):
+    """Découper du CSS minifié en [(prélude, corps ou liste de blocs imbriqués)]."""
+    blocks = []
+    n = len(css)
+    while i < n:
+        if css[i] == "}":
+            return blocks, i + 1
+        start = i
+        while i < n and css[i] not in "{;}":
+            if css[i] in "'\"":
+                i = _CSS_TOKEN.match(css, i).end()
+            else:
+                i += 1
+        prelude = css[start:i]
+        if i >= n or css[i] != "{":
+            # @import, @charset... (sans bloc)
+            if prelude:
+                blocks.append((prelude, None))
+            i += 1 if i < n and css[i] == ";" else 0
+            continue
+        if prelude.startswith("@") and prelude.split("(")[0].split(" ")[0] in ("@media", "@supports",
+                                                                              "@layer", "@container"):
+            children, i = _css_blocks(css, i + 1)
+            blocks.append((prelude, children))
+            continue
+        depth = 0
+        body_start = i + 1
+        while i < n:
+            c = css[i]
+            if c in "'\"":
+                i = _CSS_TOKEN.match(css, i).end()
+                continue
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            i += 1
+        blocks.append((prelude, css[body_start:i]))
+        i += 1
+    return blocks, i
+
+
+_PSEUDO = re.compile(r"::?[-\w]+(?:\((?:[^()]|\([^()]*\))*\))?")
+_SIMPLE = re.compile(r"([#.]?)(-?[_a-zA-Z\u00a0-\uffff][-\w\u00a0-\uffff]*|\*)")
+
+
+def _split_selectors(prelude):
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(prelude):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    parts.append(prelude[start:])
+    return parts
+
+
+def selector_used(selector, used):
+    """Le sélecteur peut-il s'appliquer au balisage ? (pseudo-classes et attributs ignorés)"""
+    text = _PSEUDO.sub("", re.sub(r"\[[^\]]*\]", "", selector))
+    tags, ids, classes = used
+    for compound in re.split(r"[\s>+~]+", text.strip()):
+        for prefix, name in _SIMPLE.findall(compound):
+            if prefix == "#":
+                if name not in ids:
+                    return False
+            elif prefix == ".":
+                if name not in classes:
+                    return False
+            elif name != "*" and name.lower() not in tags:
+                return False
+    return True
+
+
+def critical_css(css, used):
+    """Règles de `css` (minifié) qui s'appliquent au balisage décrit par `used`."""
+    blocks, _ = _css_blocks(css)
+    kept_keyframes = set()
+
+    def select(blocks):
+        out = []
+        for prelude, body in blocks:
+            if isinstance(body, list):
+                inner = select(body)
+                if inner:
+                    out.append(f"{prelude}{{{inner}}}")
+            elif body is None:
+                out.append(prelude + ";")
+            elif prelude.startswith("@keyframes") or prelude.startswith("@-webkit-keyframes"):
+                out.append((prelude.split(" ", 1)[-1], f"{prelude}{{{body}}}"))
+            elif prelude.startswith("@"):
+                out.append(f"{prelude}{{{body}}}")
+            elif any(selector_used(s, used) for s in _split_selectors(prelude)):
+                out.append(f"{prelude}{{{body}}}")
+                kept_keyframes.update(re.findall(r"animation(?:-name)?:([-\w]+)", body))
+                kept_keyframes.update(re.findall(r"animation:[^;]*?\b([-a-zA-Z_][-\w]*)\b", body))
+        return "".join(item if isinstance(item, str) else
+                       (item[1] if item[0] in kept_keyframes else "") for item in out)
+
+    return select(blocks)
+
+
+def rebase_css_urls(css, css_dir, page_dir):
+    """Réécrire les url() relatives d'une feuille de `css_dir` pour un <style> de `page_dir`."""
+    def repl(m):
+        quote, url = m.group(1), m.group(2)
+        if not is_local_url(url) or url.startswith("/"):
+            return m.group(0)
+        target = posixpath.normpath(posixpath.join(css_dir, url))
+        return f"url({quote}{posixpath.relpath(target, page_dir or '.')}{quote})"
+    return re.sub(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""", repl, css)
+
+
+# --- pages ---
+
+class _MarkupScanner(HTMLParser):
+    """Balises, ids et classes du HTML, et <base href>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tags = {"html", "body"}
+        self.ids = set()
+        self.classes = set()
+        self.base = None
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        for name, value in attrs:
+            if name == "id" and value:
+                self.ids.add(value)
+            elif name == "class" and value:
+                self.classes.update(value.split())
+            elif tag == "base" and name == "href" and self.base is None:
+                self.base = value
+
+
+_ATTR = re.compile(r"""([\w:-]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?""")
+_LINK = re.compile(r"<link\b[^>]*>", re.I)
+_SCRIPTS = re.compile(r"(?:<script\b[^>]*\bsrc\s*=[^>]*>\s*</script>\s*)+", re.I)
+_ONE_SCRIPT = re.compile(r"<script\b([^>]*)>\s*</script>", re.I)
+
+
+def tag_attrs(tag):
+    """Attributs d'une balise HTML ouvrante : {nom en minuscules : valeur}."""
+    inner = re.sub(r"^<\w+|/?>$", "", tag)
+    return {name.lower(): (value or "").strip("'\"") for name, value in _ATTR.findall(inner)}
+
+
+def is_local_url(url):
+    """Vrai pour une référence relative au site (ni schéma, ni //, ni ancre)."""
+    return bool(url) and not re.match(r"^(?:[a-z][a-z0-9+.-]*:|//|#)", url, re.I)
+
+
+def _page_base(page, base_href):
+    page_dir = posixpath.dirname(page)
+    if base_href and is_local_url(base_href):
+        return posixpath.normpath(posixpath.join(page_dir, base_href))
+    return page_dir
+
+
+def resolve_url(base_dir, url):
+    """Chemin (relatif à la racine du site) d'une référence locale ; None s'il en sort."""
+    path = posixpath.normpath(posixpath.join(base_dir, url.split("?")[0].split("#")[0]))
+    return None if path.startswith("..") else path
+
+
+def _fingerprinted(path, content):
+    stem, ext = posixpath.splitext(path)
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    return f"{stem}.{digest}{ext}"
+
+
+def scan_page(page, html, exists):
+    """Références locales de la page : ([groupes de scripts], [feuilles de style])."""
+    base_dir = page_base_dir(page, html)
+    groups = []
+    for m in _SCRIPTS.finditer(html):
+        group = []
+        for tag in _ONE_SCRIPT.finditer(m.group(0)):
+            attrs = tag_attrs(f"<script {tag.group(1)}>")
+            path = resolve_url(base_dir, attrs.get("src", "")) if is_local_url(attrs.get("src")) else None
+            if path is None or not exists(path) or attrs.get("type", "").lower() == "module":
+                group = None
+                break
+            group.append(path)
+        if group:
+            groups.append(group)
+    styles = []
+    for m in _LINK.finditer(html):
+        attrs = tag_attrs(m.group(0))
+        if attrs.get("rel", "").lower() == "stylesheet" and is_local_url(attrs.get("href")):
+            path = resolve_url(base_dir, attrs["href"])
+            if path and exists(path):
+                styles.append(path)
+    return groups, styles
+
+
+def _base_href(html):
+    m = re.search(r"<base\b[^>]*>", html, re.I)
+    return tag_attrs(m.group(0)).get("href") if m else None
+
+
+def page_base_dir(page, html):
+    """Dossier (relatif à la racine du site) contre lequel se résolvent les références de la page."""
+    return _page_base(page, _base_href(html))
+
+
+def rewrite_page(page, html, outputs, critical):
+    """HTML de la page avec les références vers les fichiers produits.
+
+    outputs : {source ou groupe de sources (tuple) : fichier produit}
+    critical : {feuille de style : règles à insérer dans la page (ou None)}
+    """
+    base_dir = page_base_dir(page, html)
+
+    def rel(path):
+        return posixpath.relpath(path, base_dir or ".")
+
+    def scripts(m):
+        tags = list(_ONE_SCRIPT.finditer(m.group(0)))
+        group = tuple(resolve_url(base_dir, tag_attrs(f"<script {t.group(1)}>")["src"]) for t in tags)
+        out = outputs.get(group)
+        if out is None:
+            return m.group(0)
+        trailing = m.group(0)[len(m.group(0).rstrip()):]
+        attrs = tag_attrs(f"<script {tags[-1].group(1)}>")
+        extra = "".join(f' {k}' if v == "" else f' {k}="{v}"' for k, v in attrs.items()
+                        if k not in ("src",))
+        return f'<script src="{rel(out)}"{extra}></script>{trailing}'
+
+    def link(m):
+        attrs = tag_attrs(m.group(0))
+        if attrs.get("rel", "").lower() != "stylesheet" or not is_local_url(attrs.get("href")):
+            return m.group(0)
+        path = resolve_url(base_dir, attrs["href"])
+        out = outputs.get(path)
+        if out is None:
+            return m.group(0)
+        href = rel(out)
+        rules = critical.get(path)
+        if rules is None:
+            return m.group(0).replace(attrs["href"], href, 1)
+        return (f"<style>{rules}</style>"
+                f'<link rel="preload" href="{href}" as="style" '
+                f"onload=\"this.onload=null;this.rel='stylesheet'\">"
+                f'<noscript><link rel="stylesheet" href="{href}"></noscript>')
+
+    html = _SCRIPTS.sub(scripts, html)
+    return _LINK.sub(link, html)
+
+
+# --- construction ---
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class AssetBuilder:
+    def __init__(self, root=".", dist=DIST_DIR, force=False):
+        self.root = root
+        self.dist = os.path.join(root, dist) if not os.path.isabs(dist) else dist
+        self.state_file = os.path.join(root, STATE_FILE)
+        state = {}
+        if not force:
+            try:
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            if state.get("version") != BUILD_VERSION:
+                state = {}
+        self.inputs = state.get("inputs", {})
+        self.assets = state.get("assets", {})
+        self.pages = state.get("pages", {})
+        self.old_outputs = set(state.get("outputs", []))
+        self.outputs = set()
+        self.stats = {"assets": 0, "pages": 0, "copied": 0, "removed": 0, "skipped": 0}
+        self._texts = {}
+        self._critical = {}
+
+    def path(self, rel):
+        return os.path.join(self.root, *rel.split("/"))
+
+    def exists(self, rel):
+        return os.path.isfile(self.path(rel))
+
+    def digest(self, rel):
+        """SHA-1 d'une entrée, relu seulement si sa taille ou sa date a changé."""
+        stamp = _stamp(self.path(rel))
+        known = self.inputs.get(rel)
+        if known and known[:2] == stamp:
+            return known[2]
+        with open(self.path(rel), "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self.inputs[rel] = stamp + [digest]
+        return digest
+
+    def text(self, rel):
+        if rel not in self._texts:
+            with open(self.path(rel), "r", encoding="utf-8") as f:
+                self._texts[rel] = f.read()
+        return self._texts[rel]
+
+    def _write(self, rel, data):
+        target = os.path.join(self.dist, *rel.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def _dist_exists(self, rel):
+        return os.path.isfile(os.path.join(self.dist, *rel.split("/")))
+
+    def asset(self, sources):
+        """Fichier produit pour une source ou un groupe de scripts (minifiés, empreinte)."""
+        sources = tuple(sources)
+        key = "+".join(sources) + ":" + ",".join(self.digest(s) for s in sources)
+        out = self.assets.get(key)
+        if out is None or not self._dist_exists(out):
+            if sources[0].endswith(".css"):
+                content = minify_css(self.text(sources[0]))
+            else:
+                content = bundle_js([minify_js(self.text(s)) for s in sources])
+            out = _fingerprinted(sources[-1], content)
+            self._write(out, content)
+            self._texts[out] = content
+            self.stats["assets"] += 1
+        self.assets[key] = out
+        self.outputs.add(out)
+        return out
+
+    def minified(self, out):
+        if out not in self._texts:
+            with open(os.path.join(self.dist, *out.split("/")), "r", encoding="utf-8") as f:
+                self._texts[out] = f.read()
+        return self._texts[out]
+
+    def page(self, rel):
+        digest = self.digest(rel)
+        info = self.pages.get(rel)
+        if info is None or info["sha"] != digest:
+            groups, styles = scan_page(rel, self.text(rel), self.exists)
+            info = {"sha": digest, "scripts": groups, "styles": styles}
+        outputs = {tuple(g): self.asset(g) for g in info["scripts"]}
+        outputs.update((s, self.asset([s])) for s in info["styles"])
+        key = hashlib.sha1(json.dumps([digest, sorted(outputs.values())]).encode()).hexdigest()
+        self.outputs.add(rel)
+        if info.get("key") == key and self._dist_exists(rel):
+            self.pages[rel] = info
+            self.stats["skipped"] += 1
+            return
+        html = self.text(rel)
+        scanner = _MarkupScanner()
+        scanner.feed(html)
+        used = (scanner.tags, scanner.ids, scanner.classes)
+        base_dir = _page_base(rel, scanner.base)
+        critical = {}
+        for style in info["styles"]:
+            out = outputs[style]
+            cache_key = (out, frozenset(scanner.tags), frozenset(scanner.ids),
+                         frozenset(scanner.classes), base_dir)
+            rules = self._critical.get(cache_key, "")
+            if rules == "":
+                rules = critical_css(self.minified(out), used)
+                rules = rebase_css_urls(rules, posixpath.dirname(style), base_dir)
+                if len(rules.encode("utf-8")) > CRITICAL_BUDGET or "</" in rules:
+                    rules = None
+                self._critical[cache_key] = rules
+            critical[style] = rules
+        self._write(rel, rewrite_page(rel, html, outputs, critical))
+        self.pages[rel] = {**info, "key": key}
+        self.stats["pages"] += 1
+
+    def copy_tree(self, top, extensions, excluded):
+        base = self.path(top)
+        for dirpath, dirnames, filenames in os.walk(base):
+            if dirpath == base:
+                dirnames[:] = [d for d in dirnames if d not in excluded]
+            for name in filenames:
+                if extensions and not name.endswith(extensions):
+                    continue
+                src = os.path.join(dirpath, name)
+                self.copy_file(posixpath.join(top, os.path.relpath(src, base).replace(os.sep, "/")))
+
+    def copy_file(self, rel):
+        src = self.path(rel)
+        dest = os.path.join(self.dist, *rel.split("/"))
+        self.outputs.add(rel)
+        try:
+            if os.path.samefile(src, dest):
+                return
+            if _stamp(dest) == _stamp(src):
+                return
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = dest + ".tmp"
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dest)
+        self.stats["copied"] += 1
+
+    def page_list(self):
+        pages = [p for p in ROOT_PAGES if self.exists(p)]
+        for top in PAGE_DIRS:
+            for dirpath, _, filenames in os.walk(self.path(top)):
+                rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+                pages += sorted(posixpath.join(rel_dir, f) for f in filenames if f.endswith(".html"))
+        return pages
+
+    def build(self):
+        pages = self.page_list()
+        for page in pages:
+            self.page(page)
+        # feuilles et scripts qu'aucune page ne référence (chargés par d'autres moyens)
+        referenced = {source for info in self.pages.values()
+                      for source in [*info["styles"], *(s for g in info["scripts"] for s in g)]}
+        for top in ("scripts", "styles"):
+            for name in sorted(os.listdir(self.path(top))) if os.path.isdir(self.path(top)) else []:
+                if name.endswith((".js", ".css")) and f"{top}/{name}" not in referenced:
+                    self.asset([f"{top}/{name}"])
+        for top, extensions, excluded in COPY_TREES:
+            if os.path.isdir(self.path(top)):
+                self.copy_tree(top, extensions, excluded)
+        for name in sorted(os.listdir(self.root)):
+            if any(fnmatch.fnmatchcase(name, pattern) for pattern in COPY_ROOT_FILES) and self.exists(name):
+                self.copy_file(name)
+
+        manifest = {"assets": {key.split(":")[0]: out for key, out in sorted(self.assets.items())
+                               if out in self.outputs},
+                    "pages": pages}
+        manifest_json = json.dumps(manifest, ensure_ascii=False, indent=2)
+        if not self._dist_exists(MANIFEST_FILE) or self.minified(MANIFEST_FILE) != manifest_json:
+            self._write(MANIFEST_FILE, manifest_json)
+        self.outputs.add(MANIFEST_FILE)
+
+        for rel in self.old_outputs - self.outputs:
+            try:
+                os.remove(os.path.join(self.dist, *rel.split("/")))
+                self.stats["removed"] += 1
+            except OSError:
+                pass
+        self.pages = {p: info for p, info in self.pages.items() if p in self.outputs}
+        self.assets = {k: out for k, out in self.assets.items() if out in self.outputs}
+        self.inputs = {p: v for p, v in self.inputs.items() if os.path.exists(self.path(p))}
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": BUILD_VERSION, "inputs": self.inputs, "assets": self.assets,
+                       "pages": self.pages, "outputs": sorted(self.outputs)}, f)
+        os.replace(tmp, self.state_file)
+        return self.stats
+
+
+def build_assets(root=".", dist=DIST_DIR, force=False):
+    """Construire (ou mettre à jour) dist/ ; retourne le nombre de fichiers refaits par type."""
+    return AssetBuilder(root, dist, force).build()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Minifier, regrouper et marquer les fichiers du site")
+    parser.add_argument("--dist", default=DIST_DIR)
+    parser.add_argument("--force", action="store_true", help="tout reconstruire")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    stats = build_assets(dist=args.dist, force=args.force)
+    print(f"{stats['pages']} page(s) et {stats['assets']} fichier(s) refaits, "
+          f"{stats['skipped']} page(s) inchangée(s), {stats['copied']} copie(s), "
+          f"{stats['removed']} suppression(s) en {time.perf_counter() - t0:.2f}s")
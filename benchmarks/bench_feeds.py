@@ -0,0 +1,74 @@
+"""Plan du site et flux produits : publication complète face à la mise à jour incrémentale.
+
+Sur un catalogue synthétique (dossier temporaire), mesure :
+  - la première publication (tous les plans et toutes les lignes des flux) ;
+  - une publication sans changement ;
+  - une publication après la modification, l'ajout et le retrait de quelques
+    produits, en vérifiant qu'elle donne les mêmes fichiers qu'une
+    publication complète.
+
+Usage : python benchmarks/bench_feeds.py [taille] [produits modifiés]
+"""
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_startup import make_catalog  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from site_feeds import FEED_CSV, FEED_XML, publish_feeds  # noqa: E402
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - t0) * 1000, result
+
+
+def published(root):
+    names = [n for n in os.listdir(root) if n.startswith("sitemap")]
+    return sorted(names) + [FEED_CSV, FEED_XML]
+
+
+def main(size, edits):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "produits.json")
+        make_catalog(source, size)
+        products = Catalog(source).load()
+        site = os.path.join(tmp, "site")
+        os.makedirs(site)
+
+        full, report = timed(lambda: publish_feeds(products, root=site, images={}))
+        noop, _ = timed(lambda: publish_feeds(products, [], root=site, images={}))
+
+        step = max(1, size // edits)
+        changed = []
+        for i in range(0, size - 1, step):
+            products[i] = dict(products[i], price=(products[i].get("price") or 0) + 1)
+            changed.append(products[i]["id"])
+        changed.append(products.pop()["id"])
+        products.append(dict(products[0], id=10 * size, slug="produit-ajoute"))
+        changed.append(10 * size)
+        incremental, inc_report = timed(lambda: publish_feeds(products, changed, root=site, images={}))
+
+        reference = os.path.join(tmp, "reference")
+        shutil.copytree(site, reference)
+        publish_feeds(products, root=reference, images={}, force=True)
+        assert published(site) == published(reference)
+        assert all(filecmp.cmp(os.path.join(site, n), os.path.join(reference, n), shallow=False)
+                   for n in published(site))
+
+        print(f"{size} produits, {report['sitemaps']} plan(s) du site")
+        print(f"  complète        : {full:.0f} ms")
+        print(f"  sans changement : {noop:.0f} ms")
+        print(f"  {len(changed)} produit(s) modifié(s) : {incremental:.0f} ms, "
+              f"{inc_report['sitemaps']} plan(s) réécrit(s), {inc_report['rows']} ligne(s) mise(s) en forme")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 50000, args[1] if len(args) > 1 else 20)
@@ -0,0 +1,150 @@
+"""Charge du service de commande avec le prestataire simulé.
+
+Deux mesures, sur un catalogue synthétique dans un dossier temporaire :
+  - en mémoire : N commandes créées d'un coup (création seule, puis délai
+    jusqu'à ce que toutes soient payées ou refusées) ;
+  - par HTTP : C connexions persistantes qui envoient chacune leurs
+    commandes à la suite, la moitié des requêtes étant rejouées avec la même
+    clé d'idempotence.
+
+Vérifie au passage que le stock retiré correspond exactement aux commandes
+payées et qu'aucune commande n'a été débitée deux fois.
+
+Usage : python benchmarks/bench_orders.py [commandes] [connexions]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_startup import make_catalog  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from order_service import (  # noqa: E402
+    FakeProvider, HttpFrontend, OrderService, OrderError, FAILED, PAID, FINAL, RECONCILE,
+)
+
+CATALOG_SIZE = 1000
+
+
+def random_cart(rng):
+    return [{"productId": rng.randrange(1, CATALOG_SIZE + 1), "qty": rng.randint(1, 3)}
+            for _ in range(rng.randint(1, 4))]
+
+
+def check(service, provider, stock_before):
+    sold = {}
+    for order in service.orders.values():
+        if order.status == PAID:
+            for pid, qty, _ in order.lines:
+                sold[pid] = sold.get(pid, 0) + qty
+    for pid, before in stock_before.items():
+        after = int(service.catalog.get(pid).get('stock') or 0)
+        assert before - after == sold.get(pid, 0), f"stock incohérent pour {pid}"
+    paid = sum(order.status == PAID for order in service.orders.values())
+    charged = {order.transaction for order in service.orders.values() if order.status == PAID}
+    assert len(charged) == paid, "transaction partagée entre deux commandes"
+    assert set(provider.transactions.values()) >= charged
+    failed = {order.id for order in service.orders.values() if order.status == FAILED}
+    assert not failed & provider.transactions.keys(), "commande débitée marquée refusée"
+    held = {order.id for order in service.orders.values() if order.status == RECONCILE}
+    assert service.ledger.holds.keys() == held, "réservations non libérées"
+    return paid
+
+
+async def bench_memory(tmp, count):
+    catalog = Catalog(os.path.join(tmp, "produits.json"))
+    catalog.load()
+    stock_before = {p['id']: p['stock'] for p in catalog.products}
+    provider = FakeProvider(latency=(0.01, 0.05), seed=1)
+    service = OrderService(catalog, provider, journal_file=os.path.join(tmp, "journal.jsonl"),
+                           queue_size=count, workers=64, backoff_base=0.01, save_catalog=False)
+    await service.start()
+    rng = random.Random(2)
+    rejected = 0
+    t0 = time.perf_counter()
+    for i in range(count):
+        try:
+            service.create_order(f"k{i}", random_cart(rng), "24177000000", "moov")
+        except OrderError:
+            rejected += 1
+    created = time.perf_counter() - t0
+    await service.queue.join()
+    done = time.perf_counter() - t0
+    await service.stop()
+    paid = check(service, provider, stock_before)
+    print(f"en mémoire : {count} commandes, création {count / created:,.0f}/s, "
+          f"toutes terminées en {done:.2f}s ; {paid} payées, {rejected} refusées à la création, "
+          f"{len(service.to_reconcile())} à rapprocher, {provider.calls} appels au prestataire")
+
+
+async def _client(port, orders, rng, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for i in orders:
+            body = json.dumps({"items": random_cart(rng), "phone": "24106000000",
+                               "operator": "airtel"}).encode()
+            for _ in range(2):  # envoi puis rejeu avec la même clé
+                t0 = time.perf_counter()
+                writer.write(f"POST /orders HTTP/1.1\r\nHost: localhost\r\nIdempotency-Key: h{i}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                             .encode() + body)
+                await writer.drain()
+                await reader.readline()
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line == b'\r\n':
+                        break
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':')[1])
+                await reader.readexactly(length)
+                latencies.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+
+async def bench_http(tmp, count, connections):
+    catalog = Catalog(os.path.join(tmp, "produits.json"))
+    catalog.load()
+    stock_before = {p['id']: p['stock'] for p in catalog.products}
+    provider = FakeProvider(latency=(0.01, 0.05), seed=3)
+    service = OrderService(catalog, provider, journal_file=os.path.join(tmp, "journal_http.jsonl"),
+                           queue_size=count, workers=64, backoff_base=0.01, save_catalog=False)
+    await service.start()
+    server = await asyncio.start_server(HttpFrontend(service).handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    latencies = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(port, range(c, count, connections), random.Random(c), latencies)
+                           for c in range(connections)))
+    elapsed = time.perf_counter() - t0
+    await service.queue.join()
+    server.close()
+    await server.wait_closed()
+    await service.stop()
+    paid = check(service, provider, stock_before)
+    assert len(service.orders) <= count
+    latencies.sort()
+    print(f"HTTP : {len(latencies)} requêtes sur {connections} connexions, "
+          f"{len(latencies) / elapsed:,.0f} req/s, médiane {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms ; "
+          f"{len(service.orders)} commandes distinctes, {paid} payées, "
+          f"{sum(o.status in FINAL for o in service.orders.values())} terminées, "
+          f"{len(service.to_reconcile())} à rapprocher")
+
+
+def main(count, connections):
+    with tempfile.TemporaryDirectory() as tmp:
+        make_catalog(os.path.join(tmp, "produits.json"), CATALOG_SIZE)
+        asyncio.run(bench_memory(tmp, count))
+        asyncio.run(bench_http(tmp, count, connections))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 5000, args[1] if len(args) > 1 else 50)
@@ -0,0 +1,83 @@
+"""Catalogue partitionné : une boutique seule face au catalogue global.
+
+Sur un catalogue synthétique de 40 boutiques (dossier temporaire), mesure :
+  - le chargement et l'enregistrement du catalogue global non partitionné ;
+  - le chargement et l'enregistrement d'une seule boutique ;
+  - le réassemblage de la vue globale après la modification d'une boutique,
+    et quand rien n'a changé ;
+  - P postes qui enregistrent chacun N fois une boutique différente en même temps.
+
+Usage : python benchmarks/bench_shards.py [taille] [postes]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_snapshot import timed  # noqa: E402
+from bench_startup import make_catalog  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from catalog_shards import ShardStore  # noqa: E402
+
+SAVES_PER_WORKER = 10
+
+WORKER = """
+import sys
+from catalog_shards import ShardStore
+store = ShardStore(sys.argv[1], sys.argv[2], sys.argv[3])
+for i in range(int(sys.argv[5])):
+    catalog = store.open(sys.argv[4])
+    catalog.products[0] = dict(catalog.products[0], stock=i)
+    catalog.save()
+"""
+
+
+def main(size, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        merged = os.path.join(tmp, "produits.json")
+        make_catalog(merged, size)
+        catalog = Catalog(merged)
+        catalog.load()
+        full_load = timed(lambda: Catalog(merged).load())
+        full_save = timed(catalog.save)
+
+        store = ShardStore(os.path.join(tmp, "boutiques"), merged, os.path.join(tmp, "cache"))
+        store.split(catalog.products)
+        boutiques = list(store.registry())
+        shard = store.open(boutiques[0])
+        shard_load = timed(lambda: store.open(boutiques[0]))
+
+        def edit():
+            shard.products[0] = dict(shard.products[0], stock=shard.products[0]["stock"] + 1)
+            shard.save()
+
+        shard_save = timed(edit)
+        merge_one = timed(store.merge, before=edit)
+        merge_none = timed(store.merge)
+        total = sum(len(Catalog(store.shard_file(b)).load()) for b in boutiques)
+        assert total == size and len(store.merged_products()) == size
+
+        print(f"{size} produits, {len(boutiques)} boutiques")
+        print(f"  global     : chargement {full_load:.0f} ms, enregistrement {full_save:.0f} ms")
+        print(f"  1 boutique : chargement {shard_load:.1f} ms, enregistrement {shard_save:.1f} ms")
+        print(f"  vue globale : {merge_one:.0f} ms après une boutique modifiée, {merge_none:.1f} ms sans changement")
+
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        t0 = time.perf_counter()
+        procs = [subprocess.Popen([sys.executable, "-c", WORKER, store.shard_dir, merged,
+                                   store.cache_dir, boutiques[w % len(boutiques)],
+                                   str(SAVES_PER_WORKER)], env=env)
+                 for w in range(workers)]
+        assert all(p.wait() == 0 for p in procs)
+        elapsed = time.perf_counter() - t0
+        assert len(store.merged_products()) == size
+        print(f"  {workers} postes x {SAVES_PER_WORKER} enregistrements simultanés : {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 50000, args[1] if len(args) > 1 else 8)
@@ -0,0 +1,69 @@
+"""Chargement du catalogue : JSON seul, démarrage à froid et à chaud avec l'instantané.
+
+Pour chaque taille, un catalogue synthétique est généré dans un dossier
+temporaire puis on mesure Catalog.load :
+  - JSON seul (instantané désactivé) ;
+  - à froid : pas d'instantané, le JSON est lu (l'instantané est écrit en
+    arrière-plan, attendu hors mesure) ;
+  - à chaud : instantané valide (taille et date du JSON inchangées) ;
+  - après un simple changement de date du JSON : l'empreinte est recalculée.
+
+Usage : python benchmarks/bench_snapshot.py [taille ...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_startup import make_catalog  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from catalog_snapshot import snapshot_path, wait_pending  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+REPEAT = 3
+
+
+def timed(fn, repeat=REPEAT, before=None):
+    """Médiane de `repeat` exécutions (ms) ; `before` est appelé avant chacune, hors mesure."""
+    times = []
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main(sizes):
+    print(f"{'produits':>9} {'JSON (ms)':>10} {'froid (ms)':>11} {'chaud (ms)':>11} "
+          f"{'date changée (ms)':>18} {'gain':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"catalog_{size}.json")
+            make_catalog(path, size)
+            snap = snapshot_path(path)
+
+            def remove_snapshot():
+                wait_pending()
+                if os.path.exists(snap):
+                    os.remove(snap)
+
+            def touch():
+                os.utime(path)
+
+            json_only = timed(lambda: Catalog(path, use_snapshot=False).load())
+            cold = timed(lambda: Catalog(path).load(), before=remove_snapshot)
+            wait_pending()
+            warm = timed(lambda: Catalog(path).load())
+            touched = timed(lambda: Catalog(path).load(), before=touch)
+            assert Catalog(path).load() == Catalog(path, use_snapshot=False).load()
+            print(f"{size:>9} {json_only:>10.0f} {cold:>11.0f} {warm:>11.0f} {touched:>18.0f} "
+                  f"{json_only / warm:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,93 @@
+"""Mesure du temps de démarrage du gestionnaire de produits selon la taille du catalogue.
+
+Pour chaque taille, un catalogue synthétique est généré dans un dossier
+temporaire puis on mesure :
+  - le chargement du cœur (catalog.Catalog.load, sans Tk) ;
+  - le temps jusqu'au premier affichage de la fenêtre (première tranche de la
+    liste incluse) ;
+  - le temps jusqu'au remplissage complet de la liste.
+
+Usage : python benchmarks/bench_startup.py [taille ...]
+La partie graphique est ignorée si aucun affichage n'est disponible.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Catalog  # noqa: E402
+
+DEFAULT_SIZES = (100, 1000, 10000, 50000)
+
+
+def make_catalog(path, size):
+    """Écrire un catalogue synthétique de `size` produits."""
+    categories = ["Sport", "Mode", "Maison", "Beauté", "Électronique", "Gourmandises"]
+    products = [
+        {
+            "id": i,
+            "slug": f"produit-{i}",
+            "title": f"Produit de test numéro {i}",
+            "short": "Description courte du produit de test.",
+            "category": categories[i % len(categories)],
+            "boutique": f"BOUTIQUE{i % 40}",
+            "price": float(1000 + (i * 37) % 50000),
+            "priceBoutique": float(900 + (i * 37) % 45000),
+            "oldPrice": None if i % 3 else float(2000 + (i * 37) % 60000),
+            "stock": i % 1000,
+            "rating": 4.5,
+            "images": [f"img/imgProduct/image_{i}_{k}.jpg" for k in range(4)],
+            "features": ["Caractéristique A", "Caractéristique B"],
+            "description": "Texte de description détaillée. " * 5,
+        }
+        for i in range(1, size + 1)
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(products, f, ensure_ascii=False, indent=2)
+
+
+def bench_core(path):
+    t0 = time.perf_counter()
+    Catalog(path).load()
+    return time.perf_counter() - t0
+
+
+def bench_gui(path):
+    """Retourner (premier affichage, liste complète) en secondes, ou None sans affichage."""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    from product_db_manager import ProductManager
+
+    t0 = time.perf_counter()
+    app = ProductManager(root, json_file=path)
+    root.update()  # affichage de la fenêtre + première tranche de la liste
+    first_paint = time.perf_counter() - t0
+    while not app.is_list_filled():
+        root.update()
+    full = time.perf_counter() - t0
+    root.destroy()
+    return first_paint, full
+
+
+def main(sizes):
+    print(f"{'produits':>9} {'cœur (ms)':>10} {'1er affichage (ms)':>19} {'liste complète (ms)':>20}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"produits_{size}.json")
+            make_catalog(path, size)
+            core = bench_core(path)
+            gui = bench_gui(path)
+            if gui is None:
+                print(f"{size:>9} {core * 1000:>10.1f} {'(sans affichage)':>19} {'-':>20}")
+            else:
+                print(f"{size:>9} {core * 1000:>10.1f} {gui[0] * 1000:>19.1f} {gui[1] * 1000:>20.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,322 @@
+"""Modifications groupées des prix et du stock (sans Tk).
+
+Sélection (critères combinés) : catégorie, boutique, fourchette de prix,
+liste d'ids. Opérations, appliquées dans l'ordre :
+  set:CHAMP:VALEUR         fixer une valeur ('none' pour vider oldPrice / priceBoutique)
+  percent:CHAMP:P          variation en pourcentage (-20 = remise de 20 %)
+  add:CHAMP:N              ajouter (ou retirer) une quantité
+  round:CHAMP:PAS[:MODE]   arrondir à un multiple de PAS FCFA (MODE : nearest, up, down)
+  move                     recopier price dans oldPrice (avant une remise)
+
+Le calcul se fait colonne par colonne sur les seuls produits sélectionnés,
+puis les produits modifiés sont recréés en une passe : le catalogue n'est
+touché qu'au moment de l'application, en une seule version d'historique.
+
+Usage : python bulk_edit.py --category Sport --op move --op percent:price:-20 \\
+        --op round:price:100:down [--yes]
+Sans --yes, seul l'aperçu est affiché.
+"""
+import gc
+import math
+from contextlib import contextmanager
+
+FIELDS = ('price', 'priceBoutique', 'oldPrice', 'stock')
+# Champs qui peuvent être vidés (None)
+NULLABLE = ('priceBoutique', 'oldPrice')
+ROUND_MODES = ('nearest', 'up', 'down')
+
+OPERATION_LABELS = {
+    'set': "Fixer",
+    'percent': "Pourcentage",
+    'add': "Ajouter",
+    'round': "Arrondir",
+    'move': "Prix → ancien prix",
+}
+
+
+class BulkEditError(ValueError):
+    """Sélection ou opération invalide."""
+
+
+@contextmanager
+def _gc_paused():
+    """Suspendre le ramasse-miettes pendant la création des copies de produits.
+
+    Ces dicts ne forment pas de cycles ; sans cette pause, chaque lot
+    d'allocations relance un parcours de tout le catalogue (plusieurs fois plus
+    lent que les copies elles-mêmes sur 50 000 produits).
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Selector:
+    """Critères de sélection ; un critère à None est ignoré."""
+
+    def __init__(self, category=None, boutique=None, min_price=None, max_price=None, ids=None):
+        self.category = category or None
+        self.boutique = boutique or None
+        self.min_price = min_price
+        self.max_price = max_price
+        self.ids = set(ids) if ids else None
+
+    def indices(self, products):
+        """Positions des produits sélectionnés (une seule passe)."""
+        category, boutique, ids = self.category, self.boutique, self.ids
+        low = -math.inf if self.min_price is None else self.min_price
+        high = math.inf if self.max_price is None else self.max_price
+        check_price = self.min_price is not None or self.max_price is not None
+        out = []
+        for i, p in enumerate(products):
+            if category is not None and p.get('category') != category:
+                continue
+            if boutique is not None and p.get('boutique') != boutique:
+                continue
+            if ids is not None and p.get('id') not in ids:
+                continue
+            if check_price:
+                price = p.get('price')
+                if price is None or not low <= price <= high:
+                    continue
+            out.append(i)
+        return out
+
+    def describe(self):
+        parts = []
+        if self.category:
+            parts.append(f"catégorie « {self.category} »")
+        if self.boutique:
+            parts.append(f"boutique « {self.boutique} »")
+        if self.min_price is not None or self.max_price is not None:
+            parts.append(f"prix {self.min_price if self.min_price is not None else '…'}"
+                         f" – {self.max_price if self.max_price is not None else '…'}")
+        if self.ids:
+            parts.append(f"{len(self.ids)} id(s)")
+        return ", ".join(parts) or "tous les produits"
+
+
+def _number(text, what):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        raise BulkEditError(f"{what} invalide : {text!r}") from None
+
+
+def parse_operation(text):
+    """'percent:price:-20' -> ('percent', 'price', -20.0) ; voir l'aide du module."""
+    parts = [p.strip() for p in str(text).split(':')]
+    kind = parts[0]
+    if kind == 'move':
+        return ('move',)
+    if kind not in OPERATION_LABELS or len(parts) < 3:
+        raise BulkEditError(f"Opération inconnue : {text!r}")
+    field = parts[1]
+    if field not in FIELDS:
+        raise BulkEditError(f"Champ inconnu : {field!r} (attendu : {', '.join(FIELDS)})")
+    if kind == 'set':
+        if parts[2].lower() in ('none', ''):
+            if field not in NULLABLE:
+                raise BulkEditError(f"Le champ {field} ne peut pas être vidé")
+            return ('set', field, None)
+        return ('set', field, _number(parts[2], "Valeur"))
+    if kind == 'round':
+        step = _number(parts[2], "Pas d'arrondi")
+        mode = parts[3] if len(parts) > 3 else 'nearest'
+        if step <= 0 or mode not in ROUND_MODES:
+            raise BulkEditError(f"Arrondi invalide : {text!r}")
+        return ('round', field, step, mode)
+    return (kind, field, _number(parts[2], "Valeur"))
+
+
+def format_operation(op):
+    if op[0] == 'move':
+        return OPERATION_LABELS['move']
+    if op[0] == 'round':
+        return f"Arrondir {op[1]} au multiple de {op[2]:g} ({op[3]})"
+    value = "vide" if op[2] is None else f"{op[2]:g}"
+    suffix = " %" if op[0] == 'percent' else ""
+    return f"{OPERATION_LABELS[op[0]]} {op[1]} : {value}{suffix}"
+
+
+def _round_column(values, step, mode):
+    fn = {'nearest': lambda v: math.floor(v / step + 0.5),
+          'up': lambda v: math.ceil(v / step),
+          'down': lambda v: math.floor(v / step)}[mode]
+    return [None if v is None else fn(v) * step for v in values]
+
+
+def _apply(columns, op):
+    """Appliquer une opération à des colonnes (listes de valeurs) ; modifie `columns`."""
+    kind = op[0]
+    if kind == 'move':
+        columns['oldPrice'] = list(columns['price'])
+        return
+    field = op[1]
+    values = columns[field]
+    if kind == 'set':
+        columns[field] = [op[2]] * len(values)
+    elif kind == 'percent':
+        factor = 1 + op[2] / 100
+        columns[field] = [None if v is None else v * factor for v in values]
+    elif kind == 'add':
+        columns[field] = [None if v is None else v + op[2] for v in values]
+    elif kind == 'round':
+        columns[field] = _round_column(values, op[2], op[3])
+
+
+def _finish(field, values):
+    """Prix en FCFA entiers (float comme dans le JSON), stock entier ; refus des négatifs."""
+    out = []
+    for v in values:
+        if v is None:
+            out.append(None)
+            continue
+        v = int(round(v)) if field == 'stock' else float(round(v))
+        if v < 0:
+            raise BulkEditError(f"Le résultat donne une valeur négative pour {field}")
+        out.append(v)
+    return out
+
+
+class BulkPlan:
+    """Résultat calculé d'une modification groupée, prêt à être prévisualisé ou appliqué."""
+
+    def __init__(self, selector, operations, selected, fields, changes):
+        self.selector = selector
+        self.operations = operations
+        # nombre de produits sélectionnés
+        self.selected = selected
+        # champs touchés par les opérations
+        self.fields = fields
+        # [(position, ancien produit, nouveau produit)]
+        self.changes = changes
+
+    @property
+    def products(self):
+        """Nouveaux produits modifiés."""
+        return [after for _, _, after in self.changes]
+
+    def changed_fields(self, before, after):
+        """{champ: [avant, après]} pour un produit modifié."""
+        return {field: [before.get(field), after.get(field)] for field in self.fields
+                if before.get(field) != after.get(field)}
+
+    def preview(self, limit=200):
+        """Aperçu texte des différences (limité à `limit` produits)."""
+        lines = [f"Sélection : {self.selector.describe()} ({self.selected} produit(s))"]
+        lines += [f"  - {format_operation(op)}" for op in self.operations]
+        lines += [f"{len(self.changes)} produit(s) modifié(s)", ""]
+        for _, before, after in self.changes[:limit]:
+            lines.append(f"~ [{before.get('id')}] {before.get('title', '')}")
+            for field, (old, new) in self.changed_fields(before, after).items():
+                lines.append(f"    {field}: {old!r} → {new!r}")
+        if len(self.changes) > limit:
+            lines.append(f"… et {len(self.changes) - limit} autre(s)")
+        return "\n".join(lines)
+
+
+def plan(products, selector, operations):
+    """Calculer les changements sans toucher au catalogue."""
+    if not operations:
+        raise BulkEditError("Aucune opération")
+    indices = selector.indices(products)
+    selected = [products[i] for i in indices]
+    columns = {field: [p.get(field) for p in selected] for field in FIELDS}
+    originals = dict(columns)
+    for op in operations:
+        _apply(columns, op)
+    touched = tuple(field for field in FIELDS
+                    if any(op[0] == 'move' and field == 'oldPrice' or op[1:2] == (field,)
+                           for op in operations))
+    for field in touched:
+        columns[field] = _finish(field, columns[field])
+
+    # comparaison ligne à ligne sur des tuples, puis une copie par produit modifié
+    old_rows = zip(*(originals[field] for field in touched))
+    new_rows = zip(*(columns[field] for field in touched))
+    changes = []
+    with _gc_paused():
+        for i, before, old, new in zip(indices, selected, old_rows, new_rows):
+            if old != new:
+                after = before.copy()
+                after.update(zip(touched, new))
+                changes.append((i, before, after))
+    return BulkPlan(selector, list(operations), len(indices), touched, changes)
+
+
+def apply_plan(catalog, bulk, history=None, label=None):
+    """Appliquer un plan au catalogue (et à l'historique, en une seule version)."""
+    products = catalog.products
+    with _gc_paused():
+        for i, before, after in bulk.changes:
+            if i < len(products) and products[i] is before:
+                products[i] = after
+            else:
+                # catalogue modifié depuis le calcul du plan
+                catalog.put(after)
+        if history is not None and bulk.changes:
+            history.record_many(bulk.products,
+                                label=label or f"Modification groupée ({len(bulk.changes)})")
+    return len(bulk.changes)
+
+
+def parse_ids(text):
+    """'1, 4 7-9' -> {1, 4, 7, 8, 9}."""
+    ids = set()
+    for part in str(text).replace(',', ' ').split():
+        if '-' in part:
+            start, _, end = part.partition('-')
+            try:
+                ids.update(range(int(start), int(end) + 1))
+            except ValueError:
+                raise BulkEditError(f"Plage d'ids invalide : {part!r}") from None
+        else:
+            try:
+                ids.add(int(part))
+            except ValueError:
+                raise BulkEditError(f"Id invalide : {part!r}") from None
+    return ids
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from catalog import DEFAULT_JSON_FILE
+    from catalog_shards import open_catalog
+    from price_history import PriceHistory
+
+    parser = argparse.ArgumentParser(
+        description="Modification groupée des prix et du stock",
+        epilog="Opérations : set:CHAMP:VALEUR, percent:CHAMP:P, add:CHAMP:N, "
+               "round:CHAMP:PAS[:nearest|up|down], move")
+    parser.add_argument("--file", default=DEFAULT_JSON_FILE)
+    parser.add_argument("--category")
+    parser.add_argument("--boutique")
+    parser.add_argument("--min-price", type=float)
+    parser.add_argument("--max-price", type=float)
+    parser.add_argument("--ids", help="ex. '1,4,7-9'")
+    parser.add_argument("--op", action="append", default=[], help="opération (répétable)")
+    parser.add_argument("--yes", action="store_true", help="appliquer et enregistrer")
+    args = parser.parse_args()
+
+    try:
+        selector = Selector(args.category, args.boutique, args.min_price, args.max_price,
+                            parse_ids(args.ids) if args.ids else None)
+        operations = [parse_operation(op) for op in args.op]
+        catalog = open_catalog(args.file)
+        catalog.load()
+        bulk = plan(catalog.products, selector, operations)
+    except BulkEditError as e:
+        sys.exit(f"Erreur : {e}")
+    print(bulk.preview())
+    if args.yes and bulk.changes:
+        apply_plan(catalog, bulk)
+        catalog.save()
+        PriceHistory().record(bulk.products)
+        print(f"{len(bulk.changes)} produit(s) enregistré(s) dans {args.file}")
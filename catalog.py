@@ -0,0 +1,172 @@
+"""Cœur du catalogue produits, sans aucune dépendance à Tkinter.
+
+Chargement / sauvegarde de data/produits.json, normalisation des chemins
+d'images, index par id et règles métier (prochain id, unicité du slug). Les
+outils en ligne de commande et les interfaces graphiques s'appuient tous sur
+ce module.
+
+Les anciens formats de fichier sont mis à jour au chargement (voir
+catalog_schema.py) et le fichier est toujours réécrit au format courant. Les
+champs inconnus sont conservés tels quels.
+
+Un instantané binaire déjà normalisé est gardé à côté du JSON
+(catalog_snapshot.py) : tant que le JSON n'a pas changé, le chargement le lit
+à la place du texte.
+"""
+import hashlib
+import json
+import os
+
+import catalog_snapshot
+from catalog_schema import (
+    check_version,
+    make_document,
+    normalize_path,
+    normalize_product_images,
+    split_document,
+    upgrade_product,
+)
+
+DEFAULT_JSON_FILE = "data/produits.json"
+
+
+class Catalog:
+    def __init__(self, json_file=DEFAULT_JSON_FILE, use_snapshot=True):
+        self.json_file = json_file
+        # lire / écrire l'instantané binaire à côté du JSON
+        self.use_snapshot = use_snapshot
+        self._products = []
+        # champs de l'enveloppe du fichier autres que schemaVersion / products
+        self.meta = {}
+        # id -> position dans self._products (reconstruit à la demande)
+        self._positions = None
+
+    @property
+    def products(self):
+        return self._products
+
+    @products.setter
+    def products(self, products):
+        self._products = products
+        self._positions = None
+
+    def load(self):
+        """Charger les produits depuis le fichier JSON et normaliser les chemins d'images."""
+        if self.use_snapshot:
+            snapshot = catalog_snapshot.open_valid(self.json_file)
+            if snapshot is not None:
+                with snapshot:
+                    self.products = snapshot.products()
+                    self.meta = snapshot.meta
+                return self.products
+        data = []
+        raw = st = None
+        if os.path.exists(self.json_file):
+            try:
+                with open(self.json_file, 'rb') as f:
+                    raw = f.read()
+                    st = os.fstat(f.fileno())
+                data = json.loads(raw)
+            except (json.JSONDecodeError, FileNotFoundError):
+                data = []
+                raw = None
+        version, products, self.meta = split_document(data)
+        # un fichier plus récent que cet outil ne doit pas être réécrit
+        check_version(version)
+        self.products = [normalize_product_images(upgrade_product(prod, version)) for prod in products]
+        if self.use_snapshot and raw is not None:
+            # empreinte des octets déjà lus ; l'instantané est écrit en arrière-plan
+            # (les dicts produits ne sont jamais modifiés en place, la liste est copiée)
+            catalog_snapshot.save_in_background(self.json_file, list(self.products), self.meta,
+                                                hashlib.sha1(raw).digest(), st)
+        return self.products
+
+    def save(self):
+        """Écrire le catalogue de façon atomique (fichier temporaire puis renommage)."""
+        self.normalize_images()
+        os.makedirs(os.path.dirname(self.json_file) or ".", exist_ok=True)
+        tmp = self.json_file + ".tmp"
+        data = json.dumps(make_document(self.products, self.meta), ensure_ascii=False, indent=2)
+        data = data.encode('utf-8')
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.json_file)
+        if self.use_snapshot:
+            catalog_snapshot.save_for(self.json_file, self.products, self.meta,
+                                      hashlib.sha1(data).digest())
+
+    def normalize_images(self):
+        """Normaliser les chemins d'images ; retourne les produits remplacés (dicts neufs)."""
+        changed = []
+        for i, prod in enumerate(self._products):
+            normalized = normalize_product_images(prod)
+            if normalized is not prod:
+                self._products[i] = normalized
+                changed.append(normalized)
+        return changed
+
+    def _index(self):
+        if self._positions is None:
+            self._positions = {p.get('id'): i for i, p in enumerate(self._products)}
+        return self._positions
+
+    def get(self, product_id):
+        """Produit d'id donné, ou None."""
+        pos = self._index().get(product_id)
+        if pos is None:
+            return None
+        if pos >= len(self._products) or self._products[pos].get('id') != product_id:
+            # la liste a été modifiée directement : on réindexe
+            self._positions = None
+            pos = self._index().get(product_id)
+            if pos is None:
+                return None
+        return self._products[pos]
+
+    def put(self, product):
+        """Ajouter ou remplacer un produit ; retourne True si c'est un ajout."""
+        pid = product.get('id')
+        if self.get(pid) is not None:
+            self._products[self._positions[pid]] = product
+            return False
+        self._products.append(product)
+        self._index()[pid] = len(self._products) - 1
+        return True
+
+    def remove(self, product_id):
+        """Supprimer un produit ; retourne True s'il existait."""
+        before = len(self._products)
+        self.products = [p for p in self._products if p.get('id') != product_id]
+        return len(self._products) != before
+
+    def next_id(self, id_range=None):
+        """Obtenir le prochain ID disponible.
+
+        Un fichier de boutique (voir catalog_shards.py) a sa propre plage d'ids,
+        gardée dans l'enveloppe ("idRange": [début, fin]).
+        """
+        start, end = id_range or self.meta.get('idRange') or (1, None)
+        ids = [pid for pid in (product.get('id', 0) for product in self._products)
+               if start <= pid and (end is None or pid <= end)]
+        next_id = max(ids) + 1 if ids else start
+        if end is not None and next_id > end:
+            raise ValueError(f"Plage d'ids {start}-{end} épuisée")
+        return next_id
+
+    def slug_exists(self, slug, exclude_id=None):
+        """Vérifier si un slug existe déjà"""
+        for product in self._products:
+            if product.get('slug') == slug and product.get('id') != exclude_id:
+                return True
+        return False
+
+    def categories_and_boutiques(self):
+        """Ensembles des catégories et boutiques renseignées."""
+        categories = set()
+        boutiques = set()
+        for product in self._products:
+            if product.get('category'):
+                categories.add(product['category'])
+            if product.get('boutique'):
+                boutiques.add(product['boutique'])
+        return categories, boutiques
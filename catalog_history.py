@@ -0,0 +1,442 @@
+"""Historique des versions du catalogue (annuler / rétablir).
+
+Chaque version est une table persistante (HAMT : trie à 32 branches indexé par
+le hash de l'id produit). Modifier un produit ne recopie que le chemin de la
+racine vers la feuille (au plus ~7 nœuds) : les versions partagent tout le
+reste. La mémoire consommée croît donc avec la taille des modifications et non
+avec (taille du catalogue x nombre de versions).
+
+Les produits stockés sont considérés comme immuables : on remplace un dict
+produit, on ne le modifie jamais en place.
+"""
+import json
+import time
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_MAX_SHIFT = 60
+_MISSING = object()
+
+
+class _Leaf:
+    __slots__ = ('hash', 'key', 'value')
+
+    def __init__(self, h, key, value):
+        self.hash = h
+        self.key = key
+        self.value = value
+
+
+class _Collision:
+    """Plusieurs clés dont le hash est identique sur tous les niveaux."""
+    __slots__ = ('hash', 'pairs')
+
+    def __init__(self, h, pairs):
+        self.hash = h
+        self.pairs = pairs  # tuple de (clé, valeur)
+
+
+class _Node:
+    __slots__ = ('bitmap', 'children')
+
+    def __init__(self, bitmap, children):
+        self.bitmap = bitmap
+        self.children = children  # tuple compact, un élément par bit à 1
+
+    def index(self, bit):
+        return bin(self.bitmap & (bit - 1)).count('1')
+
+    def child(self, bit):
+        if not self.bitmap & bit:
+            return None
+        return self.children[self.index(bit)]
+
+
+_EMPTY_NODE = _Node(0, ())
+
+
+def _hash(key):
+    return hash(key) & 0xFFFFFFFFFFFFFFFF
+
+
+def _entries(entry):
+    """Itérer les (clé, valeur) d'un sous-arbre."""
+    if entry is None:
+        return
+    if isinstance(entry, _Leaf):
+        yield entry.key, entry.value
+    elif isinstance(entry, _Collision):
+        yield from entry.pairs
+    else:
+        for child in entry.children:
+            yield from _entries(child)
+
+
+def _merge_leaves(shift, a, b):
+    """Créer le plus petit sous-arbre contenant deux feuilles distinctes."""
+    if shift > _MAX_SHIFT:
+        return _Collision(a.hash, _pairs_of(a) + _pairs_of(b))
+    bit_a = 1 << ((a.hash >> shift) & _MASK)
+    bit_b = 1 << ((b.hash >> shift) & _MASK)
+    if bit_a == bit_b:
+        return _Node(bit_a, (_merge_leaves(shift + _BITS, a, b),))
+    children = (a, b) if bit_a < bit_b else (b, a)
+    return _Node(bit_a | bit_b, children)
+
+
+def _pairs_of(entry):
+    if isinstance(entry, _Leaf):
+        return ((entry.key, entry.value),)
+    return entry.pairs
+
+
+def _assoc(entry, shift, h, key, value):
+    """Retourner (nouveau sous-arbre, clé ajoutée ?)."""
+    if isinstance(entry, _Node):
+        bit = 1 << ((h >> shift) & _MASK)
+        idx = entry.index(bit)
+        if not entry.bitmap & bit:
+            children = entry.children[:idx] + (_Leaf(h, key, value),) + entry.children[idx:]
+            return _Node(entry.bitmap | bit, children), True
+        child, added = _assoc(entry.children[idx], shift + _BITS, h, key, value)
+        if child is entry.children[idx]:
+            return entry, False
+        children = entry.children[:idx] + (child,) + entry.children[idx + 1:]
+        return _Node(entry.bitmap, children), added
+    if isinstance(entry, _Leaf):
+        if entry.key == key:
+            if entry.value is value:
+                return entry, False
+            return _Leaf(h, key, value), False
+        return _merge_leaves(shift, entry, _Leaf(h, key, value)), True
+    # _Collision
+    if entry.hash != h:
+        node = _Node(1 << ((entry.hash >> shift) & _MASK), (entry,))
+        return _assoc(node, shift, h, key, value)
+    pairs = tuple(p for p in entry.pairs if p[0] != key)
+    return _Collision(h, pairs + ((key, value),)), len(pairs) == len(entry.pairs)
+
+
+def _assoc_many(entry, shift, items):
+    """Insérer plusieurs (hash, clé, valeur) en recréant chaque nœud touché une seule fois.
+
+    Retourne (nouveau sous-arbre, nombre de clés ajoutées).
+    """
+    if not isinstance(entry, _Node):
+        added = 0
+        for h, key, value in items:
+            entry, one = _assoc(entry, shift, h, key, value)
+            added += one
+        return entry, added
+    groups = {}
+    for item in items:
+        groups.setdefault(1 << ((item[0] >> shift) & _MASK), []).append(item)
+    bitmap = entry.bitmap
+    children = dict(zip(_bits(bitmap), entry.children))
+    added = 0
+    changed = False
+    for bit, group in groups.items():
+        old = children.get(bit)
+        if len(group) == 1 and isinstance(old, _Leaf) and old.key == group[0][1]:
+            # cas courant : remplacement de la valeur d'une feuille existante
+            if old.value is not group[0][2]:
+                children[bit] = _Leaf(*group[0])
+                changed = True
+            continue
+        if old is None:
+            h, key, value = group[0]
+            new, n = _assoc_many(_Leaf(h, key, value), shift + _BITS, group[1:])
+            n += 1
+        else:
+            new, n = _assoc_many(old, shift + _BITS, group)
+        if new is not old:
+            children[bit] = new
+            bitmap |= bit
+            changed = True
+        added += n
+    if not changed:
+        return entry, 0
+    return _Node(bitmap, tuple(children[bit] for bit in _bits(bitmap))), added
+
+
+def _bits(bitmap):
+    """Bits à 1 d'un bitmap, du plus faible au plus fort."""
+    out = []
+    while bitmap:
+        low = bitmap & -bitmap
+        out.append(low)
+        bitmap ^= low
+    return out
+
+
+def _dissoc(entry, shift, h, key):
+    """Retourner (nouveau sous-arbre ou None, clé supprimée ?)."""
+    if isinstance(entry, _Leaf):
+        return (None, True) if entry.key == key else (entry, False)
+    if isinstance(entry, _Collision):
+        pairs = tuple(p for p in entry.pairs if p[0] != key)
+        if len(pairs) == len(entry.pairs):
+            return entry, False
+        if len(pairs) == 1:
+            return _Leaf(h, pairs[0][0], pairs[0][1]), True
+        return _Collision(h, pairs), True
+    bit = 1 << ((h >> shift) & _MASK)
+    if not entry.bitmap & bit:
+        return entry, False
+    idx = entry.index(bit)
+    child, removed = _dissoc(entry.children[idx], shift + _BITS, h, key)
+    if not removed:
+        return entry, False
+    if child is None:
+        if entry.bitmap == bit:
+            return None, True
+        children = entry.children[:idx] + entry.children[idx + 1:]
+        bitmap = entry.bitmap & ~bit
+        # remonter une feuille seule pour garder l'arbre compact
+        if len(children) == 1 and not isinstance(children[0], _Node) and shift:
+            return children[0], True
+        return _Node(bitmap, children), True
+    if len(entry.children) == 1 and not isinstance(child, _Node) and shift:
+        return child, True
+    children = entry.children[:idx] + (child,) + entry.children[idx + 1:]
+    return _Node(entry.bitmap, children), True
+
+
+def _diff(a, b, out):
+    """Comparer deux sous-arbres en sautant les parties partagées."""
+    if a is b:
+        return
+    if isinstance(a, _Node) and isinstance(b, _Node):
+        for i in range(1 << _BITS):
+            bit = 1 << i
+            if (a.bitmap | b.bitmap) & bit:
+                _diff(a.child(bit), b.child(bit), out)
+        return
+    old = dict(_entries(a))
+    new = dict(_entries(b))
+    for key in old.keys() | new.keys():
+        va = old.get(key, _MISSING)
+        vb = new.get(key, _MISSING)
+        if va is not vb and va != vb:
+            out.append((key, va, vb))
+
+
+class PersistentMap:
+    """Table associative immuable ; assoc/dissoc retournent une nouvelle table."""
+    __slots__ = ('_root', '_count')
+
+    def __init__(self, root=_EMPTY_NODE, count=0):
+        self._root = root
+        self._count = count
+
+    @classmethod
+    def from_items(cls, items):
+        m = cls()
+        for key, value in items:
+            m = m.assoc(key, value)
+        return m
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        h = _hash(key)
+        entry = self._root
+        shift = 0
+        while isinstance(entry, _Node):
+            entry = entry.child(1 << ((h >> shift) & _MASK))
+            shift += _BITS
+        if isinstance(entry, _Leaf) and entry.key == key:
+            return entry.value
+        if isinstance(entry, _Collision):
+            for k, v in entry.pairs:
+                if k == key:
+                    return v
+        return default
+
+    def assoc(self, key, value):
+        root, added = _assoc(self._root, 0, _hash(key), key, value)
+        if root is self._root:
+            return self
+        return PersistentMap(root, self._count + added)
+
+    def update(self, items):
+        """Nouvelle table avec plusieurs (clé, valeur) : chaque nœud touché n'est recréé qu'une fois."""
+        items = [(_hash(key), key, value) for key, value in items]
+        if not items:
+            return self
+        root, added = _assoc_many(self._root, 0, items)
+        if root is self._root:
+            return self
+        return PersistentMap(root, self._count + added)
+
+    def dissoc(self, key):
+        root, removed = _dissoc(self._root, 0, _hash(key), key)
+        if not removed:
+            return self
+        return PersistentMap(root or _EMPTY_NODE, self._count - 1)
+
+    def items(self):
+        return _entries(self._root)
+
+    def values(self):
+        return (v for _, v in _entries(self._root))
+
+    def diff(self, other):
+        """Liste de (clé, ancienne valeur, nouvelle valeur) ; _MISSING si absente."""
+        out = []
+        _diff(self._root, other._root, out)
+        return out
+
+
+class CatalogVersion:
+    __slots__ = ('number', 'products', 'label', 'timestamp', 'order')
+
+    def __init__(self, number, products, label, order):
+        self.number = number
+        self.products = products
+        self.label = label
+        self.timestamp = time.time()
+        # id -> rang d'entrée dans le catalogue, partagé par toutes les versions
+        self.order = order
+
+    def to_list(self):
+        """Produits de la version, dans l'ordre où ils sont entrés dans le catalogue."""
+        order = self.order
+        return sorted(self.products.values(), key=lambda p: order[p.get('id')])
+
+
+class CatalogHistory:
+    """Suite linéaire de versions avec un curseur pour annuler / rétablir."""
+
+    def __init__(self, products, label="Chargement"):
+        products = list(products)
+        initial = PersistentMap.from_items((p.get('id'), p) for p in products)
+        # rang de chaque id, jamais retiré : un produit supprimé puis rétabli
+        # (annuler) retrouve sa place
+        self._order = {}
+        self._place(p.get('id') for p in products)
+        self.versions = [CatalogVersion(0, initial, label, self._order)]
+        self.cursor = 0
+        self._next_number = 1
+
+    @property
+    def current(self):
+        return self.versions[self.cursor]
+
+    def _place(self, pids):
+        """Donner un rang aux ids qui n'en ont pas encore (à la suite des autres)."""
+        order = self._order
+        for pid in pids:
+            if pid not in order:
+                order[pid] = len(order)
+
+    def _commit(self, products, label):
+        if products is self.current.products:
+            return self.current
+        # une nouvelle modification efface les versions « rétablissables »
+        del self.versions[self.cursor + 1:]
+        version = CatalogVersion(self._next_number, products, label, self._order)
+        self._next_number += 1
+        self.versions.append(version)
+        self.cursor += 1
+        return version
+
+    def record_put(self, product, label=None):
+        """Enregistrer l'ajout ou la modification d'un produit."""
+        pid = product.get('id')
+        label = label or f"Produit {pid} : {product.get('title', '')}"
+        self._place([pid])
+        return self._commit(self.current.products.assoc(pid, product), label)
+
+    def record_delete(self, product_id, label=None):
+        """Enregistrer la suppression d'un produit."""
+        label = label or f"Suppression du produit {product_id}"
+        return self._commit(self.current.products.dissoc(product_id), label)
+
+    def record_many(self, products, removed_ids=(), label="Modification groupée"):
+        """Enregistrer plusieurs changements en une seule version."""
+        products = list(products)
+        self._place(product.get('id') for product in products)
+        m = self.current.products.update((product.get('id'), product) for product in products)
+        for pid in removed_ids:
+            m = m.dissoc(pid)
+        return self._commit(m, label)
+
+    def can_undo(self):
+        return self.cursor > 0
+
+    def can_redo(self):
+        return self.cursor < len(self.versions) - 1
+
+    def undo(self):
+        if self.can_undo():
+            self.cursor -= 1
+        return self.current
+
+    def redo(self):
+        if self.can_redo():
+            self.cursor += 1
+        return self.current
+
+    def goto(self, number):
+        """Se placer sur une version donnée (les autres restent accessibles)."""
+        for i, version in enumerate(self.versions):
+            if version.number == number:
+                self.cursor = i
+                return version
+        raise KeyError(number)
+
+    def find(self, number):
+        for version in self.versions:
+            if version.number == number:
+                return version
+        raise KeyError(number)
+
+    def diff(self, from_number, to_number):
+        """Différences entre deux versions : ajouts, suppressions, modifications."""
+        old = self.find(from_number).products
+        new = self.find(to_number).products
+        added, removed, modified = [], [], []
+        for pid, before, after in old.diff(new):
+            if before is _MISSING:
+                added.append(after)
+            elif after is _MISSING:
+                removed.append(before)
+            else:
+                changes = {
+                    field: [before.get(field), after.get(field)]
+                    for field in before.keys() | after.keys()
+                    if before.get(field) != after.get(field)
+                }
+                modified.append({"id": pid, "changes": changes})
+        key = lambda p: p.get('id', 0)
+        added.sort(key=key)
+        removed.sort(key=key)
+        modified.sort(key=lambda m: m["id"])
+        return {"from": from_number, "to": to_number,
+                "added": added, "removed": removed, "modified": modified}
+
+    def export_delta(self, from_number, to_number, path):
+        """Écrire le delta entre deux versions dans un fichier JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.diff(from_number, to_number), f, ensure_ascii=False, indent=2)
+
+
+def format_diff(delta):
+    """Résumé texte d'un delta, pour la fenêtre d'historique."""
+    lines = [f"Version {delta['from']} → version {delta['to']}", ""]
+    for p in delta["added"]:
+        lines.append(f"+ [{p.get('id')}] {p.get('title', '')}")
+    for p in delta["removed"]:
+        lines.append(f"- [{p.get('id')}] {p.get('title', '')}")
+    for m in delta["modified"]:
+        lines.append(f"~ [{m['id']}]")
+        for field, (before, after) in sorted(m["changes"].items()):
+            lines.append(f"    {field}: {before!r} → {after!r}")
+    if len(lines) == 2:
+        lines.append("Aucune différence.")
+    return "\n".join(lines)
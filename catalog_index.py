@@ -0,0 +1,143 @@
+"""Index de tri et de filtrage de la liste des produits (sans Tk).
+
+- Clés de tri précalculées par colonne, mises en cache et invalidées produit
+  par produit : re-trier revient à renvoyer une permutation des ids.
+- Comparaison des textes adaptée au français : insensible à la casse et aux
+  accents ("Électronique" se range avec "electronique"), l'ordre exact des
+  accents ne servant qu'à départager.
+- Index de facettes (catégorie, boutique) -> ensemble d'ids, et texte de
+  recherche normalisé par produit pour le filtre.
+"""
+import unicodedata
+
+# Colonnes de la liste -> champ produit et type de tri
+COLUMNS = {
+    'ID': ('id', 'number'),
+    'Titre': ('title', 'text'),
+    'Catégorie': ('category', 'text'),
+    'Boutique': ('boutique', 'text'),
+    'Prix': ('price', 'number'),
+    'Prix Boutique': ('priceBoutique', 'number'),
+    'Ancien prix': ('oldPrice', 'number'),
+    'Stock': ('stock', 'number'),
+}
+
+FACETS = ('category', 'boutique')
+
+SEARCH_FIELDS = ('title', 'slug', 'short', 'category', 'boutique')
+
+
+def fold_text(text):
+    """Texte sans accents et en minuscules, pour comparer et rechercher."""
+    text = str(text or '')
+    if text.isascii():
+        return text.casefold()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def text_key(value):
+    """Clé de tri d'un texte : ordre alphabétique, puis accents et casse."""
+    value = str(value or '')
+    # les valeurs vides sont rangées à la fin
+    return (value == '', fold_text(value), value.casefold(), value)
+
+
+def number_key(value):
+    """Clé de tri d'un nombre ; les valeurs absentes ou invalides à la fin."""
+    try:
+        return (False, float(value))
+    except (TypeError, ValueError):
+        return (True, 0.0)
+
+
+class CatalogIndex:
+    def __init__(self, products=()):
+        self.products = {}
+        # colonne -> {id: clé} (calculé à la demande)
+        self._keys = {}
+        # colonne -> liste d'ids triée (invalidée à chaque modification)
+        self._orders = {}
+        self._search = {}
+        self.facets = {name: {} for name in FACETS}
+        self.rebuild(products)
+
+    def rebuild(self, products):
+        self.products = {}
+        self._keys.clear()
+        self._orders.clear()
+        self._search.clear()
+        self.facets = {name: {} for name in FACETS}
+        for product in products:
+            self._add(product)
+
+    def _add(self, product):
+        pid = product.get('id')
+        self.products[pid] = product
+        self._search[pid] = fold_text(' '.join(
+            [str(pid)] + [str(product.get(field) or '') for field in SEARCH_FIELDS]))
+        for name in FACETS:
+            value = product.get(name) or ''
+            self.facets[name].setdefault(value, set()).add(pid)
+
+    def _drop(self, pid):
+        product = self.products.pop(pid, None)
+        if product is None:
+            return
+        self._search.pop(pid, None)
+        for keys in self._keys.values():
+            keys.pop(pid, None)
+        for name in FACETS:
+            value = product.get(name) or ''
+            ids = self.facets[name].get(value)
+            if ids is not None:
+                ids.discard(pid)
+                if not ids:
+                    del self.facets[name][value]
+
+    def update(self, product):
+        """Ajouter ou remplacer un produit (seules ses clés sont recalculées)."""
+        self._drop(product.get('id'))
+        self._add(product)
+        self._orders.clear()
+
+    def remove(self, product_id):
+        self._drop(product_id)
+        self._orders.clear()
+
+    def column_keys(self, column):
+        """Clés de tri d'une colonne, calculées uniquement pour les produits manquants."""
+        field, kind = COLUMNS[column]
+        keys = self._keys.setdefault(column, {})
+        if len(keys) != len(self.products):
+            make_key = number_key if kind == 'number' else text_key
+            for pid, product in self.products.items():
+                if pid not in keys:
+                    keys[pid] = make_key(product.get(field))
+        return keys
+
+    def sorted_ids(self, column, reverse=False):
+        """Ids triés selon une colonne (ordre stable, id en second critère)."""
+        order = self._orders.get(column)
+        if order is None:
+            keys = self.column_keys(column)
+            order = sorted(keys, key=lambda pid: (keys[pid], number_key(pid)))
+            self._orders[column] = order
+        return order[::-1] if reverse else order
+
+    def facet_values(self, name):
+        return sorted((v for v in self.facets[name] if v), key=text_key)
+
+    def filter_ids(self, text='', **facets):
+        """Ensemble des ids correspondant au texte et aux facettes ; None = tout."""
+        result = None
+        for name, value in facets.items():
+            if value:
+                ids = self.facets[name].get(value, set())
+                result = set(ids) if result is None else result & ids
+        terms = fold_text(text).split()
+        if terms:
+            candidates = self.products.keys() if result is None else result
+            result = {pid for pid in candidates
+                      if all(term in self._search[pid] for term in terms)}
+        return result
@@ -0,0 +1,228 @@
+"""Versions du format de data/produits.json et migration en flux.
+
+Historique du format :
+  1. liste JSON de produits, sans 'boutique', 'priceBoutique' ni 'oldPrice'
+     (format de l'ancien website_structure_scraper.py), chemins d'images
+     parfois avec des '\\' ;
+  2. enveloppe {"schemaVersion": 2, "products": [...]} ; tous les produits ont
+     'boutique', 'priceBoutique' et 'oldPrice', chemins normalisés.
+
+Le site accepte les deux formes (liste ou objet avec "products").
+
+Les champs inconnus d'un produit ou de l'enveloppe sont toujours conservés.
+La migration lit le fichier produit par produit et écrit le résultat dans un
+fichier temporaire renommé à la fin : le catalogue n'est jamais chargé en
+entier ni lu deux fois.
+"""
+import json
+import os
+import re
+import unicodedata
+
+SCHEMA_VERSION = 2
+
+# Champs ajoutés par la version 2, avec leur valeur par défaut
+V2_DEFAULTS = {"boutique": "", "priceBoutique": None, "oldPrice": None}
+
+_CHUNK = 1 << 16
+
+
+class SchemaError(ValueError):
+    """Fichier catalogue illisible ou d'une version non prise en charge."""
+
+
+def normalize_path(p: str) -> str:
+    """Normaliser les chemins pour utiliser '/' au lieu de '\\'."""
+    if not p:
+        return p
+    return str(p).replace('\\', '/')
+
+
+def normalize_product_images(prod):
+    """Retourner le produit avec des chemins d'images normalisés (sans le modifier)."""
+    images = prod.get('images')
+    if isinstance(images, list):
+        normalized = [normalize_path(img) for img in images]
+        if normalized != images:
+            return {**prod, 'images': normalized}
+    return prod
+
+
+def slugify(text):
+    """Slug ASCII pour un nom de fichier ('Électronique' -> 'electronique')."""
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    ascii_text = decomposed.encode('ascii', 'ignore').decode('ascii').lower()
+    return re.sub(r'[^a-z0-9]+', '-', ascii_text).strip('-')
+
+
+def upgrade_product(prod, from_version):
+    """Mettre un produit au format courant (retourne un nouveau dict si besoin)."""
+    if from_version < 2:
+        missing = {k: v for k, v in V2_DEFAULTS.items() if k not in prod}
+        if missing:
+            prod = {**prod, **missing}
+        prod = normalize_product_images(prod)
+    return prod
+
+
+def split_document(data):
+    """Retourner (version, produits, autres champs de l'enveloppe)."""
+    if isinstance(data, list):
+        return 1, data, {}
+    if isinstance(data, dict) and isinstance(data.get("products"), list):
+        meta = {k: v for k, v in data.items() if k not in ("schemaVersion", "products")}
+        return int(data.get("schemaVersion", 1)), data["products"], meta
+    raise SchemaError("Format de catalogue inconnu")
+
+
+def check_version(version):
+    if version > SCHEMA_VERSION:
+        raise SchemaError(
+            f"Catalogue au format {version}, plus récent que celui de cet outil ({SCHEMA_VERSION})")
+
+
+def make_document(products, meta=None):
+    """Enveloppe versionnée écrite sur disque."""
+    return {"schemaVersion": SCHEMA_VERSION, **(meta or {}), "products": products}
+
+
+class _StreamReader:
+    """Lecture incrémentale de valeurs JSON dans un fichier texte."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(_CHUNK)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Prochain caractère non blanc (sans le consommer), '' en fin de fichier."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        c = self.peek()
+        if c not in chars:
+            raise SchemaError(f"JSON inattendu: {c!r} au lieu de {chars!r}")
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Décoder la valeur JSON suivante, en relisant si elle est coupée."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # un nombre en fin de tampon peut être incomplet
+                if end < len(self.buf) or not isinstance(value, (int, float)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+            if not self._fill():
+                try:
+                    value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+                except json.JSONDecodeError as e:
+                    raise SchemaError(f"JSON invalide: {e}") from e
+                return value
+
+    def array_items(self):
+        """Itérer les éléments d'un tableau JSON."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_catalog(f):
+    """Lire un catalogue en flux.
+
+    Retourne (version, itérateur de produits, champs de l'enveloppe lus avant
+    "products"). Pour l'enveloppe, "schemaVersion" doit précéder "products",
+    ce que garantit make_document.
+    """
+    reader = _StreamReader(f)
+    first = reader.peek()
+    if first == "[":
+        return 1, reader.array_items(), {}
+    if first != "{":
+        raise SchemaError("Format de catalogue inconnu")
+    reader.expect("{")
+    meta = {}
+    version = 1
+    while reader.peek() != "}":
+        key = reader.value()
+        reader.expect(":")
+        if key == "products":
+            return version, reader.array_items(), meta
+        value = reader.value()
+        if key == "schemaVersion":
+            version = int(value)
+        else:
+            meta[key] = value
+        if reader.peek() == ",":
+            reader.pos += 1
+    raise SchemaError("Catalogue sans tableau \"products\"")
+
+
+def write_catalog_stream(f, products, meta=None):
+    """Écrire un catalogue produit par produit, avec la même mise en forme que json.dump(indent=2)."""
+    header = {"schemaVersion": SCHEMA_VERSION, **(meta or {})}
+    f.write("{\n")
+    for key, value in header.items():
+        body = json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        f.write(f"  {json.dumps(key, ensure_ascii=False)}: {body},\n")
+    f.write('  "products": [')
+    count = 0
+    for prod in products:
+        f.write(",\n    " if count else "\n    ")
+        f.write(json.dumps(prod, ensure_ascii=False, indent=2).replace("\n", "\n    "))
+        count += 1
+    f.write("\n  ]\n}" if count else "]\n}")
+    return count
+
+
+def migrate_file(path):
+    """Mettre à jour un fichier catalogue sur place ; retourne (version d'origine, nb produits)."""
+    tmp = path + ".migrating"
+    with open(path, 'r', encoding='utf-8') as src:
+        version, products, meta = iter_catalog(src)
+        check_version(version)
+        if version == SCHEMA_VERSION:
+            return version, None
+        upgraded = (upgrade_product(p, version) for p in products)
+        with open(tmp, 'w', encoding='utf-8') as dst:
+            count = write_catalog_stream(dst, upgraded, meta)
+    os.replace(tmp, path)
+    return version, count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migration du format de catalogue")
+    parser.add_argument("paths", nargs="*", default=["data/produits.json"])
+    args = parser.parse_args()
+    for path in args.paths:
+        version, count = migrate_file(path)
+        if count is None:
+            print(f"{path}: déjà au format {SCHEMA_VERSION}")
+        else:
+            print(f"{path}: format {version} -> {SCHEMA_VERSION} ({count} produits)")
@@ -0,0 +1,452 @@
+"""Catalogue partitionné par boutique (data/boutiques/).
+
+Chaque boutique a son propre fichier, au même format que data/produits.json
+(enveloppe versionnée, avec son instantané binaire), et sa propre plage d'ids
+pour les nouveaux produits. Le registre data/boutiques/index.json associe
+chaque boutique à son fichier et à sa plage :
+
+    {"blockSize": 100000,
+     "boutiques": {"GUIFO": {"file": "guifo.json", "idRange": [100000, 199999]}, ...}}
+
+Les ids existants sont conservés lors du découpage (ils restent uniques sur
+l'ensemble des boutiques) ; seuls les nouveaux ids sont pris dans la plage de
+la boutique, si bien que deux postes qui créent des produits en même temps
+dans deux boutiques différentes ne peuvent pas obtenir le même id.
+
+data/produits.json devient la vue globale lue par le site. Elle n'est
+réassemblée qu'à la demande (merge) et seulement si un fichier de boutique a
+changé : le fragment JSON de chaque boutique est gardé dans
+.cache/boutiques/, et les boutiques inchangées sont recopiées telles quelles,
+sans être relues.
+
+Écritures concurrentes : chaque fichier de boutique a son verrou (fichier
+.lock créé de façon exclusive), tenu le temps de l'écriture seulement. Si le
+fichier a été réécrit par un autre poste depuis son chargement, les
+changements locaux (par rapport à la version chargée) sont réappliqués
+produit par produit sur la version du disque au lieu de l'écraser.
+
+Usage :
+    python catalog_shards.py split     # découper data/produits.json par boutique
+    python catalog_shards.py list
+    python catalog_shards.py merge [--force]
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import catalog_snapshot
+from catalog import Catalog, DEFAULT_JSON_FILE
+from catalog_schema import SCHEMA_VERSION, normalize_product_images, slugify
+
+SHARD_DIR = "data/boutiques"
+REGISTRY_FILE = "index.json"
+CACHE_DIR = ".cache/boutiques"
+STATE_FILE = "merge.json"
+FRAGMENT_SUFFIX = ".frag"
+# taille d'une plage d'ids ; la plage 0 est celle des ids antérieurs au découpage
+ID_BLOCK = 100000
+# fichier des produits sans boutique
+NO_BOUTIQUE_SLUG = "sans-boutique"
+LOCK_TIMEOUT = 10.0
+# un verrou plus ancien est celui d'un poste arrêté en cours d'écriture
+STALE_LOCK = 60.0
+
+
+class ShardError(ValueError):
+    pass
+
+
+class ShardBusy(ShardError):
+    pass
+
+
+@contextmanager
+def locked(path, timeout=LOCK_TIMEOUT):
+    """Verrou exclusif sur `path` (fichier `path`.lock) entre processus."""
+    lock = path + ".lock"
+    os.makedirs(os.path.dirname(lock) or ".", exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > STALE_LOCK:
+                    os.remove(lock)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() > deadline:
+                raise ShardBusy(f"{path} est en cours d'écriture par un autre poste") from None
+            time.sleep(0.05)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(lock)
+        except OSError:
+            pass
+
+
+def _stamp(path):
+    """[taille, date en ns] d'un fichier, ou None s'il n'existe pas."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _fragment(products):
+    """Produits en JSON compact, sans les crochets du tableau."""
+    return json.dumps(products, ensure_ascii=False, separators=(',', ':'))[1:-1].encode('utf-8')
+
+
+def _parse_fragment(fragment):
+    return json.loads(b'[' + fragment + b']')
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def rebase(base, ours, theirs):
+    """Réappliquer sur `theirs` les changements de `ours` par rapport à `base`.
+
+    Comparaison par id : un produit modifié ou ajouté localement remplace celui
+    du disque, un produit supprimé localement est retiré ; tout le reste
+    vient de `theirs`. Deux produits différents créés avec le même id des deux
+    côtés ne peuvent pas être fusionnés (ShardError).
+    """
+    base_by_id = {p.get('id'): p for p in base}
+    ours_by_id = {p.get('id'): p for p in ours}
+    result = []
+    for product in theirs:
+        pid = product.get('id')
+        mine = ours_by_id.get(pid)
+        if mine is None:
+            if pid not in base_by_id:
+                result.append(product)
+        elif pid not in base_by_id and mine != product:
+            raise ShardError(f"L'id {pid} vient d'être attribué par un autre poste : recharger la boutique")
+        elif mine != base_by_id.get(pid):
+            result.append(mine)
+        else:
+            result.append(product)
+    seen = {p.get('id') for p in theirs}
+    result.extend(p for pid, p in ours_by_id.items()
+                  if pid not in seen and p != base_by_id.get(pid))
+    return result
+
+
+def incoming_changes(ours, result):
+    """(produits apportés par un autre poste, ids qu'il a supprimés)."""
+    ours_by_id = {p.get('id'): p for p in ours}
+    updated = [p for p in result if ours_by_id.get(p.get('id')) != p]
+    kept = {p.get('id') for p in result}
+    return updated, [pid for pid in ours_by_id if pid not in kept]
+
+
+class ShardStore:
+    """Registre des boutiques, écriture des fichiers et vue globale."""
+
+    def __init__(self, shard_dir=SHARD_DIR, merged_file=DEFAULT_JSON_FILE, cache_dir=CACHE_DIR):
+        self.shard_dir = shard_dir
+        self.registry_file = os.path.join(shard_dir, REGISTRY_FILE)
+        self.merged_file = merged_file
+        self.cache_dir = cache_dir
+        # boutique -> (tampon, slugs) pour l'unicité des slugs entre boutiques
+        self._slugs = {}
+
+    def exists(self):
+        return os.path.exists(self.registry_file)
+
+    def registry(self):
+        """{boutique: {"file", "idRange"}} dans l'ordre de création."""
+        try:
+            with open(self.registry_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("boutiques", {})
+        except FileNotFoundError:
+            return {}
+
+    def _save_registry(self, boutiques):
+        data = json.dumps({"blockSize": ID_BLOCK, "boutiques": boutiques}, ensure_ascii=False, indent=2)
+        _write_atomic(self.registry_file, data.encode('utf-8'))
+
+    def ensure(self, boutique):
+        """Entrée du registre d'une boutique, créée (fichier et plage d'ids) au besoin."""
+        entry = self.registry().get(boutique)
+        if entry is not None:
+            return entry
+        with locked(self.registry_file):
+            boutiques = self.registry()
+            if boutique not in boutiques:
+                block = 1 + max((e["idRange"][0] // ID_BLOCK for e in boutiques.values()), default=0)
+                files = {e["file"] for e in boutiques.values()} | {REGISTRY_FILE}
+                base = slugify(boutique) or NO_BOUTIQUE_SLUG
+                name, n = f"{base}.json", 2
+                while name in files:
+                    name, n = f"{base}-{n}.json", n + 1
+                boutiques[boutique] = {"file": name,
+                                       "idRange": [block * ID_BLOCK, (block + 1) * ID_BLOCK - 1]}
+                self._save_registry(boutiques)
+            return boutiques[boutique]
+
+    def shard_file(self, boutique, entry=None):
+        entry = entry or self.ensure(boutique)
+        return os.path.join(self.shard_dir, entry["file"])
+
+    def open(self, boutique):
+        """Charger une seule boutique."""
+        catalog = BoutiqueCatalog(self, boutique)
+        catalog.load()
+        return catalog
+
+    def write_shard(self, boutique, products, expected=None, base=None):
+        """Écrire le fichier d'une boutique sous verrou.
+
+        `expected` est le tampon du fichier au chargement de `base` : si le
+        fichier a changé depuis, les changements de `products` sont réappliqués
+        sur la version du disque. Retourne (produits écrits, nouveau tampon).
+        """
+        entry = self.ensure(boutique)
+        path = self.shard_file(boutique, entry)
+        with locked(path):
+            current = _stamp(path)
+            if current is not None and current != expected and base is not None:
+                products = rebase(base, products, Catalog(path).load())
+            catalog = Catalog(path)
+            catalog.meta = {"boutique": boutique, "idRange": entry["idRange"]}
+            catalog.products = products
+            catalog.save()
+            return catalog.products, _stamp(path)
+
+    def slugs(self, boutique):
+        """Slugs d'une boutique, lus dans son instantané sans construire les produits."""
+        path = self.shard_file(boutique)
+        stamp = _stamp(path)
+        cached = self._slugs.get(boutique)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        snapshot = catalog_snapshot.open_valid(path)
+        if snapshot is not None:
+            with snapshot:
+                slugs = set(snapshot.values('slug'))
+        else:
+            slugs = {p.get('slug') for p in Catalog(path).load()}
+        self._slugs[boutique] = (stamp, slugs)
+        return slugs
+
+    def slug_taken(self, slug, exclude=None):
+        """Nom de la boutique (autre que `exclude`) qui utilise déjà ce slug, ou None."""
+        for boutique in self.registry():
+            if boutique != exclude and slug in self.slugs(boutique):
+                return boutique
+        return None
+
+    # --- vue globale ---
+
+    def _state_file(self):
+        return os.path.join(self.cache_dir, STATE_FILE)
+
+    def _load_state(self):
+        try:
+            with open(self._state_file(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, force=False):
+        """Réassembler la vue globale si besoin (verrou déjà pris).
+
+        Retourne ({boutique: (tampon, fragment)}, boutiques relues).
+        """
+        state = self._load_state()
+        known = state.get("shards", {})
+        shards = {}
+        changed = []
+        for boutique, entry in self.registry().items():
+            path = self.shard_file(boutique, entry)
+            fragment_file = os.path.join(self.cache_dir, entry["file"] + FRAGMENT_SUFFIX)
+            # tampon pris avant la lecture : une écriture concurrente sera vue au prochain passage
+            stamp = _stamp(path)
+            fragment = None
+            if stamp is None:
+                fragment = b''
+            elif not force and known.get(boutique) == stamp:
+                try:
+                    with open(fragment_file, 'rb') as f:
+                        fragment = f.read()
+                except OSError:
+                    pass
+            if fragment is None:
+                fragment = _fragment(Catalog(path).load())
+                _write_atomic(fragment_file, fragment)
+                changed.append(boutique)
+            shards[boutique] = (stamp, fragment)
+
+        stamps = {boutique: stamp for boutique, (stamp, _) in shards.items()}
+        if force or changed or stamps != known or state.get("merged") != _stamp(self.merged_file):
+            parts = [fragment for _, fragment in shards.values() if fragment]
+            data = b''.join([f'{{"schemaVersion":{SCHEMA_VERSION},"products":['.encode(),
+                             b','.join(parts), b']}'])
+            _write_atomic(self.merged_file, data)
+            state = {"shards": stamps, "merged": _stamp(self.merged_file)}
+            _write_atomic(self._state_file(), json.dumps(state).encode('utf-8'))
+        return shards, changed
+
+    def merge(self, force=False):
+        """Mettre data/produits.json à jour ; retourne les boutiques qui ont changé."""
+        with locked(self.merged_file):
+            return self._merge(force)[1]
+
+    def merged_products(self):
+        """Produits de toutes les boutiques (vue globale réassemblée si besoin)."""
+        with locked(self.merged_file):
+            self._merge()
+            return Catalog(self.merged_file).load()
+
+    def split(self, products):
+        """Découper un catalogue global en un fichier par boutique (migration)."""
+        if self.exists():
+            raise ShardError(f"Catalogue déjà partitionné ({self.registry_file})")
+        groups = {}
+        for product in products:
+            groups.setdefault(product.get('boutique') or '', []).append(product)
+        ids = [p.get('id') for p in products]
+        if len(set(ids)) != len(ids):
+            raise ShardError("Ids en double dans le catalogue : découpage impossible")
+        if any(isinstance(pid, int) and pid >= ID_BLOCK for pid in ids):
+            raise ShardError(f"Ids supérieurs à {ID_BLOCK - 1} : ils empiéteraient sur les plages des boutiques")
+        for boutique, group in groups.items():
+            self.write_shard(boutique, group)
+        self.merge(force=True)
+        return groups
+
+
+class BoutiqueCatalog(Catalog):
+    """Une seule boutique, chargée sans les autres."""
+
+    def __init__(self, store, boutique):
+        self.store = store
+        self.boutique = boutique
+        self.entry = store.ensure(boutique)
+        super().__init__(store.shard_file(boutique, self.entry))
+        self.meta = {"boutique": boutique, "idRange": self.entry["idRange"]}
+        # tampon et contenu du fichier au chargement, pour réappliquer nos changements
+        self._stamp = None
+        self._base = None
+        # (produits mis à jour, ids supprimés) par un autre poste, vus à la dernière sauvegarde
+        self.rebased = None
+
+    def load(self):
+        self._stamp = _stamp(self.json_file)
+        super().load()
+        self.meta = {**self.meta, "boutique": self.boutique, "idRange": self.entry["idRange"]}
+        self._base = _fragment(self.products)
+        return self.products
+
+    def save(self):
+        ours = [normalize_product_images(prod) for prod in self.products]
+        base = _parse_fragment(self._base) if self._base is not None else None
+        written, self._stamp = self.store.write_shard(self.boutique, ours, self._stamp, base)
+        updated, removed = incoming_changes(ours, written)
+        self.rebased = (updated, removed) if updated or removed else None
+        self.products = written
+        self._base = _fragment(written)
+
+    def slug_exists(self, slug, exclude_id=None):
+        """Le slug doit aussi être unique dans les autres boutiques (une page par slug)."""
+        return (super().slug_exists(slug, exclude_id)
+                or self.store.slug_taken(slug, exclude=self.boutique) is not None)
+
+
+class ShardedCatalog(Catalog):
+    """Vue globale d'un catalogue partitionné : les sauvegardes sont réparties par boutique."""
+
+    def __init__(self, store=None):
+        self.store = store or ShardStore()
+        super().__init__(self.store.merged_file)
+        # boutique -> (tampon, fragment) au chargement
+        self._base = {}
+        self.rebased = None
+
+    def load(self):
+        with locked(self.json_file):
+            self._base = self.store._merge()[0]
+            return super().load()
+
+    def save(self):
+        """Réécrire uniquement les boutiques dont les produits ont changé."""
+        ours = [normalize_product_images(prod) for prod in self.products]
+        groups = {boutique: [] for boutique in self.store.registry()}
+        for product in ours:
+            groups.setdefault(product.get('boutique') or '', []).append(product)
+        result = []
+        for boutique, group in groups.items():
+            stamp, fragment = self._base.get(boutique, (None, None))
+            new_fragment = _fragment(group)
+            if new_fragment == (fragment or b''):
+                result.extend(group)
+                continue
+            base = _parse_fragment(fragment) if fragment is not None else None
+            written, stamp = self.store.write_shard(boutique, group, stamp, base)
+            self._base[boutique] = (stamp, _fragment(written))
+            result.extend(written)
+        updated, removed = incoming_changes(ours, result)
+        self.rebased = (updated, removed) if updated or removed else None
+        self.products = result
+        self.store.merge()
+
+    def next_id(self, boutique=''):
+        """Prochain id dans la plage de la boutique."""
+        return super().next_id(self.store.ensure(boutique)["idRange"])
+
+
+def open_catalog(json_file=DEFAULT_JSON_FILE, boutique=None, store=None):
+    """Catalogue à ouvrir : une boutique, la vue globale partitionnée, ou le fichier unique."""
+    store = store or ShardStore(merged_file=json_file)
+    if boutique is not None:
+        if not store.exists():
+            raise ShardError("Catalogue non partitionné : lancer d'abord « python catalog_shards.py split »")
+        return BoutiqueCatalog(store, boutique)
+    if json_file == store.merged_file and store.exists():
+        return ShardedCatalog(store)
+    return Catalog(json_file)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Catalogue partitionné par boutique")
+    parser.add_argument("--file", default=DEFAULT_JSON_FILE, help="vue globale")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("split", help="découper le catalogue global par boutique")
+    sub.add_parser("list", help="boutiques, fichiers et plages d'ids")
+    merge = sub.add_parser("merge", help="réassembler la vue globale")
+    merge.add_argument("--force", action="store_true", help="relire toutes les boutiques")
+    args = parser.parse_args()
+
+    store = ShardStore(merged_file=args.file)
+    if args.command == "split":
+        catalog = Catalog(args.file)
+        catalog.load()
+        for boutique, group in store.split(catalog.products).items():
+            print(f"{boutique or '(sans boutique)'} : {len(group)} produit(s) -> {store.shard_file(boutique)}")
+    elif args.command == "list":
+        for boutique, entry in store.registry().items():
+            start, end = entry["idRange"]
+            count = len(Catalog(store.shard_file(boutique, entry)).load())
+            print(f"{boutique or '(sans boutique)':<30} {entry['file']:<30} ids {start}-{end} "
+                  f"{count} produit(s)")
+    else:
+        changed = store.merge(force=args.force)
+        print(f"{len(changed)} boutique(s) relue(s) : {', '.join(changed) or '-'}")
@@ -0,0 +1,494 @@
+"""Détection des produits et images en quasi-double.
+
+Texte : le titre (trigrammes de caractères) et le corps (paires de mots du
+résumé et des caractéristiques) sont réduits, sans accents ni casse, à des
+ensembles de fragments résumés chacun par une signature MinHash « à une
+permutation » de SIGNATURE_SIZE valeurs. Un index LSH (BANDS bandes de ROWS
+valeurs) ne propose que les produits qui partagent au moins une bande ; la
+similarité estimée est ensuite vérifiée sur la signature. Un titre presque
+identique suffit, même si la description a été réécrite.
+
+Images : empreinte perceptive dHash de 64 bits (Pillow requis), indexée en
+IMAGE_MAX_DISTANCE + 1 morceaux : deux empreintes à moins de
+IMAGE_MAX_DISTANCE bits d'écart ont forcément un morceau identique, ce qui
+évite de comparer avec tout le catalogue. Sans Pillow, seules les copies
+exactes (même contenu) sont détectées. Les empreintes sont gardées par
+empreinte de contenu dans .cache/image_hashes.json.
+
+Le gestionnaire vérifie chaque produit ajouté, ou dont le titre, le texte ou
+les images ont changé ; en ligne de commande :
+  python dedup.py               rapport pour tout le catalogue
+  python dedup.py check FICHIER  produits d'un import comparés au catalogue
+"""
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow absent : copies exactes seulement
+    Image = None
+
+from catalog_index import fold_text
+from catalog_schema import normalize_path
+from image_manifest import content_hash
+
+SIGNATURE_SIZE = 32
+BANDS = 8
+ROWS = SIGNATURE_SIZE // BANDS
+# Similarité minimale (estimation de Jaccard) par partie du texte
+TEXT_THRESHOLDS = {'title': 0.7, 'body': 0.6}
+
+IMAGE_MAX_DISTANCE = 6
+IMAGE_CHUNKS = IMAGE_MAX_DISTANCE + 1
+
+# Champs dont dépendent les correspondances d'un produit
+COMPARED_FIELDS = ('title', 'short', 'features', 'images')
+
+HASH_CACHE = ".cache/image_hashes.json"
+PARALLEL_THRESHOLD = 8
+
+_MASK64 = (1 << 64) - 1
+_EMPTY = 1 << 64
+_BIN_BITS = SIGNATURE_SIZE.bit_length() - 1
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(product):
+    """Fragments de texte comparés entre produits : {'title': ..., 'body': ...}."""
+    title = ' '.join(_WORD.findall(fold_text(product.get('title'))))
+    body = ' '.join([str(product.get('short') or '')] + [str(f) for f in product.get('features') or []])
+    words = _WORD.findall(fold_text(body))
+    return {
+        'title': {title[i:i + 3] for i in range(max(1, len(title) - 2))} if title else set(),
+        'body': {f"{a} {b}" for a, b in zip(words, words[1:])},
+    }
+
+
+def signatures(product):
+    """Signatures des parties du texte qui ne sont pas vides."""
+    out = {}
+    for part, fragments in shingles(product).items():
+        sig = signature(fragments)
+        if sig is not None:
+            out[part] = sig
+    return out
+
+
+def signature(fragments):
+    """Signature MinHash à une permutation (None si l'ensemble est vide).
+
+    Chaque fragment est haché une seule fois ; ses bits de poids faible
+    choisissent une case, où l'on garde le minimum. Les cases vides reprennent
+    la valeur de la case suivante (densification), décalée pour rester distincte.
+    """
+    bins = [_EMPTY] * SIGNATURE_SIZE
+    slot_mask = SIGNATURE_SIZE - 1
+    for shingle in fragments:
+        # hash() des chaînes change d'un processus à l'autre, mais les
+        # signatures ne sont jamais enregistrées : seule la cohérence compte ici
+        h = hash(shingle) & _MASK64
+        value = h >> _BIN_BITS
+        if value < bins[h & slot_mask]:
+            bins[h & slot_mask] = value
+    if min(bins) == _EMPTY:
+        return None
+    for i in range(SIGNATURE_SIZE):
+        step = 1
+        while bins[i] == _EMPTY:
+            source = bins[(i + step) % SIGNATURE_SIZE]
+            if source != _EMPTY:
+                bins[i] = (source + step * 0x9E3779B97F4A7C15) & _MASK64
+            step += 1
+    return tuple(bins)
+
+
+def similarity(sig_a, sig_b):
+    """Estimation de l'indice de Jaccard entre deux signatures."""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / SIGNATURE_SIZE
+
+
+def dhash(path):
+    """Empreinte perceptive (différences horizontales sur une image 9x8 en gris)."""
+    with Image.open(path) as img:
+        img.draft('L', (64, 64))
+        pixels = list(img.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def _chunks(value):
+    """Découpage des 64 bits en IMAGE_CHUNKS morceaux (clés de l'index de Hamming)."""
+    out = []
+    start = 0
+    for i in range(IMAGE_CHUNKS):
+        width = (64 - start) // (IMAGE_CHUNKS - i)
+        out.append((i, (value >> start) & ((1 << width) - 1)))
+        start += width
+    return out
+
+
+def _hash_task(path):
+    try:
+        digest = content_hash(path)
+    except OSError:
+        return path, None, None
+    phash = None
+    if Image is not None:
+        try:
+            phash = dhash(path)
+        except (OSError, ValueError):
+            pass
+    return path, digest, phash
+
+
+class ImageHasher:
+    """Empreintes de contenu et perceptives des images, avec cache disque."""
+
+    def __init__(self, cache_file=HASH_CACHE, manifest=None):
+        self.cache_file = cache_file
+        # manifeste des images : empreintes de contenu déjà connues
+        self.manifest = manifest
+        # empreinte de contenu -> dHash en hexadécimal ('' si non calculable)
+        self.phashes = {}
+        # (chemin, taille, mtime) -> empreinte de contenu
+        self._contents = {}
+        self._dirty = False
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                self.phashes = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _stat_key(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_size, st.st_mtime_ns)
+
+    def known(self, path):
+        """(empreinte de contenu, dHash) sans lire le fichier ; None si inconnu."""
+        key = self._stat_key(path)
+        if key is None:
+            return None
+        digest = self._contents.get(key)
+        if digest is None and self.manifest is not None:
+            entry = self.manifest.files.get(path)
+            if entry and entry[:2] == [key[1], key[2]]:
+                digest = entry[2]
+        if digest is None or digest not in self.phashes:
+            return None
+        self._contents[key] = digest
+        phash = self.phashes[digest]
+        return digest, int(phash, 16) if phash else None
+
+    def hash_many(self, paths, workers=None):
+        """Empreintes de ces images, calculées (en parallèle) si besoin : {chemin: (contenu, dHash)}."""
+        out = {}
+        todo = []
+        for path in dict.fromkeys(paths):
+            known = self.known(path)
+            if known is not None:
+                out[path] = known
+            elif self._stat_key(path) is not None:
+                todo.append(path)
+        if len(todo) >= PARALLEL_THRESHOLD and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_hash_task, todo, chunksize=4))
+        else:
+            results = [_hash_task(path) for path in todo]
+        for path, digest, phash in results:
+            if digest is None:
+                continue
+            self._contents[self._stat_key(path)] = digest
+            if phash is not None:
+                self.phashes[digest] = f"{phash:016x}"
+                self._dirty = True
+            elif Image is None:
+                # sans Pillow : gardé en mémoire seulement, pour ne pas relire le fichier
+                self.phashes[digest] = ""
+            out[path] = (digest, phash)
+        return out
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.phashes, f)
+        os.replace(tmp, self.cache_file)
+        self._dirty = False
+
+
+def compared(product):
+    """Valeurs des champs comparés : si elles n'ont pas changé, les correspondances non plus."""
+    return [product.get(field) for field in COMPARED_FIELDS]
+
+
+def product_images(product):
+    return [normalize_path(img) for img in product.get('images') or []
+            if img and not re.match(r"^(https?:|data:|//)", str(img))]
+
+
+class DuplicateIndex:
+    """Index LSH (texte) et de Hamming (images) des produits du catalogue."""
+
+    def __init__(self, products=(), hasher=None, hash_images=False):
+        self.hasher = hasher
+        self.titles = {}
+        self.signatures = {}
+        self._buckets = {}
+        # id -> [(chemin, empreinte de contenu, dHash)]
+        self.images = {}
+        self._exact = {}
+        self._chunks = {}
+        # id -> champs comparés au moment de l'indexation
+        self._compared = {}
+        for product in products:
+            self.add(product, hash_images)
+
+    def _image_hashes(self, product, compute):
+        paths = product_images(product)
+        if self.hasher is None or not paths:
+            return []
+        if compute:
+            hashes = self.hasher.hash_many(paths)
+        else:
+            hashes = {p: h for p in paths if (h := self.hasher.known(p)) is not None}
+        return [(p, *hashes[p]) for p in paths if p in hashes]
+
+    def add(self, product, hash_images=True):
+        """Indexer un produit ; hash_images=False n'utilise que les empreintes déjà en cache."""
+        pid = product.get('id')
+        self.remove(pid)
+        self._compared[pid] = compared(product)
+        self.titles[pid] = product.get('title', '')
+        sigs = signatures(product)
+        if sigs:
+            self.signatures[pid] = sigs
+            for key in _band_keys(sigs):
+                self._buckets.setdefault(key, set()).add(pid)
+        images = self._image_hashes(product, hash_images)
+        if images:
+            self.images[pid] = images
+            for _, digest, phash in images:
+                self._exact.setdefault(digest, set()).add(pid)
+                if phash is not None:
+                    for chunk in _chunks(phash):
+                        self._chunks.setdefault(chunk, set()).add(pid)
+
+    update = add
+
+    def sync(self, products):
+        """Suivre le catalogue : réindexer les produits modifiés, oublier les retirés.
+
+        Retourne le nombre de produits réindexés ou retirés.
+        """
+        seen = set()
+        touched = 0
+        for product in products:
+            pid = product.get('id')
+            seen.add(pid)
+            if pid not in self._compared or self._compared[pid] != compared(product):
+                self.add(product, hash_images=False)
+                touched += 1
+        for pid in [pid for pid in self._compared if pid not in seen]:
+            self.remove(pid)
+            touched += 1
+        return touched
+
+    def remove(self, pid):
+        self._compared.pop(pid, None)
+        self.titles.pop(pid, None)
+        sigs = self.signatures.pop(pid, None)
+        if sigs is not None:
+            for key in _band_keys(sigs):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(pid)
+                    if not bucket:
+                        del self._buckets[key]
+        for _, digest, phash in self.images.pop(pid, []):
+            ids = self._exact.get(digest)
+            if ids is not None:
+                ids.discard(pid)
+                if not ids:
+                    del self._exact[digest]
+            if phash is not None:
+                for chunk in _chunks(phash):
+                    ids = self._chunks.get(chunk)
+                    if ids is not None:
+                        ids.discard(pid)
+                        if not ids:
+                            del self._chunks[chunk]
+
+    def _text_matches(self, sigs, exclude):
+        """{id: meilleure similarité} des produits au texte proche."""
+        candidates = set()
+        for key in _band_keys(sigs):
+            candidates |= self._buckets.get(key, set())
+        candidates.discard(exclude)
+        out = {}
+        for pid in candidates:
+            other = self.signatures[pid]
+            for part, sig in sigs.items():
+                if part in other:
+                    score = similarity(sig, other[part])
+                    if score >= TEXT_THRESHOLDS[part] and score > out.get(pid, 0):
+                        out[pid] = score
+        return out
+
+    def _image_matches(self, images, exclude):
+        out = {}
+        for path, digest, phash in images:
+            candidates = set(self._exact.get(digest, ()))
+            if phash is not None:
+                for chunk in _chunks(phash):
+                    candidates |= self._chunks.get(chunk, set())
+            candidates.discard(exclude)
+            for pid in candidates:
+                for other_path, other_digest, other_phash in self.images.get(pid, ()):
+                    if other_digest == digest:
+                        distance = 0
+                    elif phash is not None and other_phash is not None:
+                        distance = bin(phash ^ other_phash).count('1')
+                    else:
+                        continue
+                    if distance <= IMAGE_MAX_DISTANCE:
+                        out.setdefault(pid, []).append((path, other_path, distance))
+        return out
+
+    def find(self, product, exclude_id=None, hash_images=True):
+        """Produits probablement en double, du plus ressemblant au moins ressemblant.
+
+        Chaque résultat : {"id", "title", "text" (similarité estimée ou None),
+        "images" [(image du produit, image de l'autre, distance)]}.
+        """
+        exclude = product.get('id') if exclude_id is None else exclude_id
+        text = self._text_matches(signatures(product), exclude)
+        images = self._image_matches(self._image_hashes(product, hash_images), exclude)
+        results = [
+            {"id": pid, "title": self.titles.get(pid, ''), "text": text.get(pid),
+             "images": images.get(pid, [])}
+            for pid in set(text) | set(images)
+        ]
+        results.sort(key=lambda r: (-len(r["images"]), -(r["text"] or 0)))
+        return results
+
+    def report(self):
+        """Groupes de produits en double dans tout l'index : [{"ids", "pairs"}]."""
+        parent = {}
+
+        def root(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        pairs = []
+        for pid in list(self.titles):
+            text = self._text_matches(self.signatures.get(pid, {}), pid)
+            images = self._image_matches(self.images.get(pid, []), pid)
+            for other in set(text) | set(images):
+                if _order(pid) < _order(other):
+                    pairs.append({"ids": [pid, other], "text": text.get(other),
+                                  "images": images.get(other, [])})
+                    parent[root(other)] = root(pid)
+        groups = {}
+        for pair in pairs:
+            groups.setdefault(root(pair["ids"][0]), []).append(pair)
+        out = []
+        for group_pairs in groups.values():
+            ids = sorted({pid for pair in group_pairs for pid in pair["ids"]}, key=_order)
+            out.append({"ids": ids, "titles": [self.titles.get(pid, '') for pid in ids],
+                        "pairs": group_pairs})
+        out.sort(key=lambda g: _order(g["ids"][0]))
+        return out
+
+
+def _band_keys(sigs):
+    for part, sig in sigs.items():
+        for band in range(BANDS):
+            yield (part, band, sig[band * ROWS:(band + 1) * ROWS])
+
+
+def _order(pid):
+    return (not isinstance(pid, int), pid if isinstance(pid, int) else 0, str(pid))
+
+
+def describe(match):
+    """Texte court d'un doublon probable (pour une boîte de dialogue ou la console)."""
+    reasons = []
+    if match["text"] is not None:
+        reasons.append(f"texte similaire à {match['text']:.0%}")
+    if match["images"]:
+        exact = sum(1 for _, _, d in match["images"] if d == 0)
+        if exact:
+            reasons.append(f"{exact} image(s) identique(s)")
+        if len(match["images"]) > exact:
+            reasons.append(f"{len(match['images']) - exact} image(s) ressemblante(s)")
+    return f"#{match['id']} {match['title']} ({', '.join(reasons)})"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from catalog import Catalog
+    from catalog_schema import split_document
+    from image_manifest import ImageManifest
+
+    parser = argparse.ArgumentParser(description="Produits et images en quasi-double")
+    parser.add_argument("command", nargs="?", choices=("report", "check"), default="report")
+    parser.add_argument("file", nargs="?", help="fichier JSON de produits à importer (check)")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus")
+    parser.add_argument("--json", action="store_true", help="afficher le résultat en JSON")
+    args = parser.parse_args()
+
+    catalog = Catalog()
+    catalog.load()
+    hasher = ImageHasher(manifest=ImageManifest())
+    # empreintes de tout le catalogue calculées d'un coup, en parallèle
+    hasher.hash_many([p for prod in catalog.products for p in product_images(prod)], args.workers)
+    index = DuplicateIndex(catalog.products, hasher)
+
+    if args.command == "check":
+        if not args.file:
+            parser.error("check : fichier à importer manquant")
+        with open(args.file, 'r', encoding='utf-8') as f:
+            _, incoming, _ = split_document(json.load(f))
+        hasher.hash_many([p for prod in incoming for p in product_images(prod)], args.workers)
+        result = []
+        for n, prod in enumerate(incoming):
+            # les produits importés sont aussi comparés entre eux
+            candidate = {**prod, "id": prod.get('id', f"import-{n}")}
+            matches = index.find(candidate, exclude_id=object())
+            result.append({"product": candidate["id"], "title": prod.get('title', ''), "matches": matches})
+            index.add(candidate)
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+        else:
+            for item in result:
+                if item["matches"]:
+                    print(f"{item['product']} {item['title']}")
+                    for match in item["matches"]:
+                        print(f"    ~ {describe(match)}")
+            print(f"{sum(1 for item in result if item['matches'])} produit(s) importé(s) "
+                  f"avec des doublons probables sur {len(result)}")
+    else:
+        groups = index.report()
+        if args.json:
+            print(json.dumps(groups, ensure_ascii=False, indent=2))
+        else:
+            for group in groups:
+                print(" / ".join(f"#{pid} {title}" for pid, title in zip(group["ids"], group["titles"])))
+                for pair in group["pairs"]:
+                    text = f"texte {pair['text']:.0%}" if pair["text"] is not None else "texte différent"
+                    print(f"    {pair['ids'][0]} ~ {pair['ids'][1]} : {text}, {len(pair['images'])} image(s) proche(s)")
+            print(f"{len(groups)} groupe(s) de doublons probables")
+    hasher.save()
@@ -0,0 +1,337 @@
+"""Manifeste des images du catalogue : dimensions, couleur dominante, aperçu flou.
+
+Pour chaque image utilisée par un produit, le manifeste publié
+(data/images.json, à côté de produits.json) donne :
+  - width / height : dimensions d'origine, pour réserver la place de l'image ;
+  - color : couleur dominante ("#rrggbb"), affichée pendant le chargement ;
+  - lqip : minuscule aperçu flou en data URI base64 (quelques centaines d'octets).
+
+Les métadonnées sont mises en cache par empreinte du contenu (SHA-1) dans
+.cache/image_meta.json ; la taille et la date de modification de chaque fichier
+y sont aussi notées, de sorte qu'un fichier inchangé n'est même pas relu.
+Les images nouvelles ou modifiées sont analysées dans un pool de processus.
+
+Les dimensions sont lues dans l'en-tête des fichiers (PNG, JPEG, GIF, WebP,
+AVIF, SVG) sans dépendance. La couleur et l'aperçu nécessitent Pillow
+(requirements.txt) ; s'il manque, ces deux champs valent None.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageFilter
+except ImportError:  # Pillow absent : dimensions seulement
+    Image = None
+
+from catalog_schema import normalize_path
+
+MANIFEST_FILE = "data/images.json"
+CACHE_FILE = ".cache/image_meta.json"
+MANIFEST_VERSION = 1
+
+# Côté le plus long de l'aperçu flou, en pixels
+LQIP_SIZE = 16
+LQIP_QUALITY = 40
+
+PARALLEL_THRESHOLD = 8
+_CHUNK = 1 << 20
+
+
+def content_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, io.SEEK_CUR)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        # SOF0..SOF15 sauf DHT (C4), JPG (C8) et DAC (CC)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, io.SEEK_CUR)
+
+
+def _svg_length(value):
+    m = re.match(r"\s*([0-9.]+)\s*(px)?\s*$", value or "")
+    return round(float(m.group(1))) if m else None
+
+
+def _svg_size(head):
+    text = head.decode('utf-8', 'ignore')
+    tag = re.search(r"<svg\b[^>]*>", text, re.S)
+    if not tag:
+        return None
+    attrs = dict(re.findall(r'([\w:-]+)\s*=\s*["\']([^"\']*)["\']', tag.group(0)))
+    width, height = _svg_length(attrs.get('width')), _svg_length(attrs.get('height'))
+    if width and height:
+        return width, height
+    box = attrs.get('viewBox', '').replace(',', ' ').split()
+    if len(box) == 4:
+        return round(float(box[2])), round(float(box[3]))
+    return None
+
+
+def image_size(path):
+    """(largeur, hauteur) lues dans l'en-tête du fichier, ou None si inconnu."""
+    with open(path, 'rb') as f:
+        head = f.read(64 * 1024)
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"\xff\xd8"):
+            return _jpeg_size(f)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            kind = head[12:16]
+            if kind == b"VP8X":
+                w = int.from_bytes(head[24:27], 'little') + 1
+                h = int.from_bytes(head[27:30], 'little') + 1
+                return w, h
+            if kind == b"VP8L":
+                bits = int.from_bytes(head[21:25], 'little')
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if kind == b"VP8 ":
+                w, h = struct.unpack("<HH", head[26:30])
+                return w & 0x3FFF, h & 0x3FFF
+        if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis", b"mif1"):
+            # boîte 'ispe' : version/flags puis largeur et hauteur
+            pos = head.find(b"ispe")
+            if pos >= 0:
+                return struct.unpack(">II", head[pos + 8:pos + 16])
+        if b"<svg" in head:
+            return _svg_size(head)
+    return None
+
+
+def _preview(path):
+    """(couleur dominante, aperçu flou en data URI) avec Pillow."""
+    with Image.open(path) as img:
+        # décodage JPEG à une résolution réduite : bien plus rapide
+        img.draft('RGB', (LQIP_SIZE * 8, LQIP_SIZE * 8))
+        img = img.convert('RGB')
+        img.thumbnail((LQIP_SIZE, LQIP_SIZE))
+    r, g, b = img.resize((1, 1), Image.BOX).getpixel((0, 0))
+    buf = io.BytesIO()
+    img.filter(ImageFilter.GaussianBlur(1)).save(buf, 'JPEG', quality=LQIP_QUALITY, optimize=True)
+    lqip = "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode('ascii')
+    return f"#{r:02x}{g:02x}{b:02x}", lqip
+
+
+def analyze_image(path):
+    """Empreinte et métadonnées d'un fichier image (exécuté dans un processus du pool)."""
+    digest = content_hash(path)
+    try:
+        size = image_size(path)
+    except (OSError, struct.error, ValueError):
+        size = None
+    meta = {"width": size[0] if size else None, "height": size[1] if size else None,
+            "color": None, "lqip": None}
+    if Image is None:
+        return digest, meta
+    # aperçus tentés : l'entrée n'est plus à recalculer (même si le format ne s'y prête pas)
+    meta["previews"] = True
+    if not path.lower().endswith('.svg'):
+        try:
+            meta["color"], meta["lqip"] = _preview(path)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            pass
+        if size is None and meta["lqip"]:
+            with Image.open(path) as img:
+                meta["width"], meta["height"] = img.size
+    return digest, meta
+
+
+def _analyze_task(args):
+    path, full_path = args
+    try:
+        return path, analyze_image(full_path)
+    except OSError:
+        return path, None
+
+
+class ImageManifest:
+    """Cache des métadonnées d'images et publication du manifeste."""
+
+    def __init__(self, root=".", cache_file=CACHE_FILE, manifest_file=MANIFEST_FILE):
+        self.root = root
+        self.cache_file = os.path.join(root, cache_file)
+        self.manifest_file = os.path.join(root, manifest_file)
+        # chemin -> [taille, mtime_ns, empreinte]
+        self.files = {}
+        # empreinte -> métadonnées
+        self.images = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.images = data.get("images", {})
+        except (OSError, ValueError):
+            self.files, self.images = {}, {}
+
+    def _stat(self, path):
+        try:
+            st = os.stat(os.path.join(self.root, path))
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def refresh(self, paths, workers=None):
+        """Mettre à jour le cache pour ces images ; retourne les chemins dont l'entrée a changé."""
+        stale = {}
+        missing = []
+        for path in paths:
+            stat = self._stat(path)
+            if stat is None:
+                missing.append(path)
+                continue
+            known = self.files.get(path)
+            if (known and known[:2] == stat and known[2] in self.images
+                    and (Image is None or self.images[known[2]].get("previews"))):
+                continue
+            # sinon : fichier nouveau ou modifié, ou analysé sans Pillow alors qu'il est là
+            stale[path] = stat
+
+        changed = [path for path in missing if self.files.pop(path, None) is not None]
+        tasks = [(path, os.path.join(self.root, path)) for path in stale]
+        if len(tasks) >= PARALLEL_THRESHOLD and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_analyze_task, tasks))
+        else:
+            results = [_analyze_task(task) for task in tasks]
+
+        for path, result in results:
+            previous = self.files.get(path)
+            if result is None or self._stat(path) != stale[path]:
+                # fichier illisible, supprimé ou modifié pendant l'analyse : entrée oubliée,
+                # l'image sera relue à la prochaine mise à jour
+                if self.files.pop(path, None) is not None:
+                    changed.append(path)
+                continue
+            digest, meta = result
+            before = self.images.get(previous[2]) if previous else None
+            self.files[path] = stale[path] + [digest]
+            self.images[digest] = meta
+            # même contenu mais aperçus nouvellement calculés : les pages sont à refaire aussi
+            if not previous or previous[2] != digest or before != meta:
+                changed.append(path)
+        return changed
+
+    def entry(self, path):
+        """Métadonnées publiées d'une image, ou None si inconnue."""
+        known = self.files.get(path)
+        if not known or known[2] not in self.images:
+            return None
+        meta = {k: v for k, v in self.images[known[2]].items() if k != "previews"}
+        return {"hash": known[2], **meta}
+
+    def manifest(self, paths):
+        images = {}
+        for path in sorted(set(paths)):
+            entry = self.entry(path)
+            if entry is not None:
+                images[path] = entry
+        return {"schemaVersion": MANIFEST_VERSION, "images": images}
+
+    def save(self, keep_paths=None):
+        """Écrire le cache ; les entrées des images qui ne sont plus utilisées sont oubliées."""
+        if keep_paths is not None:
+            keep = set(keep_paths)
+            self.files = {p: v for p, v in self.files.items() if p in keep}
+            used = {v[2] for v in self.files.values()}
+            self.images = {h: m for h, m in self.images.items() if h in used}
+        _write_json(self.cache_file, {"files": self.files, "images": self.images})
+
+    def publish(self, products, workers=None):
+        """Analyser les images des produits et publier le manifeste.
+
+        Retourne (manifeste, chemins dont les métadonnées ont changé).
+        """
+        paths = product_image_paths(products)
+        changed = self.refresh(paths, workers)
+        manifest = self.manifest(paths)
+        _write_json(self.manifest_file, manifest, compact=True)
+        self.save(paths)
+        return manifest, changed
+
+
+def product_image_paths(products):
+    """Chemins (relatifs à la racine du site) des images locales des produits."""
+    paths = []
+    seen = set()
+    for product in products:
+        for img in product.get('images') or []:
+            path = normalize_path(img)
+            if not path or re.match(r"^(https?:|data:|//)", path) or path in seen:
+                continue
+            seen.add(path)
+            paths.append(path)
+    return paths
+
+
+def image_attrs(meta):
+    """Attributs HTML qui réservent la place d'une image et affichent son aperçu."""
+    if not meta or not meta.get("width") or not meta.get("height"):
+        return ""
+    attrs = f' width="{meta["width"]}" height="{meta["height"]}"'
+    background = []
+    if meta.get("lqip"):
+        background.append(f"url({meta['lqip']}) center/cover no-repeat")
+    if meta.get("color"):
+        background.append(meta["color"])
+    if background:
+        attrs += f' style="background:{" ".join(background)}"'
+    return attrs
+
+
+def _write_json(path, data, compact=False):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        if compact:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from catalog import Catalog
+
+    parser = argparse.ArgumentParser(description="Publication du manifeste des images")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus")
+    args = parser.parse_args()
+
+    catalog = Catalog()
+    catalog.load()
+    manifest, changed = ImageManifest().publish(catalog.products, args.workers)
+    print(f"{len(manifest['images'])} image(s) dans {MANIFEST_FILE}, {len(changed)} mise(s) à jour")
+    if Image is None:
+        print("Pillow absent : couleurs et aperçus non calculés")
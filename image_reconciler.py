@@ -0,0 +1,290 @@
+"""Rapprochement entre les fichiers de img/ et les images citées par le catalogue.
+
+Signale :
+  - les images manquantes : chemins cités par data/produits.json (vue
+    globale réassemblée si le catalogue est partitionné par boutique) ou
+    data/Deals.json qui n'existent pas sur le disque ;
+  - les noms approchants : pour une image manquante, le fichier qui ne
+    diffère que par la forme Unicode (NFC/NFD, fréquente avec les fichiers
+    copiés depuis macOS), la casse, l'apostrophe (’ / ') ou les espaces ;
+  - les orphelines : fichiers de img/imgProduct que plus aucun produit ne cite.
+
+Les chemins sont comparés après la même normalisation des séparateurs que
+normalize_path, puis mise en forme NFC.
+
+Le parcours de img/ se fait en parallèle, dossier par dossier, et s'appuie
+sur un instantané (.cache/img_snapshot.json) : un dossier dont la date de
+modification n'a pas changé n'est pas relu.
+
+Le mode quarantaine déplace les orphelines dans .quarantine/<date>/ (exclu du
+site publié) avec un manifeste qui permet de les restaurer ; rien n'est
+jamais supprimé.
+"""
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from difflib import get_close_matches
+
+from catalog_schema import SchemaError, normalize_path, split_document
+from catalog_shards import ShardStore
+
+IMG_DIR = "img"
+CATALOG_FILES = ("data/produits.json", "data/Deals.json")
+# Dossiers dont les fichiers non cités sont des orphelines (logos, bannières... sont cités par le HTML)
+ORPHAN_DIRS = ("img/imgProduct",)
+SNAPSHOT_FILE = ".cache/img_snapshot.json"
+QUARANTINE_DIR = ".quarantine"
+QUARANTINE_MANIFEST = "manifest.json"
+
+NEAR_MISS_CUTOFF = 0.85
+
+
+def match_key(path):
+    """Clé de comparaison exacte : séparateurs '/' et forme Unicode NFC."""
+    path = unicodedata.normalize('NFC', normalize_path(str(path)).strip())
+    while path.startswith('./'):
+        path = path[2:]
+    return path
+
+
+def loose_key(path):
+    """Clé de comparaison approchée : sans accents, casse, apostrophes ni espaces superflus."""
+    decomposed = unicodedata.normalize('NFKD', match_key(path))
+    text = ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    text = text.replace('’', "'").replace('‘', "'")
+    return re.sub(r'[\s_]+', ' ', text)
+
+
+def _scan_dir(path, previous):
+    """Lister un dossier, ou reprendre l'instantané s'il n'a pas changé."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return path, None, False
+    if previous and previous.get("mtime") == mtime:
+        return path, previous, True
+    files, dirs = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    return path, {"mtime": mtime, "files": sorted(files), "dirs": sorted(dirs)}, False
+
+
+def scan_tree(root, snapshot=None, workers=None):
+    """Parcourir `root` niveau par niveau en parallèle.
+
+    Retourne (nouvel instantané {dossier: entrée}, nombre de dossiers repris tels quels).
+    """
+    snapshot = snapshot or {}
+    tree = {}
+    reused = 0
+    pending = [root]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending:
+            level = pool.map(lambda d: _scan_dir(d, snapshot.get(d)), pending)
+            pending = []
+            for path, entry, was_reused in level:
+                if entry is None:
+                    continue
+                tree[path] = entry
+                reused += was_reused
+                pending.extend(f"{path}/{name}" for name in entry["dirs"])
+    return tree, reused
+
+
+def tree_files(tree):
+    """Chemins de tous les fichiers de l'instantané."""
+    for path, entry in tree.items():
+        for name in entry["files"]:
+            yield f"{path}/{name}"
+
+
+def catalog_references(catalog_files=CATALOG_FILES, store=None):
+    """Liste de (fichier catalogue, id produit, titre, chemin d'image cité).
+
+    Si le catalogue est partitionné par boutique, la vue globale est d'abord
+    réassemblée depuis les fichiers des boutiques, qui font foi.
+    """
+    store = store or ShardStore()
+    refs = []
+    for catalog_file in catalog_files:
+        if os.path.normpath(catalog_file) == os.path.normpath(store.merged_file) and store.exists():
+            store.merge()
+        try:
+            with open(catalog_file, 'r', encoding='utf-8') as f:
+                _, products, _ = split_document(json.load(f))
+        except FileNotFoundError:
+            continue
+        except ValueError as e:
+            raise SchemaError(f"{catalog_file}: {e}") from e
+        for product in products:
+            for image in product.get('images') or []:
+                if image and not re.match(r"^(https?:|data:|//)", str(image)):
+                    refs.append((catalog_file, product.get('id'), product.get('title', ''), image))
+    return refs
+
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_snapshot(tree, path=SNAPSHOT_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(tree, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def reconcile(refs, files, orphan_dirs=ORPHAN_DIRS):
+    """Comparer les références du catalogue aux fichiers présents.
+
+    Retourne {"missing": [...], "near_misses": [...], "orphans": [...]} où chaque
+    image manquante est {"file", "id", "title", "path"} et chaque nom approchant
+    ajoute "candidate" (le fichier existant) et "reason".
+    """
+    by_key = {}
+    by_loose = {}
+    for path in files:
+        by_key.setdefault(match_key(path), path)
+        by_loose.setdefault(loose_key(path), []).append(path)
+
+    referenced = set()
+    missing, near_misses = [], []
+    for catalog_file, pid, title, image in refs:
+        key = match_key(image)
+        found = by_key.get(key)
+        if found is not None:
+            referenced.add(found)
+            if found != normalize_path(image):
+                # présent seulement après normalisation NFC : introuvable sur un serveur Linux
+                near_misses.append({"file": catalog_file, "id": pid, "title": title, "path": image,
+                                    "candidate": found, "reason": "forme Unicode différente"})
+            continue
+        item = {"file": catalog_file, "id": pid, "title": title, "path": image}
+        missing.append(item)
+        candidates = by_loose.get(loose_key(image))
+        reason = "casse, accents ou apostrophe"
+        if not candidates:
+            folder = key.rsplit('/', 1)[0]
+            same_dir = {loose_key(p): p for p in files if match_key(p).rsplit('/', 1)[0] == folder}
+            close = get_close_matches(loose_key(image), list(same_dir), n=1, cutoff=NEAR_MISS_CUTOFF)
+            candidates = [same_dir[close[0]]] if close else []
+            reason = "nom proche"
+        if candidates:
+            referenced.add(candidates[0])
+            near_misses.append({**item, "candidate": candidates[0], "reason": reason})
+
+    prefixes = tuple(d.rstrip('/') + '/' for d in orphan_dirs)
+    orphans = sorted(p for p in files if p.startswith(prefixes) and p not in referenced)
+    return {"missing": missing, "near_misses": near_misses, "orphans": orphans}
+
+
+def quarantine(paths, quarantine_dir=QUARANTINE_DIR):
+    """Déplacer des fichiers en quarantaine ; retourne le dossier du lot."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    os.makedirs(quarantine_dir, exist_ok=True)
+    # deux lots dans la même seconde : suffixe -2, -3... (jamais un lot existant)
+    for n in itertools.count(1):
+        batch = os.path.join(quarantine_dir, stamp if n == 1 else f"{stamp}-{n}")
+        try:
+            os.mkdir(batch)
+        except FileExistsError:
+            continue
+        break
+    manifest = {"moved": [], "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+    # manifeste écrit avant le premier déplacement puis après chacun : si un
+    # déplacement échoue en cours de lot, ceux déjà faits restent restaurables
+    _write_manifest(batch, manifest)
+    for path in paths:
+        if not os.path.lexists(path):
+            # supprimé depuis le parcours (instantané) : rien à déplacer
+            continue
+        target = os.path.join(batch, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+        manifest["moved"].append(path)
+        _write_manifest(batch, manifest)
+    return batch
+
+
+def _write_manifest(batch, manifest):
+    path = os.path.join(batch, QUARANTINE_MANIFEST)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def restore(batch):
+    """Remettre en place les fichiers d'un lot de quarantaine ; retourne leur nombre."""
+    with open(os.path.join(batch, QUARANTINE_MANIFEST), 'r', encoding='utf-8') as f:
+        moved = json.load(f)["moved"]
+    restored = 0
+    for path in moved:
+        source = os.path.join(batch, path)
+        if os.path.exists(path) or not os.path.exists(source):
+            continue
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        shutil.move(source, path)
+        restored += 1
+    return restored
+
+
+def run(img_dir=IMG_DIR, catalog_files=CATALOG_FILES, orphan_dirs=ORPHAN_DIRS,
+        snapshot_file=SNAPSHOT_FILE, workers=None):
+    """Parcours incrémental + rapprochement ; retourne (rapport, dossiers repris de l'instantané)."""
+    tree, reused = scan_tree(img_dir, load_snapshot(snapshot_file), workers)
+    save_snapshot(tree, snapshot_file)
+    report = reconcile(catalog_references(catalog_files), list(tree_files(tree)), orphan_dirs)
+    return report, reused
+
+
+def _size(paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Images manquantes, orphelines et noms approchants")
+    parser.add_argument("--quarantine", action="store_true",
+                        help=f"déplacer les orphelines dans {QUARANTINE_DIR}/")
+    parser.add_argument("--restore", metavar="LOT", help="restaurer un lot de quarantaine")
+    parser.add_argument("--json", action="store_true", help="afficher le rapport en JSON")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de threads")
+    args = parser.parse_args()
+
+    if args.restore:
+        print(f"{restore(args.restore)} fichier(s) restauré(s)")
+        raise SystemExit(0)
+
+    report, reused = run(workers=args.workers)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"Images manquantes : {len(report['missing'])}")
+        for item in report['missing']:
+            print(f"  [{item['file']} #{item['id']}] {item['path']}")
+        print(f"Noms approchants : {len(report['near_misses'])}")
+        for item in report['near_misses']:
+            print(f"  [{item['file']} #{item['id']}] {item['path']}\n"
+                  f"      -> {item['candidate']} ({item['reason']})")
+        print(f"Orphelines : {len(report['orphans'])} ({_size(report['orphans']) / 1e6:.1f} Mo)")
+        for path in report['orphans']:
+            print(f"  {path}")
+        print(f"({reused} dossier(s) repris de l'instantané)")
+    if args.quarantine and report['orphans']:
+        batch = quarantine(report['orphans'])
+        print(f"{len(report['orphans'])} orpheline(s) déplacée(s) dans {batch}")
@@ -0,0 +1,268 @@
+"""Consultation hors ligne : catalogue fragmenté, manifeste de pré-cache et service worker.
+
+Catalogue publié pour le site (data/catalogue/) :
+  - index.json : liste allégée des produits (ce qu'affichent les cartes :
+    id, slug, titre, catégorie, boutique, prix et première image) avec la
+    révision de chaque fragment ;
+  - produits-<n>.json : fiches complètes des produits d'id n*SHARD_SIZE à
+    (n+1)*SHARD_SIZE-1, lues par la page produit. Seuls les fragments dont
+    le contenu a changé sont réécrits.
+
+Après la construction de dist/ (asset_build.py), build_service_worker écrit :
+  - dist/precache.json : version et révision (empreinte du contenu) de
+    chaque fichier pré-caché — pages principales, scripts et feuilles de
+    style qu'elles chargent, petites images de leur balisage, index du
+    catalogue et données publiées — ainsi que la révision des fragments et
+    les limites des caches ;
+  - dist/sw.js : templates/sw.js avec ce manifeste inséré.
+
+Le service worker ne télécharge à l'installation que les entrées dont la
+révision a changé (les autres sont reprises du cache précédent) ; fragments
+et images sont mis en cache à la première lecture, dans la limite de
+RUNTIME_LIMITS, et seuls ceux dont la révision (ou l'empreinte publiée dans
+data/images.json) a changé sont retirés à l'activation d'une nouvelle
+version. Une visite suivante ne fait donc presque plus de requêtes.
+
+Les révisions des fichiers de dist/ sont gardées dans .cache/offline_state.json
+avec leur taille et leur date : un fichier inchangé n'est pas relu.
+
+Usage : python offline_cache.py [--dist DOSSIER]
+"""
+import hashlib
+import json
+import os
+import re
+
+from asset_build import DIST_DIR, is_local_url, page_base_dir, resolve_url, tag_attrs
+
+CATALOG_DIR = "data/catalogue"
+CATALOG_INDEX = "index.json"
+SHARD_SIZE = 100
+INDEX_VERSION = 1
+INDEX_FIELDS = ("id", "slug", "title", "category", "boutique", "price", "oldPrice")
+
+TEMPLATE_FILE = "templates/sw.js"
+SW_FILE = "sw.js"
+PRECACHE_FILE = "precache.json"
+STATE_FILE = ".cache/offline_state.json"
+REVISION_LENGTH = 12
+
+# Pages pré-cachées (les pages produit et catégorie générées sont mises en cache à la visite)
+CORE_PAGES = ("index.html", "page/produit/categories.html", "page/produit/product.html",
+              "page/produit/panier.html")
+CORE_PAGE_DIRS = ("page/info",)
+CORE_DATA = ("data/images.json", "data/prix_30j.json", "data/popularite.json", "data/Deals.json")
+# Au-delà, une image du balisage des pages principales n'est pas pré-cachée
+PRECACHE_IMAGE_BYTES = 256 * 1024
+# Nombre d'entrées des caches remplis à la lecture, et taille maximale d'une image gardée
+RUNTIME_LIMITS = {"shards": 64, "images": 300, "imageBytes": 1024 * 1024, "pages": 60}
+
+_MANIFEST_MARK = "/*@MANIFEST@*/null"
+_IMG_OR_LINK = re.compile(r"<(?:img|link)\b[^>]*>", re.I)
+
+
+def _revision(data):
+    return hashlib.sha1(data).hexdigest()[:REVISION_LENGTH]
+
+
+def _write_if_changed(path, data):
+    """Écrire `data` (octets) de façon atomique ; retourne False si le fichier était identique."""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# --- catalogue fragmenté ---
+
+def shard_of(product_id):
+    """Numéro du fragment d'un produit (0 pour un id non entier)."""
+    if isinstance(product_id, int) and not isinstance(product_id, bool) and product_id >= 0:
+        return product_id // SHARD_SIZE
+    return 0
+
+
+def shard_path(number):
+    return f"{CATALOG_DIR}/produits-{number}.json"
+
+
+def index_entry(product):
+    entry = {key: product[key] for key in INDEX_FIELDS if key in product}
+    images = product.get("images") or []
+    entry["images"] = images[:1]
+    return entry
+
+
+def publish_catalog(products, root="."):
+    """Publier l'index allégé et les fragments du catalogue dans data/catalogue/.
+
+    Retourne (index, numéros des fragments réécrits ou supprimés).
+    """
+    directory = os.path.join(root, *CATALOG_DIR.split("/"))
+    shards = {}
+    for product in products:
+        shards.setdefault(shard_of(product.get("id")), []).append(product)
+    changed = []
+    revisions = {}
+    for number in sorted(shards):
+        data = _dumps({"products": shards[number]})
+        revisions[str(number)] = _revision(data)
+        if _write_if_changed(os.path.join(root, *shard_path(number).split("/")), data):
+            changed.append(number)
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        m = re.fullmatch(r"produits-(\d+)\.json", name)
+        if m and str(int(m.group(1))) not in revisions:
+            os.remove(os.path.join(directory, name))
+            changed.append(int(m.group(1)))
+    index = {"schemaVersion": INDEX_VERSION, "shardSize": SHARD_SIZE, "shards": revisions,
+             "products": [index_entry(p) for p in products]}
+    _write_if_changed(os.path.join(directory, CATALOG_INDEX), _dumps(index))
+    return index, changed
+
+
+# --- manifeste de pré-cache et service worker ---
+
+class _Revisions:
+    """Révision des fichiers de dist/, relue seulement si taille ou date ont changé."""
+
+    def __init__(self, dist, state_file):
+        self.dist = dist
+        self.state_file = state_file
+        try:
+            with open(state_file, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        self.seen = {}
+
+    def path(self, rel):
+        return os.path.join(self.dist, *rel.split("/"))
+
+    def get(self, rel):
+        st = os.stat(self.path(rel))
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.state.get(rel)
+        if cached and cached[:2] == stamp:
+            revision = cached[2]
+        else:
+            with open(self.path(rel), "rb") as f:
+                revision = _revision(f.read())
+        self.seen[rel] = [*stamp, revision]
+        return revision
+
+    def save(self):
+        if self.seen == self.state:
+            return
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.seen, f)
+        os.replace(tmp, self.state_file)
+
+
+def core_pages(dist):
+    pages = [p for p in CORE_PAGES if os.path.isfile(os.path.join(dist, *p.split("/")))]
+    for top in CORE_PAGE_DIRS:
+        directory = os.path.join(dist, *top.split("/"))
+        if os.path.isdir(directory):
+            pages += [f"{top}/{name}" for name in sorted(os.listdir(directory))
+                      if name.endswith(".html")]
+    return pages
+
+
+def page_references(page, html):
+    """Fichiers locaux chargés par une page construite : scripts, feuilles de style, images."""
+    base_dir = page_base_dir(page, html)
+    refs = []
+    for m in re.finditer(r"<script\b[^>]*>", html, re.I):
+        src = tag_attrs(m.group(0)).get("src")
+        if is_local_url(src):
+            refs.append(resolve_url(base_dir, src))
+    for m in _IMG_OR_LINK.finditer(html):
+        attrs = tag_attrs(m.group(0))
+        if m.group(0)[1:4].lower() == "img":
+            url = attrs.get("src")
+        elif attrs.get("rel", "").lower() in ("stylesheet", "preload", "icon"):
+            url = attrs.get("href")
+        else:
+            continue
+        if is_local_url(url):
+            refs.append(resolve_url(base_dir, url))
+    return [r for r in refs if r]
+
+
+def build_service_worker(root=".", dist=DIST_DIR):
+    """Écrire dist/precache.json et dist/sw.js ; retourne le manifeste."""
+    dist = os.path.join(root, dist) if not os.path.isabs(dist) else dist
+    revisions = _Revisions(dist, os.path.join(root, STATE_FILE))
+
+    def exists(rel):
+        return os.path.isfile(revisions.path(rel))
+
+    entries = {}
+    for page in core_pages(dist):
+        entries[page] = revisions.get(page)
+        with open(revisions.path(page), "r", encoding="utf-8") as f:
+            html = f.read()
+        for ref in page_references(page, html):
+            if ref in entries or not exists(ref):
+                continue
+            if ref.startswith("img/") and os.path.getsize(revisions.path(ref)) > PRECACHE_IMAGE_BYTES:
+                continue
+            entries[ref] = revisions.get(ref)
+    for rel in (f"{CATALOG_DIR}/{CATALOG_INDEX}", *CORE_DATA):
+        if exists(rel):
+            entries[rel] = revisions.get(rel)
+    revisions.save()
+
+    shards = {}
+    try:
+        with open(revisions.path(f"{CATALOG_DIR}/{CATALOG_INDEX}"), "r", encoding="utf-8") as f:
+            shards = {shard_path(int(n)): rev for n, rev in json.load(f).get("shards", {}).items()}
+    except (OSError, ValueError):
+        pass
+
+    precache = [{"url": url, "revision": rev} for url, rev in sorted(entries.items())]
+    version = _revision(_dumps([precache, shards]))
+    manifest = {"version": version, "precache": precache, "shards": shards,
+                "limits": RUNTIME_LIMITS}
+    _write_if_changed(os.path.join(dist, PRECACHE_FILE),
+                      json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    with open(os.path.join(root, *TEMPLATE_FILE.split("/")), "r", encoding="utf-8") as f:
+        template = f.read()
+    if _MANIFEST_MARK not in template:
+        raise ValueError(f"{TEMPLATE_FILE} : marque {_MANIFEST_MARK} absente")
+    sw = template.replace(_MANIFEST_MARK, json.dumps(manifest, ensure_ascii=False))
+    _write_if_changed(os.path.join(dist, SW_FILE), sw.encode("utf-8"))
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from asset_build import build_assets
+    from catalog import Catalog
+
+    parser = argparse.ArgumentParser(description="Publier le catalogue fragmenté et le service worker")
+    parser.add_argument("--file", default="data/produits.json")
+    parser.add_argument("--dist", default=DIST_DIR)
+    args = parser.parse_args()
+    catalog = Catalog(args.file)
+    index, changed = publish_catalog(catalog.load())
+    build_assets(dist=args.dist)
+    manifest = build_service_worker(dist=args.dist)
+    print(f"{len(index['products'])} produit(s), {len(index['shards'])} fragment(s) "
+          f"dont {len(changed)} modifié(s) ; version {manifest['version']}, "
+          f"{len(manifest['precache'])} fichier(s) pré-caché(s)")
@@ -0,0 +1,684 @@
+"""Service de commande (asyncio) : du panier au paiement Mobile Money.
+
+Une commande est créée à partir d'un panier (les lignes 'cart_v1' du site :
+productId, qty) et d'une clé d'idempotence fournie par le client : renvoyer
+la même requête (double clic, nouvelle tentative après une coupure réseau)
+retourne la même commande au lieu d'en créer une seconde ; réutiliser la clé
+pour un autre panier est refusé.
+
+À la création, tout est fait sans attendre (donc sans concurrence possible
+sur la boucle asyncio) : prix recalculés depuis le catalogue, stock réservé
+pour toutes les lignes ou aucune, commande placée dans une file bornée. Si la
+file est pleine, la commande est refusée tout de suite (ServiceBusy) plutôt
+que d'accumuler de l'attente.
+
+Des tâches de fond vident la file et appellent le prestataire de paiement
+(Moov Money, Airtel Money) via un adaptateur PaymentProvider. Les erreurs
+temporaires (délai dépassé, réponse perdue) sont retentées avec un délai
+exponentiel et aléatoire ; un refus (solde insuffisant...) est définitif. La
+référence envoyée au prestataire est l'id de la commande : une nouvelle
+tentative ne peut pas débiter deux fois. Cet id est dérivé de la clé
+d'idempotence et du panier : une commande perdue dans un arrêt brutal puis
+renvoyée par le client garde la même référence. Paiement accepté : le stock réservé
+est retiré du catalogue ; refusé : la réservation est libérée.
+
+Quand toutes les tentatives échouent sur une erreur temporaire, on ne sait pas
+si le client a été débité (réponse perdue) : la commande passe « à rapprocher »
+(RECONCILE), garde sa réservation et n'est plus retentée. Un opérateur vérifie
+auprès du prestataire puis la règle avec OrderService.resolve ; la liste est
+affichée au démarrage et par `python order_service.py --reconcile`.
+
+Les événements sont ajoutés au journal orders/journal.jsonl par lots
+(écriture groupée toutes les FLUSH_INTERVAL secondes) ; au redémarrage, le
+journal est relu et les commandes non terminées sont remises dans la file.
+La création d'une commande est écrite sur disque avant que le client reçoive
+la réponse et avant le premier appel au prestataire (durable).
+Le catalogue modifié (stock) est réécrit au plus toutes les
+CATALOG_SAVE_INTERVAL secondes, après le journal : en cas d'arrêt brutal, on
+peut perdre une décrémentation de stock, jamais facturer deux fois. Le
+service doit être le seul à modifier le stock pendant qu'il tourne.
+
+FakeProvider simule un prestataire (latence, pannes, refus, réponses
+perdues) pour les tests et le développement hors ligne :
+
+    python order_service.py --port 8081 --failure-rate 0.2
+"""
+import asyncio
+import json
+import os
+import random
+import hashlib
+import time
+
+from catalog import DEFAULT_JSON_FILE
+from catalog_shards import open_catalog
+
+ORDERS_JOURNAL = "orders/journal.jsonl"
+OPERATORS = ('moov', 'airtel')
+
+QUEUE_SIZE = 1000
+WORKERS = 16
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 5.0
+PAYMENT_TIMEOUT = 10.0
+FLUSH_INTERVAL = 0.05
+CATALOG_SAVE_INTERVAL = 5.0
+MAX_QUANTITY = 99
+MAX_LINES = 50
+
+# statuts d'une commande
+PENDING = 'pending'
+PAYING = 'paying'
+PAID = 'paid'
+FAILED = 'failed'
+# paiement peut-être effectué : à vérifier par un opérateur, stock toujours réservé
+RECONCILE = 'reconcile'
+FINAL = (PAID, FAILED)
+# plus de tentative automatique : les clients qui attendent reçoivent la réponse
+SETTLED = FINAL + (RECONCILE,)
+
+
+class OrderError(ValueError):
+    """Commande refusée : panier invalide."""
+
+
+class OutOfStock(OrderError):
+    """Quantité demandée supérieure au stock disponible."""
+
+
+class IdempotencyConflict(OrderError):
+    """Clé d'idempotence déjà utilisée pour une autre commande."""
+
+
+class ServiceBusy(OrderError):
+    """File des paiements pleine : réessayer plus tard."""
+
+
+class PaymentError(Exception):
+    """Erreur renvoyée par un prestataire de paiement."""
+
+
+class TransientPaymentError(PaymentError):
+    """Erreur temporaire (délai, indisponibilité) : la tentative peut être refaite."""
+
+
+class PaymentDeclined(PaymentError):
+    """Paiement refusé par le prestataire ou le client : définitif."""
+
+
+class PaymentProvider:
+    """Adaptateur d'un prestataire Mobile Money.
+
+    charge() doit être idempotent pour une même référence : un second appel
+    retourne la transaction du premier au lieu de débiter à nouveau.
+    """
+
+    name = None
+
+    async def charge(self, reference, amount, phone, operator):
+        """Débiter `amount` FCFA ; retourne l'identifiant de transaction."""
+        raise NotImplementedError
+
+
+class FakeProvider(PaymentProvider):
+    """Prestataire simulé, en mémoire."""
+
+    name = "fake"
+
+    def __init__(self, latency=(0.05, 0.3), failure_rate=0.2, decline_rate=0.05,
+                 lost_reply_rate=0.02, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        # débit effectué mais réponse perdue : le cas que l'idempotence doit couvrir
+        self.lost_reply_rate = lost_reply_rate
+        self.random = random.Random(seed)
+        # référence -> transaction
+        self.transactions = {}
+        self.calls = 0
+
+    async def charge(self, reference, amount, phone, operator):
+        self.calls += 1
+        await asyncio.sleep(self.random.uniform(*self.latency))
+        if reference in self.transactions:
+            return self.transactions[reference]
+        draw = self.random.random()
+        if draw < self.failure_rate:
+            raise TransientPaymentError("délai dépassé (simulé)")
+        draw -= self.failure_rate
+        if draw < self.decline_rate:
+            raise PaymentDeclined("solde insuffisant (simulé)")
+        transaction = f"{operator.upper()}-{len(self.transactions) + 1:08d}"
+        self.transactions[reference] = transaction
+        if draw - self.decline_rate < self.lost_reply_rate:
+            raise TransientPaymentError("réponse perdue (simulé)")
+        return transaction
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX, rng=random):
+    """Délai avant la tentative suivante : exponentiel, plafonné, à moitié aléatoire."""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay * rng.uniform(0.5, 1.0)
+
+
+class Order:
+    __slots__ = ('id', 'key', 'lines', 'total', 'phone', 'operator', 'status',
+                 'attempts', 'transaction', 'error', 'created', 'updated')
+
+    def __init__(self, id, key, lines, total, phone, operator, status=PENDING, attempts=0,
+                 transaction=None, error=None, created=None, updated=None):
+        self.id = id
+        self.key = key
+        # [[id produit, quantité, prix unitaire]]
+        self.lines = lines
+        self.total = total
+        self.phone = phone
+        self.operator = operator
+        self.status = status
+        self.attempts = attempts
+        self.transaction = transaction
+        self.error = error
+        self.created = created or time.time()
+        self.updated = updated or self.created
+
+    def request(self):
+        """Ce que le client a demandé (pour reconnaître une requête rejouée)."""
+        return sorted((pid, qty) for pid, qty, _ in self.lines), self.phone, self.operator
+
+    def to_json(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def order_id(key, quantities, phone, operator):
+    """Id (et référence de paiement) d'une commande, déterminé par sa requête."""
+    request = json.dumps([key, sorted(quantities.items()), phone, operator])
+    return hashlib.sha256(request.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_items(items):
+    """Lignes du panier -> {id produit: quantité} (lignes d'un même produit regroupées)."""
+    if not isinstance(items, list) or not items:
+        raise OrderError("Panier vide")
+    if len(items) > MAX_LINES:
+        raise OrderError(f"Panier trop long (maximum {MAX_LINES} lignes)")
+    quantities = {}
+    for item in items:
+        try:
+            pid = int(item.get('productId', item.get('id')))
+            qty = int(item.get('qty', 1))
+        except (AttributeError, TypeError, ValueError):
+            raise OrderError(f"Ligne de panier invalide : {item!r}") from None
+        if qty < 1:
+            raise OrderError(f"Quantité invalide pour le produit {pid}")
+        quantities[pid] = quantities.get(pid, 0) + qty
+        if quantities[pid] > MAX_QUANTITY:
+            raise OrderError(f"Quantité limitée à {MAX_QUANTITY} par produit")
+    return quantities
+
+
+def normalize_phone(phone):
+    digits = ''.join(c for c in str(phone or '') if c.isdigit())
+    if not 8 <= len(digits) <= 15:
+        raise OrderError("Numéro de téléphone invalide")
+    return digits
+
+
+class StockLedger:
+    """Réservations de stock en mémoire, par commande, contre le catalogue."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        # id produit -> quantité réservée
+        self.reserved = {}
+        # id commande -> [[id produit, quantité]]
+        self.holds = {}
+        self.dirty = False
+
+    def available(self, product_id):
+        product = self.catalog.get(product_id)
+        if product is None:
+            return 0
+        return int(product.get('stock') or 0) - self.reserved.get(product_id, 0)
+
+    def reserve(self, order_id, lines, force=False):
+        """Réserver toutes les lignes ou aucune.
+
+        force : réserver même au-delà du disponible (commande peut-être déjà payée).
+        """
+        for pid, qty in lines:
+            if not force and self.available(pid) < qty:
+                raise OutOfStock(f"Stock insuffisant pour le produit {pid} "
+                                 f"({max(0, self.available(pid))} disponible(s))")
+        for pid, qty in lines:
+            self.reserved[pid] = self.reserved.get(pid, 0) + qty
+        self.holds[order_id] = [[pid, qty] for pid, qty in lines]
+
+    def release(self, order_id):
+        for pid, qty in self.holds.pop(order_id, []):
+            left = self.reserved.get(pid, 0) - qty
+            if left > 0:
+                self.reserved[pid] = left
+            else:
+                self.reserved.pop(pid, None)
+
+    def commit(self, order_id):
+        """Retirer du catalogue le stock réservé par une commande payée."""
+        lines = self.holds.get(order_id, [])
+        self.release(order_id)
+        for pid, qty in lines:
+            product = self.catalog.get(pid)
+            if product is not None:
+                self.catalog.put({**product, 'stock': max(0, int(product.get('stock') or 0) - qty)})
+                self.dirty = True
+
+
+class OrderService:
+    def __init__(self, catalog, provider, journal_file=ORDERS_JOURNAL, queue_size=QUEUE_SIZE,
+                 workers=WORKERS, max_attempts=MAX_ATTEMPTS, payment_timeout=PAYMENT_TIMEOUT,
+                 backoff_base=BACKOFF_BASE, save_catalog=True):
+        self.catalog = catalog
+        self.provider = provider
+        self.journal_file = journal_file
+        self.queue_size = queue_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.payment_timeout = payment_timeout
+        self.backoff_base = backoff_base
+        self.save_catalog = save_catalog
+        self.ledger = StockLedger(catalog)
+        self.orders = {}
+        # clé d'idempotence -> commande
+        self.by_key = {}
+        self.queue = None
+        self._tasks = []
+        self._journal = []
+        # numéro du dernier événement journalisé, et du dernier écrit sur disque
+        self._logged = 0
+        self._synced = 0
+        self._synced_event = asyncio.Event()
+        # id commande -> numéro de l'événement de création
+        self._created = {}
+        # id commande -> événements des clients qui attendent le résultat
+        self._waiters = {}
+        self._last_catalog_save = 0.0
+
+    # -- cycle de vie --------------------------------------------------------
+
+    async def start(self):
+        """Relire le journal, puis lancer les tâches de paiement et d'écriture."""
+        self.queue = asyncio.Queue(self.queue_size)
+        unfinished = []
+        for order in self._replay():
+            try:
+                self.ledger.reserve(order.id, [(pid, qty) for pid, qty, _ in order.lines],
+                                    force=order.status == RECONCILE)
+            except OutOfStock as e:
+                # stock modifié pendant l'arrêt du service
+                self._finish(order, FAILED, error=str(e))
+                continue
+            if order.status != RECONCILE:
+                unfinished.append(order)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._flusher()))
+        for order in unfinished:
+            # la file peut être plus petite que le reliquat : on attend la place
+            await self.queue.put(order.id)
+
+    async def stop(self, drain=True):
+        """Arrêter le service (après les paiements en cours si `drain`)."""
+        if drain and self.queue is not None:
+            await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._flush(force_catalog=True)
+
+    # -- création ------------------------------------------------------------
+
+    def create_order(self, key, items, phone, operator):
+        """Créer (ou retrouver) la commande de clé `key` ; retourne (commande, créée ?).
+
+        Synchrone : aucune autre requête ne peut s'intercaler entre le contrôle
+        du stock et la réservation.
+        """
+        key = str(key or '').strip()
+        if not key or len(key) > 128:
+            raise OrderError("Clé d'idempotence manquante ou trop longue")
+        if operator not in OPERATORS:
+            raise OrderError(f"Opérateur inconnu : {operator!r} (attendu : {', '.join(OPERATORS)})")
+        quantities = parse_items(items)
+        phone = normalize_phone(phone)
+
+        existing = self.by_key.get(key)
+        if existing is not None:
+            if existing.request() != (sorted(quantities.items()), phone, operator):
+                raise IdempotencyConflict("Clé d'idempotence déjà utilisée pour une autre commande")
+            return existing, False
+
+        lines = []
+        for pid, qty in sorted(quantities.items()):
+            product = self.catalog.get(pid)
+            if product is None or product.get('price') is None:
+                raise OrderError(f"Produit inconnu : {pid}")
+            lines.append([pid, qty, float(product['price'])])
+        if self.queue is None:
+            raise ServiceBusy("Service non démarré")
+        if self.queue.full():
+            raise ServiceBusy("Trop de commandes en cours, réessayez dans un instant")
+
+        order = Order(order_id(key, quantities, phone, operator), key, lines,
+                      sum(qty * price for _, qty, price in lines), phone, operator)
+        self.ledger.reserve(order.id, [(pid, qty) for pid, qty, _ in lines])
+        self.orders[order.id] = order
+        self.by_key[key] = order
+        self._created[order.id] = self._log({"event": "created", "order": order.to_json()})
+        self.queue.put_nowait(order.id)
+        return order, True
+
+    async def durable(self, order_id):
+        """Attendre que la création de la commande soit écrite dans le journal."""
+        seq = self._created.get(order_id, 0)
+        while self._synced < seq:
+            await self._synced_event.wait()
+        self._created.pop(order_id, None)
+
+    async def wait(self, order_id, timeout=None):
+        """Attendre qu'une commande soit payée, refusée ou à rapprocher ; retourne la commande."""
+        order = self.orders[order_id]
+        if order.status not in SETTLED:
+            event = self._waiters.setdefault(order_id, asyncio.Event())
+            await asyncio.wait_for(event.wait(), timeout)
+        return order
+
+    # -- paiement ------------------------------------------------------------
+
+    async def _worker(self):
+        while True:
+            order_id = await self.queue.get()
+            try:
+                # pas de débit tant que la commande peut encore être perdue
+                await self.durable(order_id)
+                await self._pay(self.orders[order_id])
+            except Exception as e:  # une commande ne doit jamais arrêter un worker
+                self._finish(self.orders[order_id], FAILED, error=f"erreur interne : {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _pay(self, order):
+        self._set_status(order, PAYING)
+        while True:
+            order.attempts += 1
+            try:
+                transaction = await asyncio.wait_for(
+                    self.provider.charge(order.id, order.total, order.phone, order.operator),
+                    self.payment_timeout)
+            except PaymentDeclined as e:
+                self._finish(order, FAILED, error=str(e))
+                return
+            except (TransientPaymentError, asyncio.TimeoutError) as e:
+                if order.attempts >= self.max_attempts:
+                    # le débit a pu avoir lieu (réponse perdue) : ni échec ni stock libéré
+                    self._settle(order, RECONCILE, error=f"{e or 'délai dépassé'} "
+                                                         f"({order.attempts} tentatives)")
+                    return
+                await asyncio.sleep(backoff_delay(order.attempts, self.backoff_base))
+                continue
+            self._finish(order, PAID, transaction=transaction)
+            return
+
+    def _set_status(self, order, status, **fields):
+        order.status = status
+        order.updated = time.time()
+        for name, value in fields.items():
+            setattr(order, name, value)
+        self._log({"event": "status", "id": order.id, "status": status,
+                   "attempts": order.attempts, "updated": order.updated, **fields})
+
+    def _finish(self, order, status, **fields):
+        if status == PAID:
+            self.ledger.commit(order.id)
+        else:
+            self.ledger.release(order.id)
+        self._settle(order, status, **fields)
+
+    def _settle(self, order, status, **fields):
+        self._set_status(order, status, **fields)
+        event = self._waiters.pop(order.id, None)
+        if event is not None:
+            event.set()
+
+    # -- rapprochement -------------------------------------------------------
+
+    def to_reconcile(self):
+        """Commandes dont le paiement est incertain, à vérifier auprès du prestataire."""
+        return [order for order in self.orders.values() if order.status == RECONCILE]
+
+    def resolve(self, order_id, transaction=None, error=None):
+        """Régler une commande à rapprocher : payée si `transaction` est donné, sinon refusée."""
+        order = self.orders[order_id]
+        if order.status != RECONCILE:
+            raise OrderError(f"La commande {order_id} n'est pas à rapprocher ({order.status})")
+        if transaction:
+            self._finish(order, PAID, transaction=transaction)
+        else:
+            self._finish(order, FAILED, error=error or "non débitée (rapprochement)")
+        return order
+
+    # -- journal -------------------------------------------------------------
+
+    def _log(self, record):
+        """Ajouter un événement au prochain lot ; retourne son numéro."""
+        self._journal.append(json.dumps(record, ensure_ascii=False))
+        self._logged += 1
+        return self._logged
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self._flush()
+
+    def _flush(self, force_catalog=False):
+        """Écriture groupée du journal, puis du catalogue si son stock a changé."""
+        logged = self._logged
+        if self._journal:
+            lines, self._journal = self._journal, []
+            if self.journal_file:
+                os.makedirs(os.path.dirname(self.journal_file) or ".", exist_ok=True)
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+        if logged != self._synced:
+            self._synced = logged
+            event, self._synced_event = self._synced_event, asyncio.Event()
+            event.set()
+        now = time.monotonic()
+        if self.save_catalog and self.ledger.dirty and (
+                force_catalog or now - self._last_catalog_save >= CATALOG_SAVE_INTERVAL):
+            self.catalog.save()
+            self.ledger.dirty = False
+            self._last_catalog_save = now
+
+    def _replay(self):
+        """Reconstruire les commandes depuis le journal ; retourne celles à reprendre."""
+        if not self.journal_file:
+            return []
+        try:
+            f = open(self.journal_file, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return []
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # dernière ligne tronquée par un arrêt brutal
+                    continue
+                if record.get("event") == "created":
+                    order = Order(**record["order"])
+                    self.orders[order.id] = order
+                    self.by_key[order.key] = order
+                elif record.get("event") == "status" and record.get("id") in self.orders:
+                    order = self.orders[record["id"]]
+                    for name in ("status", "attempts", "transaction", "error", "updated"):
+                        if name in record:
+                            setattr(order, name, record[name])
+        return [order for order in self.orders.values() if order.status not in FINAL]
+
+
+# -- interface HTTP ----------------------------------------------------------
+
+HTTP_REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request",
+                404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+                413: "Payload Too Large", 503: "Service Unavailable"}
+MAX_BODY = 64 * 1024
+
+
+def _public(order):
+    """Vue d'une commande renvoyée au client (sans le numéro de téléphone complet)."""
+    data = order.to_json()
+    data.pop('key')
+    data['phone'] = '…' + order.phone[-4:]
+    return data
+
+
+class HttpFrontend:
+    """Petit serveur HTTP/1.1 (connexions persistantes) devant OrderService.
+
+    POST /orders  {"items": [...], "phone": "...", "operator": "moov"}
+                  en-tête Idempotency-Key (ou champ "idempotencyKey")
+    GET  /orders/<id>[?wait=SECONDES]
+    """
+
+    def __init__(self, service, allow_origin="*"):
+        self.service = service
+        self.allow_origin = allow_origin
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    self._respond(writer, 413, {"error": "Requête trop grande"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self._route(method, target, headers, body)
+                close = headers.get('connection', '').lower() == 'close'
+                self._respond(writer, status, payload, close)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, headers, body):
+        path, _, query = target.partition('?')
+        if method == 'OPTIONS':
+            return 204, None
+        if path == '/orders' and method == 'POST':
+            try:
+                data = json.loads(body or b'{}')
+                key = headers.get('idempotency-key') or data.get('idempotencyKey')
+                order, created = self.service.create_order(
+                    key, data.get('items'), data.get('phone'), data.get('operator'))
+                # une réponse 201 garantit que la commande survivra à un arrêt
+                await self.service.durable(order.id)
+            except ServiceBusy as e:
+                return 503, {"error": str(e)}
+            except (OutOfStock, IdempotencyConflict) as e:
+                return 409, {"error": str(e)}
+            except (OrderError, ValueError, AttributeError) as e:
+                return 400, {"error": str(e) or "Requête invalide"}
+            return (201 if created else 200), _public(order)
+        if path.startswith('/orders/') and method == 'GET':
+            order = self.service.orders.get(path[len('/orders/'):])
+            if order is None:
+                return 404, {"error": "Commande introuvable"}
+            wait = dict(p.partition('=')[::2] for p in query.split('&') if p).get('wait')
+            if wait:
+                try:
+                    await self.service.wait(order.id, min(float(wait), 30.0))
+                except (asyncio.TimeoutError, ValueError):
+                    pass
+            return 200, _public(order)
+        return (405 if path.startswith('/orders') else 404), {"error": "Introuvable"}
+
+    def _respond(self, writer, status, payload, close=False):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(body)}",
+                f"Access-Control-Allow-Origin: {self.allow_origin}",
+                "Access-Control-Allow-Headers: Content-Type, Idempotency-Key",
+                "Access-Control-Allow-Methods: GET, POST, OPTIONS"]
+        if close:
+            head.append("Connection: close")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+
+def _print_reconcile(service):
+    orders = service.to_reconcile()
+    if orders:
+        print(f"{len(orders)} commande(s) à rapprocher (paiement incertain) :")
+    for order in orders:
+        print(f"  {order.id}  {order.total} FCFA  {order.operator}  {order.error or ''}")
+
+
+async def serve(catalog, provider, host="127.0.0.1", port=8081, **options):
+    service = OrderService(catalog, provider, **options)
+    await service.start()
+    server = await asyncio.start_server(HttpFrontend(service).handle, host, port)
+    print(f"Service de commande sur http://{host}:{port}/orders "
+          f"({len(service.orders)} commande(s) dans le journal)")
+    _print_reconcile(service)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop(drain=False)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Service de commande (prestataire simulé)")
+    parser.add_argument("--file", default=DEFAULT_JSON_FILE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--journal", default=ORDERS_JOURNAL)
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="pannes simulées")
+    parser.add_argument("--decline-rate", type=float, default=0.05, help="refus simulés")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="lister les commandes à rapprocher et quitter")
+    args = parser.parse_args()
+
+    catalog = open_catalog(args.file)
+    catalog.load()
+    if args.reconcile:
+        service = OrderService(catalog, None, journal_file=args.journal)
+        service._replay()
+        _print_reconcile(service)
+        raise SystemExit(0)
+    provider = FakeProvider(failure_rate=args.failure_rate, decline_rate=args.decline_rate)
+    try:
+        asyncio.run(serve(catalog, provider, args.host, args.port, journal_file=args.journal))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,385 @@
+"""Historique des prix (price, priceBoutique, oldPrice) par produit.
+
+Le journal data/price_history.bin est en ajout seul : chaque enregistrement
+du catalogue y ajoute un bloc contenant les produits dont un des trois prix a
+changé (id, date, prix). Un bloc est rangé par colonnes, chacune codée en
+deltas (différence avec la valeur précédente de la colonne, en varint
+zigzag) :
+
+    en-tête : b'PB', nombre de lignes, date min, date max,
+              longueur de chaque colonne, CRC32 du corps
+    corps   : ids (triés) | dates | price | priceBoutique | oldPrice
+
+Les prix sont gardés en centimes ; 0 représente une valeur vide (None).
+Les dates min/max de l'en-tête permettent de sauter les blocs hors d'une
+plage sans les décoder, et une requête n'a besoin de décoder que les
+colonnes qu'elle lit.
+
+Comme pour les avis, un index (.cache/price_history.json) mémorise la
+position déjà lue dans le journal, la liste des blocs et les derniers prix
+connus de chaque produit ; seuls les blocs ajoutés depuis sont relus au
+chargement. Un bloc incomplet en fin de journal (écriture interrompue) est
+ignoré puis écrasé au prochain ajout.
+
+Le prix le plus bas des 30 derniers jours est publié pour le site dans
+data/prix_30j.json, uniquement pour les produits dont ce minimum diffère du
+prix actuel (pour les autres, c'est le prix actuel).
+"""
+import json
+import os
+import struct
+import time
+import zlib
+
+LOG_FILE = "data/price_history.bin"
+INDEX_FILE = ".cache/price_history.json"
+PUBLISHED_FILE = "data/prix_30j.json"
+
+FIELDS = ('price', 'priceBoutique', 'oldPrice')
+WINDOW_DAYS = 30
+DAY = 86400
+
+_MAGIC = b'PB'
+# magic, lignes, date min, date max, longueur des 5 colonnes, crc32 du corps
+_HEADER = struct.Struct('<2sIqq5II')
+_COLUMNS = ('id', 'ts') + FIELDS
+
+
+def _zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def encode_deltas(values):
+    """Liste d'entiers -> varints zigzag des différences successives."""
+    out = bytearray()
+    previous = 0
+    for value in values:
+        n = _zigzag(value - previous)
+        previous = value
+        while n > 0x7F:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+    return bytes(out)
+
+
+def decode_deltas(data, count):
+    """Inverse de encode_deltas."""
+    values = []
+    previous = 0
+    pos = 0
+    for _ in range(count):
+        n = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            n |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        previous += (n >> 1) if not n & 1 else -((n + 1) >> 1)
+        values.append(previous)
+    return values
+
+
+def to_cents(value):
+    """Prix -> entier stocké (0 pour vide)."""
+    if value is None or value == '':
+        return 0
+    return int(round(float(value) * 100)) + 1
+
+
+def from_cents(stored):
+    return None if stored == 0 else (stored - 1) / 100
+
+
+def price_key(product):
+    """Les trois prix d'un produit tels qu'ils sont stockés."""
+    return tuple(to_cents(product.get(field)) for field in FIELDS)
+
+
+def encode_block(rows):
+    """rows : [(id, date, price, priceBoutique, oldPrice)] (prix en centimes stockés)."""
+    rows = sorted(rows)
+    columns = [encode_deltas(column) for column in zip(*rows)]
+    body = b''.join(columns)
+    timestamps = [row[1] for row in rows]
+    header = _HEADER.pack(_MAGIC, len(rows), min(timestamps), max(timestamps),
+                          *(len(c) for c in columns), zlib.crc32(body))
+    return header + body
+
+
+class Block:
+    """Bloc du journal, décodé colonne par colonne à la demande."""
+
+    def __init__(self, offset, count, min_ts, max_ts, lengths, body):
+        self.offset = offset
+        self.count = count
+        self.min_ts = min_ts
+        self.max_ts = max_ts
+        self._spans = {}
+        pos = 0
+        for name, length in zip(_COLUMNS, lengths):
+            self._spans[name] = (pos, pos + length)
+            pos += length
+        self._body = body
+        self._decoded = {}
+
+    @property
+    def size(self):
+        return _HEADER.size + len(self._body)
+
+    def column(self, name):
+        values = self._decoded.get(name)
+        if values is None:
+            start, end = self._spans[name]
+            values = self._decoded[name] = decode_deltas(self._body[start:end], self.count)
+        return values
+
+
+def read_blocks(path, offset=0):
+    """Lire les blocs complets à partir de `offset` ; s'arrête au premier bloc abîmé."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            magic, count, min_ts, max_ts, *rest = _HEADER.unpack(header)
+            lengths, crc = rest[:5], rest[5]
+            body = f.read(sum(lengths))
+            if magic != _MAGIC or len(body) < sum(lengths) or zlib.crc32(body) != crc:
+                return
+            yield Block(offset, count, min_ts, max_ts, lengths, body)
+            offset += _HEADER.size + len(body)
+
+
+class PriceHistory:
+    def __init__(self, log_file=LOG_FILE, index_file=INDEX_FILE):
+        self.log_file = log_file
+        self.index_file = index_file
+        # id produit -> [première date, dernière date, price, priceBoutique, oldPrice]
+        self.latest = {}
+        # [[position, lignes, date min, date max]] des blocs du journal
+        self.blocks = []
+        # position (octets) du journal déjà intégrée dans l'index
+        self.offset = 0
+        self.load()
+
+    def load(self):
+        """Charger l'index puis relire uniquement les blocs ajoutés depuis."""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.latest = {row[0]: row[1:] for row in data["latest"]}
+            self.blocks = [list(b) for b in data["blocks"]]
+            self.offset = int(data["logOffset"])
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            self.latest, self.blocks, self.offset = {}, [], 0
+        try:
+            size = os.path.getsize(self.log_file)
+        except OSError:
+            size = 0
+        if size < self.offset:
+            # journal remplacé ou tronqué : tout relire
+            self.latest, self.blocks, self.offset = {}, [], 0
+        before = self.offset
+        self._catch_up()
+        if self.offset != before:
+            self.save_index()
+
+    def _index_block(self, block):
+        self.blocks.append([block.offset, block.count, block.min_ts, block.max_ts])
+        columns = [block.column(name) for name in _COLUMNS]
+        latest = self.latest
+        for pid, ts, *prices in zip(*columns):
+            known = latest.get(pid)
+            if known is None:
+                latest[pid] = [ts, ts, *prices]
+            elif ts >= known[1]:
+                latest[pid] = [min(known[0], ts), ts, *prices]
+            else:
+                known[0] = min(known[0], ts)
+        self.offset = block.offset + block.size
+
+    def save_index(self):
+        os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+        tmp = self.index_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"logOffset": self.offset, "blocks": self.blocks,
+                       "latest": [[pid, *row] for pid, row in self.latest.items()]}, f)
+        os.replace(tmp, self.index_file)
+
+    def record(self, products, ts=None):
+        """Ajouter au journal les produits dont un prix diffère du dernier connu.
+
+        Les produits jamais vus sont enregistrés avec leurs prix actuels.
+        Retourne le nombre de lignes ajoutées.
+        """
+        ts = int(time.time() if ts is None else ts)
+        # blocs ajoutés par un autre processus depuis le chargement : intégrés avant
+        # de comparer les prix et d'écrire à la suite
+        self._catch_up()
+        rows = []
+        seen = set()
+        for product in products:
+            pid = product.get('id')
+            if not isinstance(pid, int) or pid in seen:
+                continue
+            seen.add(pid)
+            prices = price_key(product)
+            known = self.latest.get(pid)
+            if known is None or tuple(known[2:]) != prices:
+                rows.append((pid, ts, *prices))
+        if not rows:
+            return 0
+        data = encode_block(rows)
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+        with open(self.log_file, 'ab') as f:
+            # self.offset est la fin du dernier bloc lisible : ce qui suit est un
+            # bloc incomplet laissé par une écriture interrompue, écrasé ici
+            if f.seek(0, os.SEEK_END) > self.offset:
+                f.truncate(self.offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # l'index sur disque n'est réécrit qu'à la publication : les blocs
+        # ajoutés entre-temps sont relus au chargement suivant
+        self._catch_up()
+        return len(rows)
+
+    def _catch_up(self):
+        for block in read_blocks(self.log_file, self.offset):
+            self._index_block(block)
+
+    def _blocks(self, start=None, end=None, reverse=False):
+        """Blocs qui recouvrent la plage [start, end] (en-têtes lus depuis l'index)."""
+        selected = [b for b in self.blocks
+                    if (start is None or b[3] >= start) and (end is None or b[2] <= end)]
+        if reverse:
+            selected.reverse()
+        if not selected:
+            return
+        with open(self.log_file, 'rb') as f:
+            for offset, *_ in selected:
+                f.seek(offset)
+                header = f.read(_HEADER.size)
+                _, count, min_ts, max_ts, *rest = _HEADER.unpack(header)
+                yield Block(offset, count, min_ts, max_ts, rest[:5], f.read(sum(rest[:5])))
+
+    def query(self, product_id=None, start=None, end=None):
+        """Lignes (id, date, price, priceBoutique, oldPrice) dans la plage, par date.
+
+        Avec product_id, seule la colonne des ids est décodée dans les blocs
+        où le produit n'apparaît pas.
+        """
+        rows = []
+        for block in self._blocks(start, end):
+            ids = block.column('id')
+            if product_id is None:
+                positions = range(block.count)
+            else:
+                positions = [i for i, pid in enumerate(ids) if pid == product_id]
+                if not positions:
+                    continue
+            dates = block.column('ts')
+            columns = [block.column(field) for field in FIELDS]
+            for i in positions:
+                if (start is None or dates[i] >= start) and (end is None or dates[i] <= end):
+                    rows.append((ids[i], dates[i], *(from_cents(c[i]) for c in columns)))
+        rows.sort(key=lambda row: (row[1], row[0]))
+        return rows
+
+    def lowest(self, days=WINDOW_DAYS, now=None):
+        """{id: prix le plus bas sur la période} pour les produits dont le prix a changé.
+
+        Le prix en vigueur au début de la période compte aussi : il est retrouvé
+        en remontant les blocs antérieurs, seulement pour ces produits.
+        Seules les colonnes ids, dates et price sont décodées.
+        """
+        now = int(time.time() if now is None else now)
+        start = now - days * DAY
+        low = {}
+        changed = set()
+        for block in self._blocks(start=start):
+            for pid, ts, price in zip(block.column('id'), block.column('ts'), block.column('price')):
+                if ts < start or ts > now:
+                    continue
+                if price and (pid not in low or price < low[pid]):
+                    low[pid] = price
+                changed.add(pid)
+        # prix en vigueur au début de la période (absent pour un produit apparu depuis)
+        pending = {pid for pid in changed if self.latest[pid][0] < start}
+        for block in self._blocks(end=start - 1, reverse=True):
+            if not pending:
+                break
+            found = {}
+            for pid, ts, price in zip(block.column('id'), block.column('ts'), block.column('price')):
+                if pid in pending and ts < start and ts >= found.get(pid, (-1, 0))[0]:
+                    found[pid] = (ts, price)
+            for pid, (_, price) in found.items():
+                if price and (pid not in low or price < low[pid]):
+                    low[pid] = price
+                pending.discard(pid)
+        return {pid: from_cents(price) for pid, price in low.items()}
+
+    def publish(self, products, days=WINDOW_DAYS, published_file=PUBLISHED_FILE, now=None):
+        """Enregistrer les prix courants puis publier le prix le plus bas sur `days` jours.
+
+        Retourne (données publiées, ids dont la valeur publiée a changé).
+        """
+        self.record(products, now)
+        self.save_index()
+        current = {p.get('id'): p.get('price') for p in products}
+        # inutile de publier un minimum égal au prix actuel : le site le reprend par défaut
+        prices = {str(pid): price for pid, price in sorted(self.lowest(days, now).items())
+                  if pid in current and to_cents(price) != to_cents(current[pid])}
+        try:
+            with open(published_file, 'r', encoding='utf-8') as f:
+                previous = json.load(f).get("prices", {})
+        except (OSError, ValueError, AttributeError):
+            previous = {}
+        changed = [int(pid) for pid in prices.keys() | previous.keys()
+                   if prices.get(pid) != previous.get(pid)]
+        data = {"days": days, "prices": prices}
+        if changed or not os.path.exists(published_file):
+            os.makedirs(os.path.dirname(published_file) or ".", exist_ok=True)
+            tmp = published_file + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, published_file)
+        return data, changed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from catalog import Catalog, DEFAULT_JSON_FILE
+
+    parser = argparse.ArgumentParser(description="Historique des prix")
+    sub = parser.add_subparsers(dest="command")
+    show = sub.add_parser("show", help="historique d'un produit")
+    show.add_argument("id", type=int)
+    show.add_argument("--days", type=int, default=None, help="limiter aux N derniers jours")
+    publish = sub.add_parser("publish", help=f"enregistrer les prix courants et publier {PUBLISHED_FILE}")
+    publish.add_argument("--file", default=DEFAULT_JSON_FILE)
+    publish.add_argument("--days", type=int, default=WINDOW_DAYS)
+    args = parser.parse_args()
+
+    history = PriceHistory()
+    if args.command == "show":
+        start = int(time.time()) - args.days * DAY if args.days else None
+        for pid, ts, *prices in history.query(args.id, start=start):
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+            print(stamp, *(f"{name}={value:g}" if value is not None else f"{name}=-"
+                           for name, value in zip(FIELDS, prices)))
+    else:
+        catalog = Catalog(getattr(args, "file", DEFAULT_JSON_FILE))
+        catalog.load()
+        data, changed = history.publish(catalog.products, getattr(args, "days", WINDOW_DAYS))
+        print(f"{len(data['prices'])} produit(s) avec un prix modifié sur {data['days']} jours, "
+              f"{len(changed)} valeur(s) publiée(s) changée(s)")
@@ -1,32 +1,106 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, scrolledtext
-import json
+from tkinter import ttk, messagebox
 import os
-from pathlib import Path
+import threading
+import time
+
+from catalog import DEFAULT_JSON_FILE, normalize_path
+from catalog_history import CatalogHistory, format_diff
+from catalog_shards import BoutiqueCatalog, ShardedCatalog, open_catalog
+from reviews_store import ReviewStore
+
+# filedialog et scrolledtext, comme les modules de publication, de recherche, de
+# modification groupée et de vignettes, ne sont importés qu'au moment où on en a
+# besoin : le démarrage n'a à charger que ce qui est affiché en premier.
+
+# Temps maximum (ms) passé à remplir la liste des produits avant de rendre la
+# main à Tk : la fenêtre reste réactive pendant le remplissage progressif.
+FILL_SLICE_MS = 12
+
+# Délai (ms) entre la dernière frappe dans le filtre et la mise à jour de la liste
+FILTER_DELAY_MS = 250
+
+# Intervalle (ms) de vérification de la publication du site, faite dans un thread
+PUBLISH_POLL_MS = 100
+
 
 class ProductManager:
-    def __init__(self, root):
+    def __init__(self, root, json_file=DEFAULT_JSON_FILE, boutique=None):
         self.root = root
-        self.root.title("Gestionnaire de Produits JSON")
+        self.root.title("Gestionnaire de Produits JSON" if boutique is None
+                        else f"Gestionnaire de Produits — {boutique or 'sans boutique'}")
         self.root.geometry("1000x700")
         
         # Chemin vers le fichier JSON
-        self.json_file = "data/produits.json"
+        self.json_file = json_file
         
         # Créer le répertoire data s'il n'existe pas
-        os.makedirs("data", exist_ok=True)
-        
-        # Charger les données existantes
-        self.products = self.load_products()
+        os.makedirs(os.path.dirname(self.json_file) or ".", exist_ok=True)
+        
+        # Charger les données existantes (cœur du catalogue, sans Tk) : une seule
+        # boutique si demandé, sinon tout le catalogue (réparti par boutique s'il l'est)
+        self.catalog = open_catalog(self.json_file, boutique)
+        self.catalog.load()
+        # Historique des versions (annuler / rétablir)
+        self.history = CatalogHistory(self.products)
+        # Avis clients : la note affichée est calculée à partir des avis
+        self.reviews = ReviewStore()
+        # Version du catalogue dont les pages statiques sont à jour (None = inconnue)
+        self.published_version = None
+        # Publication du site en cours (thread), son résultat, et une autre à lancer ensuite
+        self._publish_job = None
+        self._publish_result = None
+        self._publish_again = False
+        # Métadonnées des images et historique des prix : chargés au premier usage
+        self._image_manifest = None
+        self._prices = None
         self.categories = set()
         self.boutiques = set()
         self.extract_categories_and_boutiques()
         
+        # Remplissage progressif de la liste et construction différée du formulaire
+        self._fill_job = None
+        self._details_built = False
+        
+        # Tri / filtre de la liste : l'index est construit au premier usage
+        self._index = None
+        # Détection des doublons : index construit au premier enregistrement
+        self._duplicates = None
+        self.sort_column = None
+        self.sort_reverse = False
+        self._filter_job = None
+        self.row_ids = {}   # iid de la Treeview -> id produit
+        
         # Style ttk pour un look plus moderne
         self.setup_style()
         
         self.setup_ui()
         
+    @property
+    def products(self):
+        return self.catalog.products
+
+    @products.setter
+    def products(self, products):
+        self.catalog.products = products
+
+    @property
+    def image_manifest(self):
+        """Métadonnées des images (dimensions, aperçus) publiées avec le catalogue"""
+        if self._image_manifest is None:
+            from image_manifest import ImageManifest
+            self._image_manifest = ImageManifest()
+        return self._image_manifest
+
+    @property
+    def prices(self):
+        """Historique des prix (journal en ajout seul) : seuls les prix enregistrés y entrent,
+        à la publication, jamais les brouillons ni les états annulés"""
+        if self._prices is None:
+            from price_history import PriceHistory
+            self._prices = PriceHistory()
+        return self._prices
+        
     def setup_style(self):
         style = ttk.Style(self.root)
         try:
@@ -42,62 +116,173 @@ class ProductManager:
 
     def normalize_path(self, p: str) -> str:
         """Normaliser les chemins pour utiliser '/' au lieu de '\'."""
-        if not p:
-            return p
-        return str(p).replace('\\', '/')
+        return normalize_path(p)
 
     def load_products(self):
         """Charger les produits depuis le fichier JSON et normaliser les chemins d'images."""
-        if os.path.exists(self.json_file):
-            try:
-                with open(self.json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Normaliser les chemins d'images si présents
-                    for prod in data:
-                        if 'images' in prod and isinstance(prod['images'], list):
-                            prod['images'] = [self.normalize_path(img) for img in prod['images']]
-                    return data
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
+        return self.catalog.load()
     
     def save_products(self):
-        """Sauvegarder les produits dans le fichier JSON en veillant à normaliser les chemins."""
+        """Sauvegarder les produits dans le fichier JSON en veillant à normaliser les chemins,
+        puis lancer la publication du site en arrière-plan."""
         try:
-            # Normaliser les chemins d'images avant sauvegarde
-            for prod in self.products:
-                if 'images' in prod and isinstance(prod['images'], list):
-                    prod['images'] = [self.normalize_path(img) for img in prod['images']]
-            with open(self.json_file, 'w', encoding='utf-8') as f:
-                json.dump(self.products, f, ensure_ascii=False, indent=2)
-            messagebox.showinfo("Succès", "Produits sauvegardés avec succès!")
+            # Reporter les notes calculées depuis les avis, comme une version de l'historique :
+            # les pages des produits dont la note change sont ainsi republiées
+            rated = self.reviews.apply_ratings(self.products)
+            self.history.record_many(rated, label="Notes calculées depuis les avis")
+            # Normalisation des chemins (elle aussi versionnée), puis écriture atomique
+            normalized = self.catalog.normalize_images()
+            self.history.record_many(normalized, label="Chemins d'images normalisés")
+            self.catalog.save()
+            self.apply_incoming_changes()
+            # Empreintes d'images calculées pour la détection des doublons
+            if self._duplicates is not None:
+                self._duplicates.hasher.save()
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde: {str(e)}")
+            return
+        # le JSON est écrit : une erreur de publication est signalée à part
+        self.publish_pages()
+        messagebox.showinfo("Succès", "Produits sauvegardés avec succès!\n"
+                                      "La publication du site se poursuit en arrière-plan.")
     
+    def apply_incoming_changes(self):
+        """Reporter dans l'historique et la liste les produits enregistrés entre-temps
+        par un autre poste (fusionnés par le catalogue à la sauvegarde)."""
+        rebased = getattr(self.catalog, 'rebased', None)
+        if not rebased:
+            return
+        updated, removed = rebased
+        self.history.record_many(updated, removed, label="Modifications d'un autre poste")
+        self.extract_categories_and_boutiques()
+        self.refresh_product_list()
+
+    def site_products(self):
+        """Produits publiés sur le site : toutes les boutiques, même quand une seule est ouverte."""
+        if isinstance(self.catalog, BoutiqueCatalog):
+            return self.catalog.store.merged_products()
+        return self.products
+
+    def publish_pages(self):
+        """Publier le site (avis, puis le reste dans un thread) ; la fenêtre reste utilisable.
+
+        Une seule publication à la fois : demandée pendant qu'une autre tourne,
+        elle est relancée à la fin de celle-ci, avec l'état d'alors.
+        """
+        if self._publish_job is not None:
+            self._publish_again = True
+            return
+        current = self.history.current.number
+        changed_ids = None
+        if self.published_version is not None:
+            try:
+                delta = self.history.diff(self.published_version, current)
+            except KeyError:
+                delta = None
+            if delta is not None:
+                changed_ids = ([p.get('id') for p in delta['added'] + delta['removed']]
+                               + [change['id'] for change in delta['modified']])
+        try:
+            # avis par produit pour le site (le journal est modifié depuis la fenêtre)
+            self.reviews.publish()
+        except Exception as e:
+            self.publish_failed(e)
+            return
+        # une boutique ouverte seule : tout le catalogue est relu depuis les fichiers, dans le thread
+        products = None if isinstance(self.catalog, BoutiqueCatalog) else list(self.products)
+
+        def work():
+            try:
+                self._publish_result = (current, self.publish_site(products, changed_ids), None)
+            except Exception as e:
+                self._publish_result = (current, None, e)
+
+        self._publish_result = None
+        self._publish_job = threading.Thread(target=work, name="publication")
+        self._publish_job.start()
+        self.publish_status.configure(text="Publication du site…")
+        self.root.after(PUBLISH_POLL_MS, self._poll_publish)
+
+    def _poll_publish(self):
+        """Thread Tk : attendre la fin de la publication puis en rendre compte."""
+        if self._publish_job.is_alive():
+            self.root.after(PUBLISH_POLL_MS, self._poll_publish)
+            return
+        self._publish_job = None
+        current, report, error = self._publish_result
+        if error is not None:
+            self.publish_failed(error)
+        else:
+            self.published_version = current
+            self.publish_status.configure(text=f"Site publié ({time.strftime('%H:%M:%S')})")
+            if report['collisions']:
+                listing = "\n".join(f"  • {path} : {', '.join(str(k) for k in keys[1:])} "
+                                     f"(page gardée par {keys[0]})"
+                                     for path, keys in sorted(report['collisions'].items())[:10])
+                messagebox.showwarning("Slugs en double",
+                                       f"Sans page (slug déjà utilisé) :\n{listing}")
+        if self._publish_again:
+            self._publish_again = False
+            self.publish_pages()
+
+    def publish_failed(self, error):
+        self.publish_status.configure(text="Publication du site échouée")
+        messagebox.showerror("Erreur de publication",
+                             f"Le catalogue est enregistré, mais la publication du site a échoué : "
+                             f"{error}")
+
+    def publish_site(self, products, changed_ids):
+        """Publier le manifeste des images, les prix sur 30 jours et le catalogue
+        fragmenté, puis pré-rendre uniquement les pages touchées et mettre à jour
+        le plan du site et les flux produits. Retourne le rapport de build_site.
+
+        Appelé hors du thread Tk : ne touche ni aux widgets ni à l'historique.
+        products : produits du site (None : relus via site_products) ;
+        changed_ids : produits modifiés depuis la dernière publication (None : tout vérifier).
+        """
+        from asset_build import build_assets
+        from offline_cache import build_service_worker, publish_catalog
+        from site_feeds import publish_feeds
+        from static_site import build_site
+        if products is None:
+            products = self.site_products()
+        manifest, changed_images = self.image_manifest.publish(products)
+        # appelé après catalog.save() : seuls les prix enregistrés entrent dans l'historique
+        lowest, changed_prices = self.prices.publish(products)
+        publish_catalog(products)
+        if changed_ids is not None and changed_images:
+            changed_images = set(changed_images)
+            changed_ids += [p.get('id') for p in products
+                            if changed_images.intersection(normalize_path(img) for img in p.get('images') or [])]
+        if changed_ids is not None:
+            changed_ids += changed_prices
+        report = build_site(products, changed_ids, images=manifest['images'],
+                            lowest_prices=lowest['prices'])
+        # plan du site et flux produits : seuls les produits modifiés sont remis en forme
+        publish_feeds(products, changed_ids, images=manifest['images'])
+        # fichiers à déployer (minifiés, marqués par leur empreinte) : seuls les changements sont refaits
+        build_assets()
+        # pré-cache hors ligne : seules les entrées dont la révision a changé seront retéléchargées
+        build_service_worker()
+        return report
+
     def extract_categories_and_boutiques(self):
         """Extraire toutes les catégories et boutiques existantes depuis self.products."""
+        categories, boutiques = self.catalog.categories_and_boutiques()
         self.categories.clear()
+        self.categories.update(categories)
         self.boutiques.clear()
-        for product in self.products:
-            if 'category' in product and product['category']:
-                self.categories.add(product['category'])
-            # On suppose que le champ boutique s'appelle 'boutique' dans le JSON
-            if 'boutique' in product and product['boutique']:
-                self.boutiques.add(product['boutique'])
+        self.boutiques.update(boutiques)
     
     def get_next_id(self):
-        """Obtenir le prochain ID disponible"""
-        if not self.products:
-            return 1
-        existing_ids = [product.get('id', 0) for product in self.products]
-        return max(existing_ids) + 1
+        """Obtenir le prochain ID disponible (dans la plage de la boutique si le catalogue est partitionné)"""
+        if isinstance(self.catalog, ShardedCatalog):
+            return self.catalog.next_id(self.var_boutique.get().strip())
+        return self.catalog.next_id()
     
     def check_slug_exists(self, slug, exclude_id=None):
         """Vérifier si un slug existe déjà"""
-        for product in self.products:
-            if product.get('slug') == slug and product.get('id') != exclude_id:
-                return True
-        return False
+        return self.catalog.slug_exists(slug, exclude_id)
     
     def setup_ui(self):
         """Configurer l'interface utilisateur"""
@@ -138,6 +323,9 @@ class ProductManager:
         # Liste des produits
         self.create_product_list(scrollable_frame)
         
+        # Le reste du formulaire est construit dès que la fenêtre est affichée
+        self.root.after_idle(self.ensure_detail_fields)
+        
         # Binding pour la molette de la souris
         def _on_mousewheel(event):
             canvas.yview_scroll(int(-1*(event.delta/120)), "units")
@@ -157,7 +345,7 @@ class ProductManager:
         self.var_priceBoutique = tk.StringVar()    # nouveau: prix en boutique
         self.var_oldprice = tk.StringVar()  # nouveau champ oldPrice
         self.var_stock = tk.StringVar()
-        self.var_rating = tk.StringVar()
+        self.var_rating = tk.StringVar(value="—")   # note calculée (lecture seule)
         self.var_slug = tk.StringVar()
         self.images_list = []
         self.features_list = []
@@ -230,7 +418,20 @@ class ProductManager:
         ttk.Entry(row4, textvariable=self.var_stock, width=8).pack(side='left', padx=(5,10))
         
         ttk.Label(row4, text="Note:").pack(side='left')
-        ttk.Entry(row4, textvariable=self.var_rating, width=8).pack(side='left', padx=5)
+        ttk.Label(row4, textvariable=self.var_rating).pack(side='left', padx=5)
+        
+        # Images, caractéristiques et description : construites juste après le
+        # premier affichage (voir ensure_detail_fields)
+        self.fields_frame = fields_frame
+    
+    def ensure_detail_fields(self):
+        """Construire (une seule fois) les sections images, caractéristiques et description"""
+        if self._details_built:
+            return
+        self._details_built = True
+        from tkinter import scrolledtext
+        from thumbnails import ThumbnailStore, ThumbnailStrip
+        fields_frame = self.fields_frame
         
         # Images
         images_frame = ttk.LabelFrame(fields_frame, text="Images (sélection multiple possible)")
@@ -248,6 +449,12 @@ class ProductManager:
         
         ttk.Label(images_frame, text="(Double-clic sur une ligne pour supprimer)").pack(anchor='w')
         
+        # Vignettes (décodées en arrière-plan, mises en cache mémoire et disque)
+        self.thumb_strip = ThumbnailStrip(images_frame, ThumbnailStore(manifest=self.image_manifest),
+                                          on_click=self.select_image,
+                                          on_double_click=self.remove_image_at)
+        self.thumb_strip.pack(fill='x', padx=5, pady=5)
+        
         # Caractéristiques (zone multilignes -> importer une par ligne)
         features_frame = ttk.LabelFrame(fields_frame, text="Caractéristiques (une par ligne)", padding=5)
         features_frame.pack(fill='x', pady=5)
@@ -285,18 +492,61 @@ class ProductManager:
                   command=self.delete_product).pack(side='left', padx=5)
         ttk.Button(buttons_frame, text="Sauvegarder JSON", 
                   command=self.save_products).pack(side='left', padx=5)
+        ttk.Button(buttons_frame, text="Annuler", 
+                  command=self.undo).pack(side='left', padx=(20,5))
+        ttk.Button(buttons_frame, text="Rétablir", 
+                  command=self.redo).pack(side='left', padx=5)
+        ttk.Button(buttons_frame, text="Historique…", 
+                  command=self.show_history).pack(side='left', padx=5)
+        ttk.Button(buttons_frame, text="Modification groupée…", 
+                  command=self.show_bulk_edit).pack(side='left', padx=5)
+        ttk.Button(buttons_frame, text="Popularité…", 
+                  command=self.show_popularity).pack(side='left', padx=5)
+        # état de la publication du site (faite en arrière-plan après la sauvegarde)
+        self.publish_status = ttk.Label(buttons_frame)
+        self.publish_status.pack(side='right', padx=5)
+
+        self.root.bind('<Control-z>', lambda e: self.undo())
+        self.root.bind('<Control-y>', lambda e: self.redo())
     
     def create_product_list(self, parent):
         """Créer la liste des produits"""
         list_frame = ttk.LabelFrame(parent, text="Produits existants")
         list_frame.pack(fill='both', expand=True, pady=5)
+        self.list_frame = list_frame
+        
+        # Barre de filtre (texte + facettes catégorie / boutique)
+        filter_bar = ttk.Frame(list_frame)
+        filter_bar.pack(side='top', fill='x')
+        self.var_filter = tk.StringVar()
+        self.var_filter_category = tk.StringVar()
+        self.var_filter_boutique = tk.StringVar()
+        
+        ttk.Label(filter_bar, text="Filtrer:").pack(side='left')
+        ttk.Entry(filter_bar, textvariable=self.var_filter, width=30).pack(side='left', padx=(5,15))
+        ttk.Label(filter_bar, text="Catégorie:").pack(side='left')
+        category_filter = ttk.Combobox(filter_bar, textvariable=self.var_filter_category, width=18, state='readonly')
+        category_filter.configure(postcommand=lambda: category_filter.configure(
+            values=[''] + self.index.facet_values('category')))
+        category_filter.pack(side='left', padx=(5,15))
+        ttk.Label(filter_bar, text="Boutique:").pack(side='left')
+        boutique_filter = ttk.Combobox(filter_bar, textvariable=self.var_filter_boutique, width=18, state='readonly')
+        boutique_filter.configure(postcommand=lambda: boutique_filter.configure(
+            values=[''] + self.index.facet_values('boutique')))
+        boutique_filter.pack(side='left', padx=5)
+        ttk.Button(filter_bar, text="Effacer le filtre", command=self.clear_filter).pack(side='left', padx=10)
+        
+        self.var_filter.trace('w', self.schedule_filter)
+        self.var_filter_category.trace('w', self.schedule_filter)
+        self.var_filter_boutique.trace('w', self.schedule_filter)
         
         # Treeview pour afficher les produits (ajout Boutique et Prix boutique)
         columns = ('ID', 'Titre', 'Catégorie', 'Boutique', 'Prix', 'Prix Boutique', 'Ancien prix', 'Stock')
         self.tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=8)
         
         for col in columns:
-            self.tree.heading(col, text=col)
+            # clic sur l'en-tête : tri (un second clic inverse l'ordre)
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
             # largeurs adaptatives
             if col == 'Titre':
                 self.tree.column(col, width=260)
@@ -353,6 +603,7 @@ class ProductManager:
     
     def add_images(self):
         """Ajouter plusieurs images en une sélection"""
+        from tkinter import filedialog
         file_paths = filedialog.askopenfilenames(
             title="Sélectionner des images",
             filetypes=[("Images", "*.jpg *.jpeg *.png *.gif *.bmp")]
@@ -366,6 +617,23 @@ class ProductManager:
                 if rel_path not in self.images_list:
                     self.images_list.append(rel_path)
                     self.images_listbox.insert(tk.END, rel_path)
+            self.refresh_thumbnails()
+    
+    def refresh_thumbnails(self):
+        """Mettre à jour la bande de vignettes d'après la liste des images."""
+        self.thumb_strip.show(self.images_list)
+    
+    def select_image(self, index):
+        """Sélectionner dans la liste l'image dont on a cliqué la vignette."""
+        self.images_listbox.selection_clear(0, tk.END)
+        self.images_listbox.selection_set(index)
+        self.images_listbox.see(index)
+    
+    def remove_image_at(self, index):
+        """Supprimer une image (double-clic sur sa vignette)."""
+        self.images_listbox.delete(index)
+        del self.images_list[index]
+        self.refresh_thumbnails()
     
     def remove_image(self, event):
         """Supprimer une image (double-clic) ou plusieurs si selection multiple"""
@@ -375,11 +643,13 @@ class ProductManager:
             for index in sorted(selection, reverse=True):
                 self.images_listbox.delete(index)
                 del self.images_list[index]
+            self.refresh_thumbnails()
     
     def clear_images(self):
         """Effacer toutes les images"""
         self.images_listbox.delete(0, tk.END)
         self.images_list.clear()
+        self.refresh_thumbnails()
     
     def add_feature(self):
         """Importer plusieurs caractéristiques depuis la zone de texte (une par ligne)."""
@@ -422,6 +692,7 @@ class ProductManager:
     
     def clear_form(self):
         """Effacer le formulaire"""
+        self.ensure_detail_fields()
         self.var_title.set("")
         self.var_short.set("")
         self.var_category.set("")
@@ -430,7 +701,7 @@ class ProductManager:
         self.var_priceBoutique.set("")
         self.var_oldprice.set("")
         self.var_stock.set("")
-        self.var_rating.set("")
+        self.var_rating.set("—")
         self.var_slug.set("")
         self.desc_text.delete(1.0, tk.END)
         self.clear_images()
@@ -479,24 +750,28 @@ class ProductManager:
             messagebox.showerror("Erreur", "Le stock doit être un entier!")
             return False
         
-        try:
-            float(self.var_rating.get())
-        except ValueError:
-            messagebox.showerror("Erreur", "La note doit être numérique!")
-            return False
-        
         return True
     
     def save_product(self):
         """Sauvegarder un produit"""
         if not self.validate_form():
             return
+        self.ensure_detail_fields()
         
         # Normaliser les chemins d'images avant création de l'objet produit
         normalized_images = [self.normalize_path(img) for img in self.images_list]
 
+        # Note calculée depuis les avis ; à défaut on conserve la note existante
+        product_id = self.current_product_id or self.get_next_id()
+        previous = self.catalog.get(product_id)
+        rating = self.reviews.rating(product_id)
+        if rating is None:
+            rating = (previous or {}).get('rating')
+
+        # Les champs absents du formulaire (variants, champs futurs...) sont conservés
         product = {
-            "id": self.current_product_id or self.get_next_id(),
+            **(previous or {}),
+            "id": product_id,
             "slug": self.var_slug.get().strip(),
             "title": self.var_title.get().strip(),
             "short": self.var_short.get().strip(),
@@ -506,11 +781,28 @@ class ProductManager:
             "priceBoutique": float(self.var_priceBoutique.get()) if self.var_priceBoutique.get().strip() else None,  # nouveau
             "oldPrice": float(self.var_oldprice.get()) if self.var_oldprice.get().strip() else None,
             "stock": int(self.var_stock.get()),
-            "rating": float(self.var_rating.get()),
+            "rating": rating,
             "images": normalized_images,
             "features": self.features_list.copy(),
             "description": self.desc_text.get(1.0, tk.END).strip()
         }
+        if isinstance(self.catalog, BoutiqueCatalog):
+            # une boutique ouverte seule : ses produits restent dans son fichier
+            product["boutique"] = self.catalog.boutique
+        
+        # Doublons probables (texte proche ou mêmes photos) : demander confirmation,
+        # pour un nouveau produit ou si son titre, son texte ou ses images ont changé
+        from dedup import compared, describe
+        if previous is None or compared(previous) != compared(product):
+            matches = self.duplicates.find(product)
+        else:
+            matches = []
+        if matches:
+            listing = "\n".join(f"  • {describe(m)}" for m in matches[:5])
+            if not messagebox.askyesno(
+                    "Doublon probable",
+                    f"Ce produit ressemble à :\n{listing}\n\nEnregistrer quand même ?"):
+                return
         
         # Ajouter la catégorie et la boutique aux sets connus
         if product["category"]:
@@ -519,40 +811,39 @@ class ProductManager:
             self.boutiques.add(product["boutique"])
         
         # Ajouter ou modifier le produit
-        if self.current_product_id:
-            # Modifier
-            for i, p in enumerate(self.products):
-                if p.get('id') == self.current_product_id:
-                    self.products[i] = product
-                    break
-            messagebox.showinfo("Succès", "Produit modifié avec succès!")
-        else:
-            # Ajouter
-            self.products.append(product)
+        if self.catalog.put(product):
             messagebox.showinfo("Succès", "Produit ajouté avec succès!")
+        else:
+            messagebox.showinfo("Succès", "Produit modifié avec succès!")
+        self.history.record_put(product)
         
-        self.refresh_product_list()
+        self.refresh_product(product)
         self.clear_form()
         self.current_product_id = None
     
+    def format_rating(self, product):
+        """Texte de la note calculée (moyenne, nombre d'avis) d'un produit."""
+        summary = self.reviews.summary(product.get('id'))
+        if summary["count"]:
+            return f"{summary['mean']:.1f}/5 ({summary['count']} avis)"
+        if product.get('rating') is not None:
+            return f"{product['rating']} (aucun avis)"
+        return "—"
+
     def load_product(self, event):
         """Charger un produit depuis la liste"""
         selection = self.tree.selection()
         if not selection:
             return
         
-        item = self.tree.item(selection[0])
-        product_id = item['values'][0]
+        product_id = self.row_ids.get(selection[0])
         
         # Trouver le produit
-        product = None
-        for p in self.products:
-            if p.get('id') == product_id:
-                product = p
-                break
+        product = self.catalog.get(product_id)
         
         if not product:
             return
+        self.ensure_detail_fields()
         
         # Charger les données dans le formulaire
         self.current_product_id = product.get('id')
@@ -564,7 +855,7 @@ class ProductManager:
         self.var_priceBoutique.set(str(product.get('priceBoutique', '') or ''))  # nouveau
         self.var_oldprice.set(str(product.get('oldPrice', '') or ''))
         self.var_stock.set(str(product.get('stock', '')))
-        self.var_rating.set(str(product.get('rating', '')))
+        self.var_rating.set(self.format_rating(product))
         self.var_slug.set(product.get('slug', ''))
         self.desc_text.delete(1.0, tk.END)
         self.desc_text.insert(1.0, product.get('description', ''))
@@ -575,6 +866,7 @@ class ProductManager:
             image_norm = self.normalize_path(image)
             self.images_list.append(image_norm)
             self.images_listbox.insert(tk.END, image_norm)
+        self.refresh_thumbnails()
         
         # Charger les caractéristiques
         self.clear_features()
@@ -590,35 +882,459 @@ class ProductManager:
             return
         
         if messagebox.askyesno("Confirmation", "Êtes-vous sûr de vouloir supprimer ce produit?"):
-            item = self.tree.item(selection[0])
-            product_id = item['values'][0]
+            product_id = self.row_ids.get(selection[0])
             
             # Supprimer le produit
-            self.products = [p for p in self.products if p.get('id') != product_id]
+            self.catalog.remove(product_id)
+            self.history.record_delete(product_id)
             
-            self.refresh_product_list()
+            self.remove_product_row(product_id)
             self.clear_form()
             self.current_product_id = None
             messagebox.showinfo("Succès", "Produit supprimé avec succès!")
     
+    def restore_version(self, version):
+        """Remplacer le catalogue courant par une version de l'historique."""
+        self.products = version.to_list()
+        self.extract_categories_and_boutiques()
+        self.refresh_product_list()
+        self.clear_form()
+        self.current_product_id = None
+
+    def undo(self):
+        """Annuler la dernière modification"""
+        if not self.history.can_undo():
+            return
+        self.restore_version(self.history.undo())
+
+    def redo(self):
+        """Rétablir la modification annulée"""
+        if not self.history.can_redo():
+            return
+        self.restore_version(self.history.redo())
+
+    def show_history(self):
+        """Fenêtre d'historique : liste des versions, comparaison et export du delta."""
+        win = tk.Toplevel(self.root)
+        win.title("Historique des modifications")
+        win.geometry("760x520")
+        from tkinter import scrolledtext
+
+        versions_list = tk.Listbox(win, height=10, selectmode=tk.EXTENDED)
+        versions_list.pack(fill='x', padx=10, pady=5)
+        diff_text = scrolledtext.ScrolledText(win, height=18, wrap=tk.NONE)
+        diff_text.pack(fill='both', expand=True, padx=10, pady=5)
+
+        def fill():
+            versions_list.delete(0, tk.END)
+            for i, v in enumerate(self.history.versions):
+                marker = "▶" if i == self.history.cursor else " "
+                stamp = time.strftime("%H:%M:%S", time.localtime(v.timestamp))
+                versions_list.insert(tk.END, f"{marker} v{v.number}  {stamp}  {v.label}")
+
+        def selected_pair():
+            """Deux versions sélectionnées, ou la sélection comparée à la version courante."""
+            selection = versions_list.curselection()
+            if not selection:
+                messagebox.showwarning("Attention", "Sélectionnez une ou deux versions!", parent=win)
+                return None
+            numbers = [self.history.versions[i].number for i in selection]
+            if len(numbers) == 1:
+                numbers.append(self.history.current.number)
+            return numbers[0], numbers[-1]
+
+        def compare():
+            pair = selected_pair()
+            if pair:
+                diff_text.delete(1.0, tk.END)
+                diff_text.insert(1.0, format_diff(self.history.diff(*pair)))
+
+        def export():
+            pair = selected_pair()
+            if not pair:
+                return
+            from tkinter import filedialog
+            path = filedialog.asksaveasfilename(
+                parent=win, title="Exporter le delta",
+                defaultextension=".json", initialfile=f"delta_v{pair[0]}_v{pair[1]}.json",
+                filetypes=[("JSON", "*.json")]
+            )
+            if path:
+                self.history.export_delta(pair[0], pair[1], path)
+                messagebox.showinfo("Succès", "Delta exporté avec succès!", parent=win)
+
+        def goto():
+            selection = versions_list.curselection()
+            if len(selection) != 1:
+                messagebox.showwarning("Attention", "Sélectionnez une seule version!", parent=win)
+                return
+            self.restore_version(self.history.goto(self.history.versions[selection[0]].number))
+            fill()
+
+        buttons = ttk.Frame(win)
+        buttons.pack(fill='x', padx=10, pady=5)
+        ttk.Button(buttons, text="Comparer", command=compare).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Exporter le delta", command=export).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Revenir à cette version", command=goto).pack(side='left', padx=5)
+        fill()
+
+    def show_bulk_edit(self):
+        """Fenêtre de modification groupée : sélection, opérations, aperçu puis application."""
+        win = tk.Toplevel(self.root)
+        win.title("Modification groupée des prix et du stock")
+        win.geometry("760x600")
+        from tkinter import scrolledtext
+        from bulk_edit import (FIELDS as BULK_FIELDS, OPERATION_LABELS, ROUND_MODES, BulkEditError,
+                               Selector, apply_plan, format_operation, parse_ids, parse_operation,
+                               plan)
+
+        # Sélection
+        sel_frame = ttk.LabelFrame(win, text="Sélection (critères combinés, vides = ignorés)", padding=5)
+        sel_frame.pack(fill='x', padx=10, pady=5)
+        var_category = tk.StringVar()
+        var_boutique = tk.StringVar()
+        var_min = tk.StringVar()
+        var_max = tk.StringVar()
+        var_ids = tk.StringVar()
+        ttk.Label(sel_frame, text="Catégorie:").grid(row=0, column=0, sticky='w')
+        ttk.Combobox(sel_frame, textvariable=var_category, state='readonly', width=20,
+                     values=[''] + self.index.facet_values('category')).grid(row=0, column=1, padx=5)
+        ttk.Label(sel_frame, text="Boutique:").grid(row=0, column=2, sticky='w')
+        ttk.Combobox(sel_frame, textvariable=var_boutique, state='readonly', width=20,
+                     values=[''] + self.index.facet_values('boutique')).grid(row=0, column=3, padx=5)
+        ttk.Label(sel_frame, text="Prix de:").grid(row=1, column=0, sticky='w')
+        ttk.Entry(sel_frame, textvariable=var_min, width=12).grid(row=1, column=1, sticky='w', padx=5)
+        ttk.Label(sel_frame, text="à:").grid(row=1, column=2, sticky='w')
+        ttk.Entry(sel_frame, textvariable=var_max, width=12).grid(row=1, column=3, sticky='w', padx=5)
+        ttk.Label(sel_frame, text="IDs (ex. 1,4,7-9):").grid(row=2, column=0, sticky='w')
+        ttk.Entry(sel_frame, textvariable=var_ids, width=40).grid(row=2, column=1, columnspan=3,
+                                                                 sticky='w', padx=5)
+
+        # Opérations (appliquées dans l'ordre)
+        ops_frame = ttk.LabelFrame(win, text="Opérations (dans l'ordre ; double-clic pour retirer)", padding=5)
+        ops_frame.pack(fill='x', padx=10, pady=5)
+        kinds = {label: kind for kind, label in OPERATION_LABELS.items()}
+        var_kind = tk.StringVar(value=OPERATION_LABELS['percent'])
+        var_field = tk.StringVar(value='price')
+        var_value = tk.StringVar()
+        var_mode = tk.StringVar(value=ROUND_MODES[0])
+        ttk.Combobox(ops_frame, textvariable=var_kind, state='readonly', width=18,
+                     values=list(kinds)).grid(row=0, column=0, padx=5)
+        ttk.Combobox(ops_frame, textvariable=var_field, state='readonly', width=14,
+                     values=list(BULK_FIELDS)).grid(row=0, column=1, padx=5)
+        ttk.Entry(ops_frame, textvariable=var_value, width=12).grid(row=0, column=2, padx=5)
+        ttk.Combobox(ops_frame, textvariable=var_mode, state='readonly', width=9,
+                     values=list(ROUND_MODES)).grid(row=0, column=3, padx=5)
+        ops_list = tk.Listbox(ops_frame, height=4)
+        ops_list.grid(row=1, column=0, columnspan=5, sticky='ew', pady=5)
+        ops_frame.columnconfigure(4, weight=1)
+        operations = []
+
+        def add_operation():
+            kind = kinds[var_kind.get()]
+            text = 'move' if kind == 'move' else f"{kind}:{var_field.get()}:{var_value.get()}"
+            if kind == 'round':
+                text += f":{var_mode.get()}"
+            try:
+                op = parse_operation(text)
+            except BulkEditError as e:
+                messagebox.showerror("Erreur", str(e), parent=win)
+                return
+            operations.append(op)
+            ops_list.insert(tk.END, format_operation(op))
+
+        def remove_operation(event):
+            selection = ops_list.curselection()
+            if selection:
+                ops_list.delete(selection[0])
+                del operations[selection[0]]
+
+        ops_list.bind('<Double-Button-1>', remove_operation)
+        ttk.Button(ops_frame, text="Ajouter l'opération", command=add_operation).grid(row=0, column=4,
+                                                                                     sticky='w', padx=5)
+
+        preview_text = scrolledtext.ScrolledText(win, height=14, wrap=tk.NONE)
+        preview_text.pack(fill='both', expand=True, padx=10, pady=5)
+
+        def build_plan():
+            try:
+                selector = Selector(
+                    var_category.get(), var_boutique.get(),
+                    float(var_min.get()) if var_min.get().strip() else None,
+                    float(var_max.get()) if var_max.get().strip() else None,
+                    parse_ids(var_ids.get()) if var_ids.get().strip() else None,
+                )
+                return plan(self.products, selector, operations)
+            except ValueError as e:
+                messagebox.showerror("Erreur", str(e), parent=win)
+                return None
+
+        def preview():
+            bulk = build_plan()
+            if bulk is not None:
+                preview_text.delete(1.0, tk.END)
+                preview_text.insert(1.0, bulk.preview())
+
+        def apply():
+            bulk = build_plan()
+            if bulk is None:
+                return
+            if not bulk.changes:
+                messagebox.showinfo("Information", "Aucun produit à modifier.", parent=win)
+                return
+            if not messagebox.askyesno("Confirmation",
+                                       f"Modifier {len(bulk.changes)} produit(s) ?", parent=win):
+                return
+            apply_plan(self.catalog, bulk, self.history)
+            self.refresh_product_list()
+            self.clear_form()
+            self.current_product_id = None
+            win.destroy()
+            messagebox.showinfo("Succès", f"{len(bulk.changes)} produit(s) modifié(s) "
+                                          "(annulable avec Ctrl+Z).")
+
+        buttons = ttk.Frame(win)
+        buttons.pack(fill='x', padx=10, pady=5)
+        ttk.Button(buttons, text="Aperçu", command=preview).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Appliquer", command=apply).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Fermer", command=win.destroy).pack(side='right', padx=5)
+
+    def show_popularity(self):
+        """Fenêtre du classement de popularité (vues, paniers) et des recherches fréquentes."""
+        win = tk.Toplevel(self.root)
+        win.title("Popularité des produits")
+        win.geometry("760x560")
+        from analytics import load_popularity, refresh as refresh_popularity
+
+        info = ttk.Label(win)
+        info.pack(fill='x', padx=10, pady=5)
+        columns = ('Rang', 'ID', 'Titre', 'Vues', 'Paniers')
+        ranking_tree = ttk.Treeview(win, columns=columns, show='headings', height=14)
+        for col in columns:
+            ranking_tree.heading(col, text=col)
+            ranking_tree.column(col, width=320 if col == 'Titre' else 70)
+        ranking_tree.pack(fill='both', expand=True, padx=10, pady=5)
+        ttk.Label(win, text="Recherches les plus fréquentes :").pack(anchor='w', padx=10)
+        queries_list = tk.Listbox(win, height=8)
+        queries_list.pack(fill='x', padx=10, pady=5)
+
+        def fill(data):
+            ranking_tree.delete(*ranking_tree.get_children())
+            queries_list.delete(0, tk.END)
+            for rank, pid in enumerate(data.get("ranking", []), 1):
+                product = self.catalog.get(pid)
+                if product is None:
+                    continue
+                views, carts = data["products"].get(str(pid), [0, 0])
+                ranking_tree.insert('', 'end', iid=str(pid),
+                                    values=(rank, pid, product.get('title', ''), views, carts))
+            for query, count in data.get("queries", []):
+                queries_list.insert(tk.END, f"{count:>6}  {query}")
+            generated = data.get("generated")
+            info.configure(text=(f"Classement du {time.strftime('%d/%m/%Y %H:%M', time.localtime(generated))}"
+                                 f" ({data.get('windowDays', '?')} derniers jours)"
+                                 if generated else "Aucun classement publié."))
+
+        def update():
+            win.configure(cursor='watch')
+            win.update_idletasks()
+            try:
+                # tout le catalogue, même quand une seule boutique est ouverte : les
+                # positions lues dans les journaux et data/popularite.json sont communes
+                data, lines = refresh_popularity(self.site_products())
+            except OSError as e:
+                messagebox.showerror("Erreur", f"Lecture des journaux impossible : {e}", parent=win)
+                return
+            finally:
+                win.configure(cursor='')
+            fill(data)
+            messagebox.showinfo("Succès", f"{lines} nouvelle(s) ligne(s) de journal lue(s).", parent=win)
+
+        def open_product(event):
+            # sélectionner le produit dans la liste principale et le charger dans le formulaire
+            selection = ranking_tree.selection()
+            if not selection or selection[0] not in self.row_ids:
+                return
+            iid = selection[0]
+            if iid not in self.tree.get_children():
+                # ligne masquée par le filtre : on l'enlève pour la montrer
+                self.clear_filter()
+                self.apply_view()
+            self.tree.selection_set(iid)
+            self.tree.see(iid)
+            self.load_product(None)
+
+        ranking_tree.bind('<Double-1>', open_product)
+        buttons = ttk.Frame(win)
+        buttons.pack(fill='x', padx=10, pady=5)
+        ttk.Button(buttons, text="Actualiser depuis les journaux", command=update).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Fermer", command=win.destroy).pack(side='right', padx=5)
+        fill(load_popularity())
+
+    def product_row(self, product):
+        """Valeurs affichées dans la liste pour un produit"""
+        return (
+            product.get('id', ''),
+            product.get('title', ''),
+            product.get('category', ''),
+            product.get('boutique', ''),                         # nouveau
+            f"{product.get('price', 0):.2f}",
+            f"{product.get('priceBoutique', '') if product.get('priceBoutique', None) is not None else ''}",
+            f"{product.get('oldPrice', '') if product.get('oldPrice', None) is not None else ''}",
+            product.get('stock', 0)
+        )
+
     def refresh_product_list(self):
-        """Actualiser la liste des produits"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        for product in self.products:
-            self.tree.insert('', 'end', values=(
-                product.get('id', ''),
-                product.get('title', ''),
-                product.get('category', ''),
-                product.get('boutique', ''),                         # nouveau
-                f"{product.get('price', 0):.2f}",
-                f"{product.get('priceBoutique', '') if product.get('priceBoutique', None) is not None else ''}",
-                f"{product.get('oldPrice', '') if product.get('oldPrice', None) is not None else ''}",
-                product.get('stock', 0)
-            ))
+        """Actualiser la liste des produits (remplissage progressif par tranches)"""
+        if self._fill_job is not None:
+            self.root.after_cancel(self._fill_job)
+            self._fill_job = None
+        # la liste entière change : l'index sera reconstruit au besoin ; celui des
+        # doublons ne réindexe que les produits modifiés
+        self._index = None
+        if self._duplicates is not None:
+            self._duplicates.sync(self.products)
+        self.row_ids = {}
+        self.tree.delete(*self.tree.get_children())
+        self._fill_rows(iter([p.get('id') for p in self.products]))
 
-if __name__ == "__main__":
+    def _fill_rows(self, ids):
+        """Insérer des lignes pendant FILL_SLICE_MS puis rendre la main à Tk"""
+        deadline = time.perf_counter() + FILL_SLICE_MS / 1000
+        for pid in ids:
+            # produit relu au moment de l'insertion : il a pu changer entre-temps
+            product = self.catalog.get(pid)
+            if product is not None:
+                self._insert_row(product)
+            if time.perf_counter() >= deadline:
+                self._fill_job = self.root.after_idle(self._fill_rows, ids)
+                return
+        self._fill_job = None
+        if self.sort_column or self.has_filter():
+            self.apply_view()
+
+    def _insert_row(self, product):
+        iid = str(product.get('id'))
+        if iid in self.row_ids:
+            return
+        self.tree.insert('', 'end', iid=iid, values=self.product_row(product))
+        self.row_ids[iid] = product.get('id')
+
+    def refresh_product(self, product):
+        """Mettre à jour (ou ajouter) la ligne d'un seul produit"""
+        iid = str(product.get('id'))
+        if self._index is not None:
+            self._index.update(product)
+        if self._duplicates is not None:
+            self._duplicates.update(product)
+        if iid in self.row_ids:
+            self.tree.item(iid, values=self.product_row(product))
+        else:
+            self._insert_row(product)
+        self.apply_view()
+
+    def remove_product_row(self, product_id):
+        """Retirer la ligne d'un produit supprimé"""
+        iid = str(product_id)
+        if self.row_ids.pop(iid, None) is not None:
+            self.tree.delete(iid)
+        if self._index is not None:
+            self._index.remove(product_id)
+        if self._duplicates is not None:
+            self._duplicates.remove(product_id)
+        self.update_list_title()
+
+    @property
+    def index(self):
+        """Index de tri / filtre, construit au premier usage"""
+        if self._index is None:
+            from catalog_index import CatalogIndex
+            self._index = CatalogIndex(self.products)
+        return self._index
+
+    @property
+    def duplicates(self):
+        """Index des doublons ; les images sans empreinte en cache sont hachées à l'enregistrement"""
+        if self._duplicates is None:
+            from dedup import DuplicateIndex, ImageHasher
+            hasher = ImageHasher(manifest=self.image_manifest)
+            self._duplicates = DuplicateIndex(self.products, hasher)
+        return self._duplicates
+
+    def sort_by(self, column):
+        """Trier la liste selon une colonne (clic sur l'en-tête)"""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        for col in self.tree['columns']:
+            arrow = ''
+            if col == self.sort_column:
+                arrow = ' ▼' if self.sort_reverse else ' ▲'
+            self.tree.heading(col, text=col + arrow)
+        self.apply_view()
+
+    def has_filter(self):
+        return bool(self.var_filter.get().strip() or self.var_filter_category.get()
+                    or self.var_filter_boutique.get())
+
+    def schedule_filter(self, *args):
+        """Relancer le filtre après FILTER_DELAY_MS sans nouvelle frappe"""
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(FILTER_DELAY_MS, self.apply_view)
+
+    def clear_filter(self):
+        self.var_filter.set("")
+        self.var_filter_category.set("")
+        self.var_filter_boutique.set("")
+
+    def apply_view(self):
+        """Réordonner / masquer les lignes existantes selon le tri et le filtre"""
+        self._filter_job = None
+        if not self.is_list_filled():
+            # appliqué à la fin du remplissage progressif
+            return
+        if self.sort_column:
+            ids = self.index.sorted_ids(self.sort_column, self.sort_reverse)
+        else:
+            ids = [p.get('id') for p in self.products]
+        visible = None
+        if self.has_filter():
+            visible = self.index.filter_ids(
+                self.var_filter.get(),
+                category=self.var_filter_category.get(),
+                boutique=self.var_filter_boutique.get(),
+            )
+        iids = [str(pid) for pid in ids if visible is None or pid in visible]
+        # une seule commande Tk : permutation des lignes, les autres sont détachées
+        self.tree.set_children('', *[iid for iid in iids if iid in self.row_ids])
+        self.update_list_title()
+
+    def update_list_title(self):
+        shown = len(self.tree.get_children())
+        total = len(self.row_ids)
+        text = "Produits existants" if shown == total else f"Produits existants ({shown}/{total})"
+        self.list_frame.configure(text=text)
+
+    def is_list_filled(self):
+        """La liste des produits est-elle entièrement remplie ?"""
+        return self._fill_job is None
+
+
+def main():
+    """Ouvrir le gestionnaire (point d'entrée commun avec website_structure_scraper.py)."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gestionnaire de produits")
+    parser.add_argument("--file", default=DEFAULT_JSON_FILE)
+    parser.add_argument("--boutique", help="n'ouvrir qu'une boutique (catalogue partitionné)")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = ProductManager(root)
+    app = ProductManager(root, args.file, args.boutique)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
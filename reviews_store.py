@@ -0,0 +1,271 @@
+"""Gestion des avis clients.
+
+Les avis sont stockés dans un journal en ajout seul (data/reviews.jsonl, un avis
+JSON par ligne). Les agrégats par produit (nombre, moyenne, histogramme des
+notes) sont maintenus de façon incrémentale : l'index mémorise la position
+déjà lue dans le journal et seules les nouvelles lignes sont rejouées au
+chargement.
+
+Le site lit un petit fichier par produit (data/reviews/<id>.json) au lieu de
+télécharger et filtrer tous les avis. Chaque fichier note la position du
+journal qu'il couvre ("logOffset") : un avis déjà présent n'y est jamais
+ajouté une seconde fois, même si l'index a été perdu ou si la publication a
+été interrompue avant son écriture. Quand le journal est rejoué depuis le
+début, les fichiers par produit sont reconstruits en entier.
+"""
+import json
+import os
+import time
+
+REVIEWS_LOG = "data/reviews.jsonl"
+REVIEWS_DIR = "data/reviews"
+INDEX_NAME = "index.json"
+
+
+def empty_summary():
+    """Agrégat vide pour un produit sans avis."""
+    return {"count": 0, "sum": 0, "histogram": [0, 0, 0, 0, 0]}
+
+
+def validate_rating(rating):
+    """Vérifier qu'une note est un entier entre 1 et 5 et la retourner."""
+    try:
+        value = int(rating)
+    except (TypeError, ValueError):
+        raise ValueError(f"Note invalide: {rating!r}")
+    if value != float(rating) or not 1 <= value <= 5:
+        raise ValueError(f"La note doit être un entier entre 1 et 5 (reçu {rating!r})")
+    return value
+
+
+class ReviewStore:
+    def __init__(self, log_file=REVIEWS_LOG, shards_dir=REVIEWS_DIR):
+        self.log_file = log_file
+        self.shards_dir = shards_dir
+        self.index_file = os.path.join(shards_dir, INDEX_NAME)
+        # product_id (str) -> {"count", "sum", "histogram"}
+        self.aggregates = {}
+        # avis ajoutés depuis la dernière publication, par produit :
+        # [(position de fin de la ligne dans le journal, avis)]
+        self.pending = {}
+        # position (octets) du journal déjà intégrée dans les agrégats
+        self.offset = 0
+        # journal rejoué depuis le début : les fichiers par produit sont à réécrire
+        self.full_replay = False
+        self.load()
+
+    def load(self):
+        """Charger l'index puis rejouer uniquement la fin du journal."""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.aggregates = {
+                pid: {"count": s["count"], "sum": s["sum"], "histogram": list(s["histogram"])}
+                for pid, s in data.get("products", {}).items()
+            }
+            self.offset = int(data.get("logOffset", 0))
+        except (OSError, ValueError, KeyError, TypeError):
+            self.aggregates = {}
+            self.offset = 0
+
+        size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        if size < self.offset:
+            # Journal remplacé ou tronqué : on repart de zéro
+            self.aggregates = {}
+            self.offset = 0
+        if size > self.offset:
+            self.full_replay = self.offset == 0
+            self.replay_from(self.offset)
+
+    def replay_from(self, offset):
+        """Intégrer les avis du journal à partir de la position donnée."""
+        with open(self.log_file, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    # ligne en cours d'écriture : elle sera lue au prochain chargement
+                    break
+                offset += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    review = json.loads(line)
+                    self._fold(review)
+                except (ValueError, KeyError, TypeError):
+                    # ligne illisible, ou JSON qui n'est pas un avis ([1], "x"...)
+                    continue
+                self.pending.setdefault(str(review["productId"]), []).append((offset, review))
+        self.offset = offset
+
+    def _fold(self, review):
+        """Ajouter un avis aux agrégats de son produit."""
+        rating = validate_rating(review["rating"])
+        summary = self.aggregates.setdefault(str(review["productId"]), empty_summary())
+        summary["count"] += 1
+        summary["sum"] += rating
+        summary["histogram"][rating - 1] += 1
+
+    def add_review(self, product_id, rating, author="", body="", date=None):
+        """Ajouter un avis au journal et mettre à jour les agrégats."""
+        review = {
+            "productId": product_id,
+            "rating": validate_rating(rating),
+            "author": (author or "").strip(),
+            "body": (body or "").strip(),
+            "date": date or time.strftime("%Y-%m-%d"),
+        }
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+        line = (json.dumps(review, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.log_file, 'ab') as f:
+            # le journal a pu grandir depuis le chargement (autre processus)
+            if f.tell() > self.offset:
+                self.replay_from(self.offset)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._fold(review)
+        self.offset += len(line)
+        self.pending.setdefault(str(product_id), []).append((self.offset, review))
+        return review
+
+    def summary(self, product_id):
+        """Retourner {count, mean, histogram} pour un produit."""
+        s = self.aggregates.get(str(product_id))
+        if not s or not s["count"]:
+            return {"count": 0, "mean": None, "histogram": [0, 0, 0, 0, 0]}
+        return {
+            "count": s["count"],
+            "mean": round(s["sum"] / s["count"], 2),
+            "histogram": list(s["histogram"]),
+        }
+
+    def rating(self, product_id):
+        """Note moyenne arrondie au dixième, ou None s'il n'y a pas d'avis."""
+        mean = self.summary(product_id)["mean"]
+        return None if mean is None else round(mean, 1)
+
+    def apply_ratings(self, products):
+        """Reporter la note calculée dans le champ 'rating' des produits.
+
+        Les dicts produits sont remplacés (et non modifiés) car ils peuvent être
+        partagés avec l'historique des versions. Retourne les produits remplacés,
+        à enregistrer dans l'historique.
+        """
+        changed = []
+        for i, prod in enumerate(products):
+            rating = self.rating(prod.get('id'))
+            if rating is not None and prod.get('rating') != rating:
+                products[i] = {**prod, 'rating': rating}
+                changed.append(products[i])
+        return changed
+
+    def shard_path(self, product_id):
+        return os.path.join(self.shards_dir, f"{product_id}.json")
+
+    def _read_shard(self, path):
+        """(avis, position du journal couverte) d'un fichier par produit."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                shard = json.load(f)
+            return list(shard.get("reviews", [])), int(shard.get("logOffset", 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return [], 0
+
+    def publish(self):
+        """Écrire les fichiers par produit modifiés, puis l'index des agrégats.
+
+        Les fichiers sont écrits avant l'index : après une interruption, le
+        journal est rejoué depuis la position de l'index et les avis qu'un
+        fichier couvre déjà (position de fin <= son "logOffset") sont ignorés.
+        """
+        os.makedirs(self.shards_dir, exist_ok=True)
+        if self.full_replay:
+            # tous les avis du journal sont dans pending : fichiers réécrits en entier,
+            # ceux des produits qui n'ont plus d'avis sont retirés
+            for name in os.listdir(self.shards_dir):
+                pid = name[:-len('.json')]
+                if name.endswith('.json') and name != INDEX_NAME and pid not in self.pending:
+                    os.remove(os.path.join(self.shards_dir, name))
+        for pid, entries in self.pending.items():
+            path = self.shard_path(pid)
+            if self.full_replay:
+                reviews, covered = [], 0
+            else:
+                reviews, covered = self._read_shard(path)
+            new_reviews = [review for end, review in entries if end > covered]
+            # les plus récents en premier
+            reviews = list(reversed(new_reviews)) + reviews
+            shard = {"productId": entries[0][1]["productId"], **self.summary(pid),
+                     "logOffset": self.offset, "reviews": reviews}
+            self._write_json(path, shard)
+        self.pending.clear()
+        self.full_replay = False
+
+        index = {
+            "logOffset": self.offset,
+            "products": {pid: s for pid, s in self.aggregates.items() if s["count"]},
+        }
+        self._write_json(self.index_file, index)
+
+    def rebuild(self):
+        """Reconstruire agrégats et fichiers par produit depuis le journal complet."""
+        self.aggregates = {}
+        self.pending = {}
+        self.offset = 0
+        self.full_replay = True
+        if os.path.exists(self.log_file):
+            self.replay_from(0)
+        self.publish()
+
+    def import_reviews(self, path):
+        """Importer un ancien fichier reviews.json (liste ou {"reviews": [...]})."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        reviews = data if isinstance(data, list) else data.get("reviews", [])
+        added = 0
+        for r in reviews:
+            try:
+                self.add_review(r["productId"], r["rating"], r.get("author", ""),
+                                r.get("body", ""), r.get("date"))
+                added += 1
+            except (KeyError, ValueError):
+                continue
+        return added
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gestion des avis clients")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_add = sub.add_parser("add", help="ajouter un avis")
+    p_add.add_argument("product_id", type=int)
+    p_add.add_argument("rating", type=int)
+    p_add.add_argument("--author", default="")
+    p_add.add_argument("--body", default="")
+    p_import = sub.add_parser("import", help="importer un fichier reviews.json")
+    p_import.add_argument("path")
+    sub.add_parser("publish", help="publier les fichiers par produit")
+    sub.add_parser("rebuild", help="tout reconstruire depuis le journal")
+    args = parser.parse_args()
+
+    store = ReviewStore()
+    if args.command == "add":
+        store.add_review(args.product_id, args.rating, args.author, args.body)
+        store.publish()
+        print(store.summary(args.product_id))
+    elif args.command == "import":
+        print(f"{store.import_reviews(args.path)} avis importé(s)")
+        store.publish()
+    elif args.command == "publish":
+        store.publish()
+    elif args.command == "rebuild":
+        store.rebuild()
@@ -10,7 +10,7 @@
 /* ---------------------
    Variables globales
    --------------------- */
-let PRODUCTS = [];           // Produits classiques (depuis data/produits.json)
+let PRODUCTS = [];           // Produits classiques (index allégé du catalogue)
 let SHUFFLED_PRODUCTS = [];  // Produits mélangés (une fois par chargement)
 let DEALS = [];              // Produits en promo
 
@@ -61,27 +61,12 @@ const productCardHTML = (p) => {
   `;
 };
 
-/**
- * shuffle (Fisher-Yates)
- * Retourne une NOUVELLE array mélangée; ne modifie pas l'array d'origine.
- */
-function shuffle(arr) {
-  const a = Array.isArray(arr) ? arr.slice() : [];
-  for (let i = a.length - 1; i > 0; i--) {
-    const j = Math.floor(Math.random() * (i + 1));
-    [a[i], a[j]] = [a[j], a[i]];
-  }
-  return a;
-}
-
 /* ---------------------
    Chargement produits
    --------------------- */
 async function loadProducts() {
   try {
-    const res = await fetch("data/produits.json");
-    const data = await res.json();
-    PRODUCTS = Array.isArray(data) ? data : (data.products || []);
+    PRODUCTS = await loadCatalogIndex(); // index allégé (scriptCommon.js)
     console.log("[PRODUCTS] chargés:", PRODUCTS.length);
 
     // --- mélange une fois au chargement de la page ---
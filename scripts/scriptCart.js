@@ -4,7 +4,8 @@
 /*
   Fonctionnalités :
   - lit 'cart_v1' (array) depuis localStorage
-  - fetch produits depuis ../../data/produits.json
+  - fetch produits depuis l'index allégé du catalogue (scriptCommon.js)
+  - fetch dimensions / aperçus des images depuis ../../data/images.json
   - affiche uniquement les items du panier
   - permet modifier qty, supprimer, save for later
   - applique un code promo simple
@@ -13,7 +14,8 @@
   - utilise SHUFFLED_PRODUCTS pour upsell aléatoire
 */
 
-const DATA_URL = "../../data/produits.json";
+const SITE_ROOT = "../../"; // racine du site (index allégé du catalogue, voir scriptCommon.js)
+const IMAGES_URL = "../../data/images.json";
 const CART_KEY = "cart_v1";
 const SAVED_KEY = "saved_v1";
 
@@ -96,25 +98,31 @@ function showToast(msg, timeout=2500){
   setTimeout(()=> toast.style.display = "none", timeout);
 }
 
-/**
- * shuffle (Fisher-Yates)
- * retourne une NOUVELLE array mélangée; ne modifie pas l'array d'origine.
- */
-function shuffle(arr) {
-  const a = Array.isArray(arr) ? arr.slice() : [];
-  for (let i = a.length - 1; i > 0; i--) {
-    const j = Math.floor(Math.random() * (i + 1));
-    [a[i], a[j]] = [a[j], a[i]];
+// métadonnées des images (largeur, hauteur, couleur, aperçu flou) par chemin
+let IMAGE_META = {};
+
+// style d'une image : place réservée et aperçu pendant le chargement
+function imageStyle(imgPath, fallbackHeight){
+  const m = IMAGE_META[imgPath];
+  if (!m || !m.width || !m.height) return `height:${fallbackHeight}px`;
+  const bg = [m.lqip ? `url(${m.lqip}) center/cover no-repeat` : "", m.color || ""].join(" ").trim();
+  return `aspect-ratio:${m.width}/${m.height}` + (bg ? `;background:${bg}` : "");
+}
+
+async function loadImageMeta(){
+  try{
+    const r = await fetch(IMAGES_URL);
+    IMAGE_META = (await r.json()).images || {};
+  }catch(e){
+    IMAGE_META = {};
   }
-  return a;
 }
 
 // fetch products
 async function loadProducts(){
   try{
-    const r = await fetch(DATA_URL);
-    const j = await r.json();
-    PRODUCTS = Array.isArray(j) ? j : (j.products || []);
+    const [products] = await Promise.all([loadCatalogIndex(SITE_ROOT), loadImageMeta()]);
+    PRODUCTS = products;
     // Mélange une fois au chargement pour usages aléatoires (stable pendant la session)
     SHUFFLED_PRODUCTS = shuffle(PRODUCTS);
   }catch(e){
@@ -320,7 +328,7 @@ function renderUpsell(){
     const p = final[i];
     const div = document.createElement("div");
     div.className = "product";
-    div.innerHTML = `<div style="padding:8px"><img src="${resolveImage(p.images?.[0])}" style="width:100%;height:120px;object-fit:cover;border-radius:8px"/><div style="margin-top:8px;font-weight:600">${p.title}</div><div class="small muted">${format(p.price)}</div><div style="margin-top:8px"><button class="btn small" data-id="${p.id}">Ajouter</button></div></div>`;
+    div.innerHTML = `<div style="padding:8px"><img src="${resolveImage(p.images?.[0])}" style="width:100%;${imageStyle(p.images?.[0], 120)};object-fit:cover;border-radius:8px"/><div style="margin-top:8px;font-weight:600">${p.title}</div><div class="small muted">${format(p.price)}</div><div style="margin-top:8px"><button class="btn small" data-id="${p.id}">Ajouter</button></div></div>`;
     upsellGrid.appendChild(div);
   }
   upsellGrid.querySelectorAll("button[data-id]").forEach(btn=>{
@@ -1,8 +1,10 @@
 // categories.js
 // --------- Config / état ----------
-const DATA_URL = "../../data/produits.json";
+const SITE_ROOT = "../../"; // racine du site (index allégé du catalogue, voir scriptCommon.js)
+const POPULARITY_URL = "../../data/popularite.json"; // classement publié par analytics.py
 let PRODUCTS = [];
 let SHUFFLED_PRODUCTS = [];
+let POPULARITY_RANK = new Map(); // id -> rang (0 = le plus populaire)
 
 // --------- DOM ----------
 const productGrid    = document.getElementById("productGrid");
@@ -21,7 +23,8 @@ const IMG_PREFIX = "../../";
 // --------- Helpers ----------
 function getSelectedCategory() {
     const params = new URLSearchParams(location.search);
-    return params.get("cat");
+    // les pages pré-rendues (page/produit/c/) portent la catégorie dans <body data-category>
+    return params.get("cat") || document.body.dataset.category;
 }
 function safePrice(n) {
     const num = Number(n);
@@ -34,24 +37,31 @@ function safeImgPath(p) {
 }
 
 /**
- * shuffle (Fisher-Yates)
- * retourne une NOUVELLE array mélangée; ne modifie pas l'array d'origine.
+ * Trie par popularité (tri stable) : les produits sans classement gardent
+ * leur ordre (mélangé) après les produits classés.
  */
-function shuffle(arr) {
-    const a = Array.isArray(arr) ? arr.slice() : [];
-    for (let i = a.length - 1; i > 0; i--) {
-        const j = Math.floor(Math.random() * (i + 1));
-        [a[i], a[j]] = [a[j], a[i]];
+function byPopularity(arr) {
+    if (!POPULARITY_RANK.size) return arr;
+    const rank = (p) => POPULARITY_RANK.get(String(p.id)) ?? Infinity;
+    return arr.slice().sort((a, b) => rank(a) - rank(b));
+}
+
+async function loadPopularity() {
+    try {
+        const r = await fetch(POPULARITY_URL);
+        if (!r.ok) return;
+        const j = await r.json();
+        POPULARITY_RANK = new Map((j.ranking || []).map((id, i) => [String(id), i]));
+    } catch (e) {
+        // pas de classement : ordre mélangé
     }
-    return a;
 }
 
 // --------- Chargement ----------
 async function loadProducts() {
     try {
-        const r = await fetch(DATA_URL);
-        const j = await r.json();
-        PRODUCTS = Array.isArray(j) ? j : (j.products || []);
+        const [products] = await Promise.all([loadCatalogIndex(SITE_ROOT), loadPopularity()]);
+        PRODUCTS = products;
         // mélange une fois au chargement : ordre différent à chaque reload
         SHUFFLED_PRODUCTS = shuffle(PRODUCTS);
 
@@ -71,13 +81,14 @@ function displayCategoryProduct() {
     let items = [];
 
     if (cat?.trim()) {
-        // si une catégorie est sélectionnée, on filtre puis on mélange (découverte dans la catégorie)
-        items = shuffle(PRODUCTS.filter(p => (p.category || "").toLowerCase() === cat.toLowerCase()));
+        // si une catégorie est sélectionnée, on filtre, on mélange puis on trie par popularité
+        // (les produits jamais vus restent mélangés à la suite : découverte dans la catégorie)
+        items = byPopularity(shuffle(PRODUCTS.filter(p => (p.category || "").toLowerCase() === cat.toLowerCase())));
         if (categoryTitle) categoryTitle.textContent = cat;
         if (categoryDesc)  categoryDesc.textContent  = `Découvrez nos produits dans la catégorie « ${cat} ».`;
     } else {
-        // page "Toutes les catégories" : on utilise SHUFFLED_PRODUCTS (déjà mélangé)
-        items = SHUFFLED_PRODUCTS.slice(0, 12);
+        // page "Toutes les catégories" : les plus populaires, sinon SHUFFLED_PRODUCTS (déjà mélangé)
+        items = byPopularity(SHUFFLED_PRODUCTS).slice(0, 12);
         if (categoryTitle) categoryTitle.textContent = "Toutes les catégories";
         if (categoryDesc)  categoryDesc.textContent  = "Découvrez nos univers et trouvez ce que vous cherchez.";
     }
@@ -0,0 +1,78 @@
+// scriptCommon.js
+"use strict";
+
+/**
+ * Fonctions communes à toutes les pages de la boutique.
+ * Chargé avant le script de la page (regroupés en un seul fichier par asset_build.py).
+ */
+
+/**
+ * shuffle (Fisher-Yates)
+ * Retourne une NOUVELLE array mélangée ; ne modifie pas l'array d'origine.
+ */
+function shuffle(arr) {
+  const a = Array.isArray(arr) ? arr.slice() : [];
+  for (let i = a.length - 1; i > 0; i--) {
+    const j = Math.floor(Math.random() * (i + 1));
+    [a[i], a[j]] = [a[j], a[i]];
+  }
+  return a;
+}
+
+/* ---------------------
+   Catalogue
+   --------------------- */
+
+// Index allégé publié par offline_cache.py : champs des cartes produit pour tout
+// le catalogue ; les fiches complètes sont dans des fragments de SHARD_SIZE ids.
+const CATALOG_INDEX_URL = "data/catalogue/index.json";
+const CATALOG_FULL_URL = "data/produits.json";
+let CATALOG_SHARD_SIZE = 0; // 0 : catalogue complet chargé (pas d'index publié)
+
+/**
+ * Produits pour les listes (accueil, catégories, panier...).
+ * root : chemin de la racine du site depuis la page ("" ou "../../").
+ */
+async function loadCatalogIndex(root = "") {
+  try {
+    const r = await fetch(root + CATALOG_INDEX_URL);
+    if (r.ok) {
+      const j = await r.json();
+      CATALOG_SHARD_SIZE = Number(j.shardSize) || 0;
+      return j.products || [];
+    }
+  } catch (e) {
+    // index absent : catalogue complet
+  }
+  const r = await fetch(root + CATALOG_FULL_URL);
+  const j = await r.json();
+  return Array.isArray(j) ? j : (j.products || []);
+}
+
+/** Fiche complète d'un produit de l'index (lue dans son fragment). */
+async function loadFullProduct(entry, root = "") {
+  if (!entry || !CATALOG_SHARD_SIZE) return entry;
+  const id = Number(entry.id);
+  const n = Number.isInteger(id) && id >= 0 ? Math.floor(id / CATALOG_SHARD_SIZE) : 0;
+  try {
+    const r = await fetch(`${root}data/catalogue/produits-${n}.json`);
+    if (!r.ok) return entry;
+    const j = await r.json();
+    return (j.products || []).find(p => String(p.id) === String(entry.id)) || entry;
+  } catch (e) {
+    return entry;
+  }
+}
+
+/* ---------------------
+   Hors ligne
+   --------------------- */
+
+// Service worker publié à la racine du site (dist/sw.js, voir offline_cache.py).
+// Résolu depuis ce script (scripts/...) pour fonctionner à toute profondeur de page.
+if ("serviceWorker" in navigator && document.currentScript && location.protocol !== "file:") {
+  const swUrl = new URL("../sw.js", document.currentScript.src);
+  window.addEventListener("load", () => {
+    navigator.serviceWorker.register(swUrl).catch(() => { /* pas de service worker (site non publié) */ });
+  });
+}
@@ -4,14 +4,16 @@
 /* -------------------------
    Configuration / sources
    ------------------------- */
-const PRODUCTS_URL = "../../data/produits.json";
-const REVIEWS_URL  = "../../data/reviews.json";
+const SITE_ROOT = "../../"; // racine du site (catalogue : voir scriptCommon.js)
+const REVIEWS_DIR  = "../../data/reviews/"; // un fichier <id>.json par produit
+const LOWEST_PRICES_URL = "../../data/prix_30j.json"; // prix le plus bas sur 30 jours (s'il diffère du prix actuel)
 
 /* -------------------------
    Récupération params URL
    ------------------------- */
 const params   = new URLSearchParams(location.search);
-const idParam  = params.get("id");
+// les pages pré-rendues (page/produit/p/) portent l'id dans <body data-product-id>
+const idParam  = params.get("id") || document.body.dataset.productId;
 const slugParam = params.get("slug");
 
 /* -------------------------
@@ -25,6 +27,7 @@ const pTitle         = $("pTitle");
 const pShort         = $("pShort");
 const pPrice         = $("pPrice");
 const pOld           = $("pOld");
+const pLowest        = $("pLowest");
 const pDescription   = $("pDescription");
 const pFeatures      = $("pFeatures");
 const pRating        = $("pRating");
@@ -45,7 +48,8 @@ const yearEl         = $("year");
    ------------------------- */
 let PRODUCTS = [];
 let SHUFFLED_PRODUCTS = []; // produits mélangés une fois au chargement
-let REVIEWS  = [];
+let REVIEWS  = null; // {count, mean, histogram, reviews} du produit affiché
+let LOWEST_PRICES = {}; // id -> prix le plus bas des 30 derniers jours
 let product  = null;
 
 /* -------------------------
@@ -64,19 +68,6 @@ function escapeHtml(str){
                    .replace(/"/g,"&quot;").replace(/'/g,"&#039;");
 }
 
-/**
- * shuffle (Fisher-Yates)
- * Retourne une NOUVELLE array mélangée ; ne modifie pas l'array d'origine.
- */
-function shuffle(arr) {
-  const a = Array.isArray(arr) ? arr.slice() : [];
-  for (let i = a.length - 1; i > 0; i--) {
-    const j = Math.floor(Math.random() * (i + 1));
-    [a[i], a[j]] = [a[j], a[i]];
-  }
-  return a;
-}
-
 /* -------------------------
    Cart helpers (localStorage)
    ------------------------- */
@@ -112,7 +103,7 @@ function addToCart(productId, qty = 1){
    Fetch helper
    ------------------------- */
 async function fetchJson(url){
-  const res = await fetch(url, {cache: "no-cache"});
+  const res = await fetch(url);
   if (!res.ok) throw new Error(`HTTP ${res.status} - ${url}`);
   return res.json();
 }
@@ -124,18 +115,20 @@ async function init(){
   try {
     if (yearEl) yearEl.textContent = new Date().getFullYear();
 
-    const [pJson, rJson] = await Promise.all([
-      fetchJson(PRODUCTS_URL).catch(e => { console.error(e); return []; }),
-      fetchJson(REVIEWS_URL).catch(e => { console.warn("reviews not found", e); return []; })
+    const [products, lowJson] = await Promise.all([
+      loadCatalogIndex(SITE_ROOT).catch(e => { console.error(e); return []; }),
+      fetchJson(LOWEST_PRICES_URL).catch(() => ({})),
     ]);
+    LOWEST_PRICES = (lowJson && lowJson.prices) || {};
 
-    PRODUCTS = Array.isArray(pJson) ? pJson : (pJson.products || []);
-    REVIEWS  = Array.isArray(rJson) ? rJson : (rJson.reviews || []);
+    // index allégé : suffisant pour les produits similaires et le panier
+    PRODUCTS = products;
 
     // Mélange une fois au chargement pour affichages aléatoires (stable pendant la session)
     SHUFFLED_PRODUCTS = shuffle(PRODUCTS);
 
-    selectProduct();
+    await selectProduct();
+    loadReviews();
     updateCartCount();
     attachUiHandlers();
   } catch (err) {
@@ -148,7 +141,7 @@ async function init(){
 /* -------------------------
    Select product by id/slug
    ------------------------- */
-function selectProduct(){
+async function selectProduct(){
   if (!PRODUCTS || !PRODUCTS.length) {
     console.warn("Aucun produit chargé.");
     return;
@@ -165,6 +158,8 @@ function selectProduct(){
     if (container) container.innerHTML = "<p>Produit introuvable.</p>";
     return;
   }
+  // fiche complète (description, caractéristiques, variantes) depuis son fragment
+  product = await loadFullProduct(product, SITE_ROOT);
   renderProduct();
 }
 
@@ -203,6 +198,11 @@ function renderProduct(){
   if (pShort) pShort.textContent = product.short || "";
   if (pPrice) pPrice.textContent = `${formatPrice(product.price)} FCFA`;
   if (pOld) pOld.textContent = product.oldPrice ? `${formatPrice(product.oldPrice)} FCFA` : "";
+  if (pLowest) {
+    // mention affichée seulement à côté d'un ancien prix
+    const low = LOWEST_PRICES[String(product.id)] ?? product.price;
+    pLowest.textContent = product.oldPrice ? `Prix le plus bas des 30 derniers jours : ${formatPrice(low)} FCFA` : "";
+  }
 
   // Description & features
   if (pDescription) pDescription.innerHTML = product.description || "";
@@ -261,13 +261,22 @@ function updateWhatsAppLink(){
 }
 
 /* -------------------------
-   Reviews
+   Reviews (fichier par produit : data/reviews/<id>.json)
    ------------------------- */
+async function loadReviews(){
+  if (!product) return;
+  try {
+    REVIEWS = await fetchJson(`${REVIEWS_DIR}${encodeURIComponent(product.id)}.json`);
+  } catch (e) {
+    REVIEWS = null; // pas encore d'avis pour ce produit
+  }
+  renderReviews();
+}
+
 function renderReviews(){
-  if (!REVIEWS) return;
-  const revs = REVIEWS.filter(r => String(r.productId) === String(product.id));
-  const count = revs.length;
-  const avg = count ? (revs.reduce((s,r)=>s + Number(r.rating || 0), 0) / count) : 0;
+  const revs = (REVIEWS && Array.isArray(REVIEWS.reviews)) ? REVIEWS.reviews : [];
+  const count = REVIEWS ? (Number(REVIEWS.count) || revs.length) : 0;
+  const avg = count ? (Number(REVIEWS.mean) || 0) : 0;
   const rounded = Math.round(avg * 10) / 10;
 
   if (pRating) {
@@ -0,0 +1,493 @@
+"""Plan du site et flux produits, publiés de façon incrémentale.
+
+Fichiers publiés à la racine du site (protocole sitemaps.org) :
+  - sitemap.xml : index des plans ci-dessous ;
+  - sitemap-pages.xml : accueil, pages d'information et pages catégorie ;
+  - sitemap-produits-<n>.xml : pages produit pré-rendues (static_site.py) des
+    ids n*SITEMAP_ID_BLOCK à (n+1)*SITEMAP_ID_BLOCK-1, avec leurs images. Un
+    plan qui dépasserait les limites du protocole (MAX_URLS adresses ou
+    MAX_BYTES octets) est continué dans sitemap-produits-<n>-<k>.xml.
+et dans data/flux/ : produits.csv et produits.xml (RSS 2.0 avec l'espace de
+noms g: de Google Merchant), avec prix, promotion, stock, disponibilité,
+boutique, catégorie et images de chaque produit.
+
+Dates de modification : l'empreinte de chaque produit (ses champs et celle de
+ses images dans data/images.json) est gardée dans .cache/feeds_state.json avec
+la date de son dernier changement, qui devient le <lastmod> de sa page. Seuls
+les produits annoncés comme modifiés, et les nouveaux, sont ré-empreintés.
+
+Mémoire bornée : les fichiers sont écrits au fil de l'eau, produit par produit.
+Seuls les plans qui contiennent un produit modifié (ajouté ou retiré) sont
+réécrits. Pour les flux, la position de chaque produit dans le fichier
+précédent est gardée : les lignes des produits inchangés y sont recopiées
+telles quelles, seules celles des produits modifiés sont remises en forme.
+
+Les balises OpenGraph de chaque produit sont dans sa page pré-rendue
+(templates/product.html).
+
+Usage : python site_feeds.py [--file FICHIER] [--force]
+"""
+import csv
+import fnmatch
+import hashlib
+import io
+import json
+import math
+import os
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from static_site import DEFAULT_OG_IMAGE, SITE_URL, absolute_url, category_page_path, \
+    load_images, product_page_path
+
+SITEMAP_INDEX = "sitemap.xml"
+PAGES_SITEMAP = "sitemap-pages.xml"
+PRODUCTS_SITEMAP = "sitemap-produits-{}.xml"
+SITEMAP_ID_BLOCK = 10000
+# limites d'un plan du site (protocole sitemaps.org), fichier non compressé
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+MAX_IMAGES_PER_URL = 1000
+
+FEED_CSV = "data/flux/produits.csv"
+FEED_XML = "data/flux/produits.xml"
+FEED_TITLE = "TongaMarket"
+FEED_DESCRIPTION = "Catalogue des produits TongaMarket"
+CURRENCY = "XAF"
+MAX_ADDITIONAL_IMAGES = 10
+FEED_COLUMNS = ("id", "title", "description", "link", "image_link", "additional_image_link",
+                "price", "sale_price", "availability", "quantity", "brand", "product_type",
+                "condition")
+_COPY_BLOCK = 1 << 20
+
+INFO_PAGES_DIR = "page/info"
+LISTING_PAGES = ("page/produit/categories.html",)
+STATE_FILE = ".cache/feeds_state.json"
+# à changer quand le contenu des fichiers publiés change de forme
+FEEDS_VERSION = 1
+
+_URLSET_HEAD = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+                'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n').encode()
+_URLSET_TAIL = b"</urlset>\n"
+_RSS_HEAD = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0"><channel>\n'
+             f'<title>{FEED_TITLE}</title><link>{SITE_URL}</link>'
+             f'<description>{FEED_DESCRIPTION}</description>\n').encode()
+_RSS_TAIL = b"</channel></rss>\n"
+
+
+def _w3c_date(moment):
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def _now():
+    return _w3c_date(datetime.now(timezone.utc))
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def product_fingerprint(product, images):
+    """Empreinte d'un produit et de ses images (telles que publiées dans data/images.json)."""
+    hashes = [(images.get(img) or {}).get("hash") for img in product.get("images") or []]
+    data = json.dumps([product, hashes], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+def sitemap_block(product_id):
+    """Numéro du plan d'un produit (0 pour un id non entier)."""
+    if isinstance(product_id, int) and not isinstance(product_id, bool) and product_id >= 0:
+        return product_id // SITEMAP_ID_BLOCK
+    return 0
+
+
+# --- plan du site ---
+
+def url_entry(loc, lastmod=None, images=()):
+    parts = [f"<url><loc>{escape(loc)}</loc>"]
+    if lastmod:
+        parts.append(f"<lastmod>{lastmod}</lastmod>")
+    parts += [f"<image:image><image:loc>{escape(img)}</image:loc></image:image>"
+              for img in images[:MAX_IMAGES_PER_URL]]
+    parts.append("</url>\n")
+    return "".join(parts).encode("utf-8")
+
+
+class SitemapWriter:
+    """Écriture au fil de l'eau de plans <urlset>.
+
+    Un nouveau fichier est commencé plutôt que de dépasser MAX_URLS adresses
+    ou MAX_BYTES octets ; `names` donne le nom du k-ième fichier.
+    """
+
+    def __init__(self, root, names):
+        self.root = root
+        self.names = names
+        self.files = []
+        self._out = None
+        self._count = 0
+        self._size = 0
+
+    def _next(self):
+        self._finish()
+        name = self.names(len(self.files))
+        self._out = open(os.path.join(self.root, name + ".tmp"), "wb")
+        self._out.write(_URLSET_HEAD)
+        self.files.append(name)
+        self._count = 0
+        self._size = len(_URLSET_HEAD) + len(_URLSET_TAIL)
+
+    def _finish(self):
+        if self._out is not None:
+            self._out.write(_URLSET_TAIL)
+            self._out.close()
+            self._out = None
+            name = self.files[-1]
+            os.replace(os.path.join(self.root, name + ".tmp"), os.path.join(self.root, name))
+
+    def add(self, entry):
+        if self._out is None or self._count >= MAX_URLS or self._size + len(entry) > MAX_BYTES:
+            self._next()
+        self._out.write(entry)
+        self._count += 1
+        self._size += len(entry)
+
+    def close(self):
+        """Terminer le fichier en cours ; retourne les noms des fichiers écrits."""
+        self._finish()
+        return self.files
+
+
+def _products_sitemap_name(block):
+    def name(k):
+        return PRODUCTS_SITEMAP.format(block if k == 0 else f"{block}-{k}")
+    return name
+
+
+def _write_small(path, data):
+    """Écrire un petit fichier s'il a changé ; retourne True s'il a été réécrit."""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def _file_date(path):
+    return _w3c_date(datetime.fromtimestamp(os.path.getmtime(path), timezone.utc))
+
+
+# --- flux produits ---
+
+def _price(value):
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return ""
+    if not math.isfinite(amount):
+        return ""
+    return f"{amount:.0f} {CURRENCY}" if amount == int(amount) else f"{amount:.2f} {CURRENCY}"
+
+
+def _quantity(product):
+    try:
+        return max(0, int(product.get("stock") or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def feed_fields(product):
+    """Champs d'un produit dans les flux (noms des attributs Google Merchant)."""
+    images = [absolute_url(img) for img in product.get("images") or [] if img]
+    price, old_price = product.get("price"), product.get("oldPrice")
+    try:
+        on_sale = old_price is not None and price is not None and float(old_price) > float(price)
+    except (TypeError, ValueError):
+        on_sale = False
+    quantity = _quantity(product)
+    return {
+        "id": str(product.get("id")),
+        "title": product.get("title") or "",
+        "description": product.get("short") or "",
+        "link": absolute_url(product_page_path(product)),
+        "image_link": images[0] if images else absolute_url(DEFAULT_OG_IMAGE),
+        "additional_image_link": images[1:1 + MAX_ADDITIONAL_IMAGES],
+        # en promotion : l'ancien prix est le prix, le prix courant le prix soldé
+        "price": _price(old_price if on_sale else price),
+        "sale_price": _price(price) if on_sale else "",
+        "availability": "in_stock" if quantity > 0 else "out_of_stock",
+        "quantity": str(quantity),
+        "brand": product.get("boutique") or "",
+        "product_type": product.get("category") or "",
+        "condition": "new",
+    }
+
+
+def csv_row(product):
+    fields = feed_fields(product)
+    fields["additional_image_link"] = ",".join(fields["additional_image_link"])
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow([fields[c] for c in FEED_COLUMNS])
+    return buffer.getvalue().encode("utf-8")
+
+
+def xml_item(product):
+    fields = feed_fields(product)
+    parts = ["<item>"]
+    for column in FEED_COLUMNS:
+        values = fields[column]
+        tag = column if column in ("title", "description", "link") else f"g:{column}"
+        for value in values if isinstance(values, list) else [values]:
+            if value:
+                parts.append(f"<{tag}>{escape(value)}</{tag}>")
+    parts.append("</item>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def _csv_head():
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(FEED_COLUMNS)
+    return buffer.getvalue().encode("utf-8")
+
+
+def write_feed(path, head, tail, rows, previous=None):
+    """Écrire un flux au fil de l'eau.
+
+    rows : (clé, produit, modifié ?, mise en forme) dans l'ordre du flux ;
+    previous : état du fichier précédent ({"stamp", "rows": {clé: [position, longueur]}}).
+    Les lignes des produits non modifiés sont recopiées du fichier précédent
+    s'il n'a pas été touché depuis. Retourne (nouvel état, lignes mises en forme).
+    """
+    spans = {}
+    if previous and previous.get("stamp") == _stamp(path):
+        spans = previous.get("rows", {})
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    index = {}
+    rendered = 0
+    tmp = path + ".tmp"
+    old = open(path, "rb") if spans else None
+    # lignes contiguës dans le fichier précédent : recopiées d'un bloc
+    pending = [0, 0]
+
+    def flush():
+        start, end = pending
+        old.seek(start)
+        while start < end:
+            block = old.read(min(_COPY_BLOCK, end - start))
+            out.write(block)
+            start += len(block)
+        pending[:] = [0, 0]
+
+    try:
+        with open(tmp, "wb") as out:
+            out.write(head)
+            position = len(head)
+            for key, product, modified, render in rows:
+                span = None if modified else spans.get(key)
+                if span:
+                    if span[0] != pending[1]:
+                        flush()
+                        pending[0] = span[0]
+                    pending[1] = span[0] + span[1]
+                    index[key] = [position, span[1]]
+                    position += span[1]
+                    continue
+                if pending[1]:
+                    flush()
+                data = render(product)
+                rendered += 1
+                index[key] = [position, len(data)]
+                position += len(data)
+                out.write(data)
+            if pending[1]:
+                flush()
+            out.write(tail)
+    finally:
+        if old is not None:
+            old.close()
+    os.replace(tmp, path)
+    return {"stamp": _stamp(path), "rows": index}, rendered
+
+
+# --- publication ---
+
+def load_state(root="."):
+    try:
+        with open(os.path.join(root, STATE_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    if state.get("version") != FEEDS_VERSION:
+        state = {}
+    return {"version": FEEDS_VERSION, "products": state.get("products", {}),
+            "sitemaps": state.get("sitemaps", {}), "feeds": state.get("feeds", {})}
+
+
+def save_state(state, root="."):
+    path = os.path.join(root, STATE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(state, ensure_ascii=False, separators=(",", ":")))
+    os.replace(tmp, path)
+
+
+def publish_feeds(products, changed_ids=None, root=".", images=None, force=False):
+    """Publier les plans du site et les flux produits.
+
+    changed_ids : ids des produits ajoutés, modifiés ou supprimés depuis la
+    dernière publication ; None pour tout vérifier.
+    images : métadonnées des images ; par défaut celles du manifeste publié.
+    Retourne {"changed", "sitemaps", "rows"} : produits dont la date a changé,
+    plans réécrits et lignes de flux mises en forme.
+    """
+    if images is None:
+        images = load_images(root)
+    state = load_state(root)
+    if force:
+        # tout réécrire, sans perdre les dates des produits inchangés
+        state.update(sitemaps={}, feeds={})
+        changed_ids = None
+    known = state["products"]
+    check = None if changed_ids is None else {str(pid) for pid in changed_ids}
+    now = _now()
+
+    # empreinte et date de chaque produit ; le premier produit d'un id ou d'une page l'emporte
+    dates = {}
+    modified = set()
+    unique = []
+    paths = set()
+    for product in products:
+        key = str(product.get("id"))
+        path = product_page_path(product)
+        if key in dates or path in paths:
+            continue
+        paths.add(path)
+        unique.append(product)
+        old = known.get(key)
+        if old is not None and check is not None and key not in check:
+            dates[key] = old
+            continue
+        fp = product_fingerprint(product, images)
+        if old is not None and old[0] == fp:
+            dates[key] = old
+        else:
+            dates[key] = [fp, now]
+            modified.add(key)
+    removed = known.keys() - dates.keys()
+
+    # plans des produits, par tranche d'ids : seuls ceux dont un produit a changé sont réécrits
+    blocks = {}
+    for product in unique:
+        blocks.setdefault(sitemap_block(product.get("id")), []).append(product)
+    old_sitemaps = state["sitemaps"]
+    sitemaps = {}
+    rewritten = 0
+    for block in sorted(blocks):
+        members = blocks[block]
+        keys = [str(p.get("id")) for p in members]
+        signature = hashlib.sha1("\n".join(keys).encode("utf-8")).hexdigest()[:16]
+        lastmod = max(dates[k][1] for k in keys)
+        previous = old_sitemaps.get(str(block))
+        if (previous and previous["members"] == signature and not modified.intersection(keys)
+                and all(os.path.exists(os.path.join(root, name)) for name in previous["files"])):
+            sitemaps[str(block)] = previous
+            continue
+        writer = SitemapWriter(root, _products_sitemap_name(block))
+        for product, key in zip(members, keys):
+            writer.add(url_entry(absolute_url(product_page_path(product)), dates[key][1],
+                                 [absolute_url(img) for img in product.get("images") or [] if img]))
+        files = writer.close()
+        rewritten += len(files)
+        sitemaps[str(block)] = {"members": signature, "files": files, "lastmod": lastmod}
+    # plans qui ne sont plus produits (tranche vidée, fichier de continuation inutile)
+    published = {name for info in sitemaps.values() for name in info["files"]}
+    for name in os.listdir(root or "."):
+        if fnmatch.fnmatchcase(name, PRODUCTS_SITEMAP.format("*")) and name not in published:
+            _remove(os.path.join(root, name))
+
+    # pages hors produits : petit fichier, réécrit seulement si son contenu change
+    latest = max((d[1] for d in dates.values()), default=now)
+    by_category = {}
+    for product in unique:
+        if product.get("category"):
+            key = str(product.get("id"))
+            by_category[product["category"]] = max(by_category.get(product["category"], ""),
+                                                    dates[key][1])
+    entries = [url_entry(SITE_URL, latest)]
+    entries += [url_entry(absolute_url(page), latest) for page in LISTING_PAGES]
+    info_dir = os.path.join(root, *INFO_PAGES_DIR.split("/"))
+    for name in sorted(os.listdir(info_dir)) if os.path.isdir(info_dir) else []:
+        if name.endswith(".html"):
+            entries.append(url_entry(absolute_url(f"{INFO_PAGES_DIR}/{name}"),
+                                     _file_date(os.path.join(info_dir, name))))
+    entries += [url_entry(absolute_url(category_page_path(c)), by_category[c])
+                for c in sorted(by_category)]
+    pages_xml = _URLSET_HEAD + b"".join(entries) + _URLSET_TAIL
+    if _write_small(os.path.join(root, PAGES_SITEMAP), pages_xml):
+        rewritten += 1
+
+    index = [(PAGES_SITEMAP, latest)]
+    index += [(name, info["lastmod"]) for _, info in sorted(sitemaps.items(), key=lambda i: int(i[0]))
+              for name in info["files"]]
+    index_xml = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+                 + "".join(f"<sitemap><loc>{escape(SITE_URL + name)}</loc>"
+                           f"<lastmod>{lastmod}</lastmod></sitemap>\n" for name, lastmod in index)
+                 + "</sitemapindex>\n").encode("utf-8")
+    _write_small(os.path.join(root, SITEMAP_INDEX), index_xml)
+
+    # flux : recopie des lignes inchangées, mise en forme des seules lignes modifiées
+    rows_rendered = 0
+    feeds = {}
+    for name, path, head, tail, render in (("csv", FEED_CSV, _csv_head(), b"", csv_row),
+                                           ("xml", FEED_XML, _RSS_HEAD, _RSS_TAIL, xml_item)):
+        out_path = os.path.join(root, *path.split("/"))
+        previous = state["feeds"].get(name)
+        if (previous and not modified and not removed
+                and previous.get("stamp") == _stamp(out_path)):
+            feeds[name] = previous
+            continue
+        rows = ((str(p.get("id")), p, str(p.get("id")) in modified, render) for p in unique)
+        feeds[name], count = write_feed(out_path, head, tail, rows, previous)
+        rows_rendered += count
+
+    save_state({"version": FEEDS_VERSION, "products": dates, "sitemaps": sitemaps, "feeds": feeds},
+               root)
+    return {"changed": len(modified) + len(removed), "sitemaps": rewritten, "rows": rows_rendered}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from catalog import Catalog
+
+    parser = argparse.ArgumentParser(description="Publier le plan du site et les flux produits")
+    parser.add_argument("--file", default="data/produits.json")
+    parser.add_argument("--force", action="store_true", help="tout réécrire")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    report = publish_feeds(Catalog(args.file).load(), force=args.force)
+    print(f"{report['changed']} produit(s) modifié(s), {report['sitemaps']} plan(s) réécrit(s), "
+          f"{report['rows']} ligne(s) de flux en {time.perf_counter() - t0:.2f}s")
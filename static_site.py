@@ -0,0 +1,440 @@
+"""Pré-rendu statique des pages produit et catégorie.
+
+Génère une page HTML par produit (page/produit/p/<slug>.html) et par
+catégorie (page/produit/c/<catégorie>.html) à partir du catalogue : titre,
+prix, description, caractéristiques, images et balises OpenGraph sont déjà
+dans le HTML, sans attendre que le JavaScript télécharge tout le catalogue.
+Les scripts du site reprennent ensuite la main sur ces pages (panier, avis...).
+
+Rendu incrémental : chaque page connaît les produits qu'elle affiche (graphe
+de dépendances) et l'empreinte de ses données. Après une modification, seules
+les pages qui affichent un produit modifié sont recalculées, et seules celles
+dont l'empreinte a changé sont réécrites. L'état est gardé dans
+.cache/ssg_state.json.
+
+Les dimensions et aperçus flous du manifeste des images (image_manifest.py)
+sont insérés dans les balises <img> pour réserver leur place. Le prix le plus
+bas des 30 derniers jours (price_history.py) accompagne l'ancien prix.
+
+Les gabarits (templates/) sont compilés une seule fois par processus ; au-delà
+de PARALLEL_THRESHOLD pages, le rendu est réparti sur un pool de processus.
+"""
+import hashlib
+import html
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from catalog_schema import slugify
+from image_manifest import MANIFEST_FILE, image_attrs
+from price_history import PUBLISHED_FILE as LOWEST_PRICES_FILE
+
+SITE_URL = "https://djatten.github.io/TongaMarketPlace/"
+DEFAULT_OG_IMAGE = "img/logo/OpenGraph.png"
+
+TEMPLATE_DIR = "templates"
+PRODUCT_PAGES_DIR = "page/produit/p"
+CATEGORY_PAGES_DIR = "page/produit/c"
+STATE_FILE = ".cache/ssg_state.json"
+
+# Les pages générées ont <base href="../"> : les chemins sont relatifs à page/produit/
+ASSET_PREFIX = "../../"
+
+SIMILAR_LIMIT = 4
+CATEGORY_PAGE_LIMIT = 60
+PARALLEL_THRESHOLD = 64
+
+_TOKEN = re.compile(r"\{\{\{\s*(\w+)\s*\}\}\}|\{\{\s*(\w+)\s*\}\}")
+
+# Gabarits compilés du processus courant (rempli par load_templates)
+_TEMPLATES = {}
+
+
+def compile_template(text):
+    """Compiler un gabarit : {{ nom }} est échappé, {{{ nom }}} inséré tel quel."""
+    ops = []
+    pos = 0
+    for m in _TOKEN.finditer(text):
+        if m.start() > pos:
+            ops.append((text[pos:m.start()], None, False))
+        raw_name, escaped_name = m.groups()
+        ops.append((None, raw_name or escaped_name, escaped_name is not None))
+        pos = m.end()
+    if pos < len(text):
+        ops.append((text[pos:], None, False))
+
+    def render(ctx):
+        out = []
+        for literal, name, escape in ops:
+            if name is None:
+                out.append(literal)
+            else:
+                value = ctx.get(name, "")
+                value = "" if value is None else str(value)
+                out.append(html.escape(value) if escape else value)
+        return "".join(out)
+
+    return render
+
+
+def load_templates(template_dir=TEMPLATE_DIR):
+    """Compiler les gabarits une fois par processus."""
+    if _TEMPLATES.get("_dir") != template_dir:
+        _TEMPLATES.clear()
+        for name in ("product", "category", "card", "similar"):
+            with open(os.path.join(template_dir, f"{name}.html"), 'r', encoding='utf-8') as f:
+                _TEMPLATES[name] = compile_template(f.read())
+        _TEMPLATES["_dir"] = template_dir
+    return _TEMPLATES
+
+
+def templates_digest(template_dir=TEMPLATE_DIR):
+    """Empreinte des gabarits : les modifier invalide toutes les pages."""
+    h = hashlib.sha1()
+    for name in ("product", "category", "card", "similar"):
+        with open(os.path.join(template_dir, f"{name}.html"), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def product_page_path(product):
+    slug = slugify(product.get('slug') or product.get('title')) or str(product.get('id'))
+    return f"{PRODUCT_PAGES_DIR}/{slug}.html"
+
+
+def category_page_path(category):
+    return f"{CATEGORY_PAGES_DIR}/{slugify(category) or 'autres'}.html"
+
+
+def absolute_url(path):
+    return SITE_URL + quote(path)
+
+
+def format_price(value):
+    """Prix au format du site : '16 000 FCFA'."""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return ""
+    text = f"{amount:,.0f}" if amount == int(amount) else f"{amount:,.2f}"
+    return text.replace(",", " ") + " FCFA"
+
+
+def first_image(product):
+    images = product.get('images') or []
+    return images[0] if images and images[0] else ""
+
+
+def card_context(product, images):
+    """Données d'une vignette produit (grille catégorie / produits similaires)."""
+    image = first_image(product)
+    old_price = product.get('oldPrice')
+    return {
+        "href": product_page_path(product)[len("page/produit/"):],
+        "image": ASSET_PREFIX + image if image else ASSET_PREFIX + "img/placeholder.jpg",
+        "img_attrs": image_attrs(images.get(image)),
+        "title": product.get('title') or "Sans titre",
+        "price_text": format_price(product.get('price')),
+        "old_price_html": f'<div class="oldprice">{html.escape(format_price(old_price))}</div>' if old_price else "",
+    }
+
+
+def og_image_meta(meta):
+    """Balises og:image:width / og:image:height, si les dimensions de l'image sont connues."""
+    if not meta or not meta.get("width") or not meta.get("height"):
+        return ""
+    return (f'\n    <meta property="og:image:width" content="{meta["width"]}" />'
+            f'\n    <meta property="og:image:height" content="{meta["height"]}" />')
+
+
+def product_json_ld(product, url):
+    """Données structurées schema.org/Product (balise <script> JSON-LD)."""
+    data = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": product.get('title', ''),
+        "description": product.get('short', ''),
+        "sku": str(product.get('id')),
+        "image": [absolute_url(img) for img in product.get('images') or [] if img],
+        "offers": {
+            "@type": "Offer",
+            "url": url,
+            "priceCurrency": "XAF",
+            "price": product.get('price'),
+            "availability": "https://schema.org/InStock" if (product.get('stock') or 0) > 0
+            else "https://schema.org/OutOfStock",
+        },
+    }
+    if product.get('category'):
+        data["category"] = product['category']
+    # éviter qu'un '</script>' dans un texte ne ferme la balise
+    return json.dumps(data, ensure_ascii=False).replace("</", "<\\/")
+
+
+class SitePlan:
+    """Pages à générer pour un catalogue et produits dont dépend chacune."""
+
+    def __init__(self, products, images=None, lowest_prices=None):
+        self.products = {p.get('id'): p for p in products}
+        # chemin d'image -> métadonnées du manifeste
+        self.images = images or {}
+        # id (str) -> prix le plus bas des 30 derniers jours, s'il diffère du prix actuel
+        self.lowest_prices = lowest_prices or {}
+        self.by_category = {}
+        for pid in sorted(self.products, key=lambda i: (i is None, i if isinstance(i, int) else 0, str(i))):
+            category = self.products[pid].get('category')
+            if category:
+                self.by_category.setdefault(category, []).append(pid)
+        self.categories = sorted(self.by_category, key=lambda c: (slugify(c), c))
+
+        # page -> (type, clé, ids dépendants)
+        self.pages = {}
+        # id produit -> pages qui l'affichent
+        self.reverse = {}
+        # page -> produits (ou catégories) au même slug, le premier seul a sa page
+        self.collisions = {}
+        for pid, product in self.products.items():
+            self._add_page(product_page_path(product), "product", pid,
+                           [pid] + self.similar_ids(product))
+        for category in self.categories:
+            self._add_page(category_page_path(category), "category", category,
+                           self.by_category[category][:CATEGORY_PAGE_LIMIT])
+
+    def _add_page(self, path, kind, key, deps):
+        if path in self.pages:
+            # deux produits avec le même slug : le premier garde la page, les autres
+            # sont signalés dans le rapport
+            self.collisions.setdefault(path, [self.pages[path][1]]).append(key)
+            return
+        self.pages[path] = (kind, key, deps)
+        for pid in deps:
+            self.reverse.setdefault(pid, set()).add(path)
+
+    def similar_ids(self, product):
+        pid = product.get('id')
+        same = self.by_category.get(product.get('category'), [])
+        return [other for other in same if other != pid][:SIMILAR_LIMIT]
+
+    def pages_for(self, product_ids):
+        """Pages qui affichent au moins un des produits donnés."""
+        pages = set()
+        for pid in product_ids:
+            pages |= self.reverse.get(pid, set())
+        return pages
+
+    def context(self, path):
+        kind, key, deps = self.pages[path]
+        if kind == "product":
+            return self._product_context(path, self.products[key], deps[1:])
+        return self._category_context(path, key, deps)
+
+    def _product_context(self, path, product, similar):
+        url = absolute_url(path)
+        images = [img for img in product.get('images') or [] if img]
+        image = images[0] if images else ""
+        return {
+            "id": product.get('id'),
+            "title": product.get('title') or "Produit",
+            "short": product.get('short', ''),
+            "url": url,
+            "og_image": absolute_url(image or DEFAULT_OG_IMAGE),
+            "og_image_meta": og_image_meta(self.images.get(image)) if image else "",
+            "availability": "in stock" if (product.get('stock') or 0) > 0 else "out of stock",
+            "price_amount": product.get('price'),
+            "price_text": format_price(product.get('price')),
+            "old_price_text": format_price(product.get('oldPrice')) if product.get('oldPrice') else "",
+            "lowest_price_text": self._lowest_price_text(product),
+            "main_image": ASSET_PREFIX + image if image else "",
+            "main_image_attrs": image_attrs(self.images.get(image)),
+            "images": [ASSET_PREFIX + img for img in images],
+            "description_html": product.get('description', ''),
+            "features": list(product.get('features') or []),
+            "similar": [card_context(self.products[pid], self.images) for pid in similar],
+            "json_ld": product_json_ld(product, url),
+        }
+
+    def _lowest_price_text(self, product):
+        """Mention du prix le plus bas sur 30 jours, seulement à côté d'un ancien prix."""
+        if not product.get('oldPrice'):
+            return ""
+        low = self.lowest_prices.get(str(product.get('id')), product.get('price'))
+        return f"Prix le plus bas des 30 derniers jours : {format_price(low)}"
+
+    def _category_context(self, path, category, shown):
+        first = next((first_image(self.products[pid]) for pid in shown if first_image(self.products[pid])), "")
+        return {
+            "category": category,
+            "description": f"Découvrez nos produits dans la catégorie « {category} ».",
+            "url": absolute_url(path),
+            "og_image": absolute_url(first or DEFAULT_OG_IMAGE),
+            "categories": [[c, category_page_path(c)[len("page/produit/"):]] for c in self.categories],
+            "cards": [card_context(self.products[pid], self.images) for pid in shown],
+        }
+
+
+def fingerprint(ctx):
+    return hashlib.sha1(json.dumps(ctx, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def render_page(kind, ctx, templates):
+    """HTML complet d'une page à partir de son contexte."""
+    if kind == "product":
+        alt = html.escape(ctx["title"])
+        thumbs = "".join(
+            f'<img src="{html.escape(src)}" alt="{alt}"{active} />'
+            for src, active in zip(ctx["images"], [' class="active"'] + [''] * len(ctx["images"]))
+        )
+        features = "".join(f"<li>{html.escape(f)}</li>" for f in ctx["features"])
+        similar = "".join(templates["similar"](c) for c in ctx["similar"]) \
+            or "<div class='muted'>Aucun produit similaire.</div>"
+        return templates["product"]({**ctx, "thumbs_html": thumbs, "features_html": features,
+                                     "similar_html": similar})
+    categories = "".join(
+        f'<li class="category-item"><a href="{html.escape(href)}">{html.escape(name)}</a></li>'
+        for name, href in ctx["categories"]
+    )
+    cards = "".join(templates["card"](c) for c in ctx["cards"])
+    return templates["category"]({**ctx, "categories_html": categories, "products_html": cards})
+
+
+def _write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _init_worker(template_dir):
+    load_templates(template_dir)
+
+
+def _render_task(task):
+    kind, ctx, out_path = task
+    _write_file(out_path, render_page(kind, ctx, _TEMPLATES))
+    return out_path
+
+
+def load_state(root="."):
+    try:
+        with open(os.path.join(root, STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"pages": {}, "categories": []}
+
+
+def save_state(state, root="."):
+    path = os.path.join(root, STATE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+
+
+def load_images(root="."):
+    """Métadonnées des images publiées (data/images.json), {} si absent."""
+    try:
+        with open(os.path.join(root, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f).get("images", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def load_lowest_prices(root="."):
+    """Prix les plus bas publiés (data/prix_30j.json), {} si absent."""
+    try:
+        with open(os.path.join(root, LOWEST_PRICES_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f).get("prices", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def build_site(products, changed_ids=None, root=".", workers=None, force=False, images=None,
+               lowest_prices=None):
+    """Générer les pages manquantes ou périmées.
+
+    changed_ids : ids des produits ajoutés, modifiés ou supprimés (ou dont une
+    image a changé) depuis la dernière génération ; None pour tout vérifier.
+    images : métadonnées des images ; par défaut celles du manifeste publié.
+    lowest_prices : prix les plus bas sur 30 jours ; par défaut ceux publiés.
+    Retourne {"rendered", "removed", "pages", "collisions"} ; collisions :
+    {page : ids (ou catégories) qui ont le même slug}, seul le premier a sa page.
+    """
+    if images is None:
+        images = load_images(root)
+    if lowest_prices is None:
+        lowest_prices = load_lowest_prices(root)
+    plan = SitePlan(products, images, lowest_prices)
+    state = load_state(root)
+    old_pages = state.get("pages", {})
+    template_dir = os.path.join(root, TEMPLATE_DIR)
+    digest = templates_digest(template_dir)
+    if state.get("templates") != digest:
+        force = True
+
+    if force or changed_ids is None or state.get("categories") != plan.categories:
+        candidates = set(plan.pages)
+    else:
+        changed = set(changed_ids)
+        candidates = plan.pages_for(changed)
+        # pages qui affichaient ces produits lors de la génération précédente
+        candidates |= {path for path, info in old_pages.items()
+                       if path in plan.pages and changed.intersection(info["deps"])}
+        candidates |= plan.pages.keys() - old_pages.keys()
+
+    pages_state = {path: info for path, info in old_pages.items() if path in plan.pages}
+    tasks = []
+    for path in candidates:
+        kind, _, deps = plan.pages[path]
+        ctx = plan.context(path)
+        fp = fingerprint(ctx)
+        out_path = os.path.join(root, path)
+        previous = old_pages.get(path)
+        if not force and previous and previous["fingerprint"] == fp and os.path.exists(out_path):
+            continue
+        tasks.append((kind, ctx, out_path))
+        pages_state[path] = {"deps": deps, "fingerprint": fp}
+
+    if len(tasks) >= PARALLEL_THRESHOLD and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(template_dir,)) as pool:
+            chunk = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            for _ in pool.map(_render_task, tasks, chunksize=chunk):
+                pass
+    else:
+        load_templates(template_dir)
+        for task in tasks:
+            _render_task(task)
+
+    removed = 0
+    for path in old_pages.keys() - plan.pages.keys():
+        try:
+            os.remove(os.path.join(root, path))
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    save_state({"pages": pages_state, "categories": plan.categories, "templates": digest}, root)
+    return {"rendered": len(tasks), "removed": removed, "pages": len(plan.pages),
+            "collisions": plan.collisions}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from catalog import Catalog
+
+    parser = argparse.ArgumentParser(description="Pré-rendu des pages produit et catégorie")
+    parser.add_argument("--force", action="store_true", help="tout régénérer")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus")
+    args = parser.parse_args()
+
+    catalog = Catalog()
+    catalog.load()
+    report = build_site(catalog.products, workers=args.workers, force=args.force)
+    print(f"{report['rendered']} page(s) générée(s), {report['removed']} supprimée(s), "
+          f"{report['pages']} au total")
+    for path, keys in sorted(report['collisions'].items()):
+        print(f"Slug en double : {path} garde {keys[0]!r}, sans page : "
+              f"{', '.join(repr(k) for k in keys[1:])}")
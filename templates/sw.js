@@ -0,0 +1,192 @@
+/* Service worker du site, produit par offline_cache.py (dist/sw.js) : modifier ce modèle,
+   pas le fichier publié. Le manifeste (version, révisions, limites) est inséré ci-dessous. */
+"use strict";
+
+const MANIFEST = /*@MANIFEST@*/null;
+
+const PREFIX = "tonga-";
+const PRECACHE = `${PREFIX}precache-${MANIFEST.version}`;
+const SHARDS = `${PREFIX}catalogue`;
+const IMAGES = `${PREFIX}images`;
+const PAGES = `${PREFIX}pages`;
+// révision de chaque réponse gardée, pour n'invalider que ce qui a changé
+const REVISION_HEADER = "x-tonga-revision";
+
+const BASE = new URL("./", self.location).href;
+const absolute = (path) => new URL(path, BASE).href;
+
+const PRECACHED = new Map(MANIFEST.precache.map(e => [absolute(e.url), e.revision]));
+const SHARD_REVISIONS = new Map(Object.entries(MANIFEST.shards).map(([p, r]) => [absolute(p), r]));
+const IMAGES_URL = absolute("data/images.json");
+const INDEX_PAGE = absolute("index.html");
+
+/* ---------------------
+   Utilitaires
+   --------------------- */
+
+/** Copie de la réponse portant sa révision (null si elle dépasse maxBytes). */
+async function withRevision(response, revision, maxBytes) {
+  const body = await response.blob();
+  if (maxBytes && body.size > maxBytes) return null;
+  const headers = new Headers(response.headers);
+  headers.set(REVISION_HEADER, revision || "");
+  return new Response(body, { status: response.status, statusText: response.statusText, headers });
+}
+
+/** Ne garder que les `limit` entrées les plus récentes d'un cache. */
+async function trim(cache, limit) {
+  const keys = await cache.keys();
+  for (const request of keys.slice(0, Math.max(0, keys.length - limit))) {
+    await cache.delete(request);
+  }
+}
+
+/** Retirer d'un cache les entrées dont la révision n'est plus celle attendue. */
+async function invalidate(name, expected) {
+  const cache = await caches.open(name);
+  for (const request of await cache.keys()) {
+    const response = await cache.match(request);
+    const revision = expected(request.url);
+    if (!response || !revision || response.headers.get(REVISION_HEADER) !== revision) {
+      await cache.delete(request);
+    }
+  }
+}
+
+// empreinte de chaque image du catalogue (data/images.json, pré-caché)
+let imageHashes = null;
+async function imageRevisions() {
+  if (!imageHashes) {
+    imageHashes = new Map();
+    const response = await caches.match(IMAGES_URL, { cacheName: PRECACHE });
+    if (response) {
+      try {
+        const manifest = await response.json();
+        for (const [path, meta] of Object.entries(manifest.images || {})) {
+          imageHashes.set(absolute(path), meta && meta.hash);
+        }
+      } catch (e) {
+        // manifeste illisible : images sans révision
+      }
+    }
+  }
+  return imageHashes;
+}
+
+/* ---------------------
+   Installation : seules les entrées modifiées sont téléchargées
+   --------------------- */
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(PRECACHE);
+    const previous = [];
+    for (const name of await caches.keys()) {
+      if (name.startsWith(`${PREFIX}precache-`) && name !== PRECACHE) previous.push(await caches.open(name));
+    }
+    await Promise.all([...PRECACHED].map(async ([url, revision]) => {
+      const cached = await cache.match(url);
+      if (cached && cached.headers.get(REVISION_HEADER) === revision) return;
+      for (const old of previous) {
+        const hit = await old.match(url);
+        if (hit && hit.headers.get(REVISION_HEADER) === revision) {
+          await cache.put(url, hit);
+          return;
+        }
+      }
+      const response = await fetch(url, { cache: "reload" });
+      if (!response.ok) throw new Error(`${url} : ${response.status}`);
+      await cache.put(url, await withRevision(response, revision));
+    }));
+    await self.skipWaiting();
+  })());
+});
+
+/* ---------------------
+   Activation : anciennes versions retirées, fragments et images modifiés invalidés
+   --------------------- */
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (name.startsWith(`${PREFIX}precache-`) && name !== PRECACHE) await caches.delete(name);
+    }
+    await invalidate(SHARDS, (url) => SHARD_REVISIONS.get(url));
+    imageHashes = null;
+    const hashes = await imageRevisions();
+    if (hashes.size) await invalidate(IMAGES, (url) => hashes.get(url));
+    await self.clients.claim();
+  })());
+});
+
+/* ---------------------
+   Requêtes
+   --------------------- */
+
+/** Pré-cache d'abord ; la requête n'est faite que si l'entrée manque. */
+async function fromPrecache(request, url) {
+  const hit = await caches.match(url, { cacheName: PRECACHE });
+  return hit || fetch(request);
+}
+
+/** Cache d'abord, si la révision de l'entrée est la bonne ; sinon réseau puis mise en cache. */
+async function cacheFirst(name, request, revision, limit, maxBytes) {
+  const cache = await caches.open(name);
+  const hit = await cache.match(request.url);
+  if (hit && (!revision || hit.headers.get(REVISION_HEADER) === revision)) return hit;
+  const response = await fetch(request);
+  if (response.ok && response.type === "basic") {
+    const stored = await withRevision(response.clone(), revision, maxBytes);
+    if (stored) {
+      await cache.put(request.url, stored);
+      await trim(cache, limit);
+    }
+  }
+  return response;
+}
+
+/** Réponse en cache tout de suite, mise à jour en arrière-plan ; index.html hors ligne. */
+async function staleWhileRevalidate(event, name, limit) {
+  const request = event.request;
+  const cache = await caches.open(name);
+  const hit = await cache.match(request);
+  const update = fetch(request).then(async (response) => {
+    if (response.ok && response.type === "basic") {
+      await cache.put(request, response.clone());
+      await trim(cache, limit);
+    }
+    return response;
+  });
+  if (hit) {
+    event.waitUntil(update.catch(() => {}));
+    return hit;
+  }
+  try {
+    return await update;
+  } catch (e) {
+    const fallback = request.mode === "navigate" && await caches.match(INDEX_PAGE, { cacheName: PRECACHE });
+    if (fallback) return fallback;
+    throw e;
+  }
+}
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET" || !request.url.startsWith(BASE)) return;
+  const location = new URL(request.url);
+  let url = location.origin + location.pathname;
+  if (url.endsWith("/")) url += "index.html";
+  const limits = MANIFEST.limits;
+
+  if (PRECACHED.has(url)) {
+    // pages principales : ?cat=, ?id=... sont lus par les scripts, la page est la même
+    event.respondWith(fromPrecache(request, url));
+  } else if (SHARD_REVISIONS.has(url)) {
+    event.respondWith(cacheFirst(SHARDS, request, SHARD_REVISIONS.get(url), limits.shards));
+  } else if (url.startsWith(absolute("img/"))) {
+    event.respondWith(imageRevisions().then(hashes =>
+      cacheFirst(IMAGES, request, hashes.get(url), limits.images, limits.imageBytes)));
+  } else if (request.mode === "navigate" || url.endsWith(".html") || url.startsWith(absolute("data/reviews/"))) {
+    event.respondWith(staleWhileRevalidate(event, PAGES, limits.pages));
+  }
+});
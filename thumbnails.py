@@ -0,0 +1,235 @@
+"""Vignettes des images produit dans le gestionnaire.
+
+Deux niveaux de cache :
+  - en mémoire, un LRU des PhotoImage Tk déjà affichées (clé : chemin, taille
+    et date de modification du fichier) ;
+  - sur disque (.cache/thumbs/), les vignettes PNG, nommées d'après
+    l'empreinte du contenu et la date de modification de l'original.
+
+Les originaux (souvent plusieurs Mo) sont lus, hachés et réduits dans un
+thread de fond ; le thread Tk ne fait que créer les PhotoImage à partir des
+petites vignettes. La réduction utilise Pillow (requirements.txt) ; s'il
+manque, seules les vignettes déjà en cache sont affichées, les autres images
+par leur nom seulement : l'original n'est jamais décodé dans le thread Tk.
+"""
+import base64
+import io
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+import tkinter as tk
+from tkinter import ttk
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow absent : vignettes déjà en cache seulement
+    Image = None
+
+from image_manifest import content_hash
+
+THUMB_DIR = ".cache/thumbs"
+THUMB_SIZE = 96
+MEMORY_SLOTS = 64
+POLL_MS = 40
+LABEL_CHARS = 14
+
+
+class ThumbnailStore:
+    """Cache disque des vignettes (sans Tk, utilisable depuis un thread)."""
+
+    def __init__(self, cache_dir=THUMB_DIR, size=THUMB_SIZE, manifest=None):
+        self.cache_dir = cache_dir
+        self.size = size
+        # manifeste des images : évite de re-hacher les fichiers déjà connus
+        self.manifest = manifest
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def key(self, path):
+        """Clé disque d'une image : empreinte du contenu et date de modification."""
+        st = os.stat(path)
+        stat_key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(stat_key)
+        if digest is None and self.manifest is not None:
+            known = self.manifest.files.get(path)
+            if known and known[:2] == [st.st_size, st.st_mtime_ns]:
+                digest = known[2]
+        if digest is None:
+            digest = content_hash(path)
+        with self._lock:
+            self._hashes[stat_key] = digest
+        return f"{digest}_{st.st_mtime_ns}"
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def load(self, path):
+        """Retourner (clé, octets PNG de la vignette).
+
+        Les octets valent None si la vignette n'est pas en cache et que
+        Pillow n'est pas disponible pour la calculer.
+        """
+        key = self.key(path)
+        try:
+            with open(self.cache_path(key), 'rb') as f:
+                return key, f.read()
+        except FileNotFoundError:
+            pass
+        if Image is None:
+            return key, None
+        with Image.open(path) as img:
+            # décodage JPEG à une résolution réduite : bien plus rapide
+            img.draft('RGB', (self.size * 2, self.size * 2))
+            img = img.convert('RGB' if img.mode in ('RGB', 'L', 'CMYK', 'YCbCr') else 'RGBA')
+            img.thumbnail((self.size, self.size))
+        buf = io.BytesIO()
+        img.save(buf, 'PNG', optimize=True)
+        data = buf.getvalue()
+        self.store(key, data)
+        return key, data
+
+    def store(self, key, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.cache_path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+class PhotoCache:
+    """LRU des PhotoImage Tk (les plus anciennes sont libérées au-delà de `slots`)."""
+
+    def __init__(self, slots=MEMORY_SLOTS):
+        self.slots = slots
+        self._items = OrderedDict()
+
+    def get(self, key):
+        photo = self._items.get(key)
+        if photo is not None:
+            self._items.move_to_end(key)
+        return photo
+
+    def put(self, key, photo):
+        self._items[key] = photo
+        self._items.move_to_end(key)
+        while len(self._items) > self.slots:
+            self._items.popitem(last=False)
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_size, st.st_mtime_ns)
+
+
+class ThumbnailStrip(ttk.Frame):
+    """Bande horizontale de vignettes, remplie en arrière-plan."""
+
+    def __init__(self, parent, store, on_click=None, on_double_click=None):
+        super().__init__(parent)
+        self.store = store
+        self.on_click = on_click
+        self.on_double_click = on_double_click
+        self.photos = PhotoCache()
+
+        self.canvas = tk.Canvas(self, height=THUMB_SIZE + 28, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self, orient='horizontal', command=self.canvas.xview)
+        self.canvas.configure(xscrollcommand=scrollbar.set)
+        self.canvas.pack(fill='x')
+        scrollbar.pack(fill='x')
+        self.inner = ttk.Frame(self.canvas)
+        self.canvas.create_window((0, 0), window=self.inner, anchor='nw')
+        self.inner.bind('<Configure>',
+                        lambda e: self.canvas.configure(scrollregion=self.canvas.bbox('all')))
+
+        self._labels = []
+        self._generation = 0
+        self._pending = 0
+        self._poll_job = None
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = None
+
+    def show(self, paths):
+        """Afficher les vignettes de ces images (les anciennes demandes sont abandonnées)."""
+        self._generation += 1
+        self._pending = 0
+        for label in self._labels:
+            label.destroy()
+        self._labels = []
+        for index, path in enumerate(paths):
+            name = os.path.basename(path)
+            if len(name) > LABEL_CHARS:
+                name = name[:LABEL_CHARS - 1] + "…"
+            label = ttk.Label(self.inner, text=name, compound='top', anchor='center',
+                              width=LABEL_CHARS, cursor='hand2')
+            label.grid(row=0, column=index, padx=3, pady=2)
+            label.bind('<Button-1>', lambda e, i=index: self.on_click and self.on_click(i))
+            label.bind('<Double-Button-1>',
+                       lambda e, i=index: self.on_double_click and self.on_double_click(i))
+            self._labels.append(label)
+
+            memory_key = _stat_key(path)
+            if memory_key is None:
+                label.configure(text="(introuvable)")
+                continue
+            photo = self.photos.get(memory_key)
+            if photo is not None:
+                label.configure(image=photo)
+            else:
+                self._request(index, path, memory_key)
+        if self._pending and self._poll_job is None:
+            self._poll_job = self.after(POLL_MS, self._poll)
+
+    def _request(self, index, path, memory_key):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+        self._pending += 1
+        self._requests.put((self._generation, index, path, memory_key))
+
+    def _work(self):
+        """Thread de fond : hachage, lecture du cache disque, réduction."""
+        while True:
+            generation, index, path, memory_key = self._requests.get()
+            if generation != self._generation:
+                # produit déjà quitté : inutile de décoder
+                self._results.put((generation, index, path, memory_key, None, None))
+                continue
+            try:
+                key, data = self.store.load(path)
+            except Exception:
+                key, data = None, None
+            self._results.put((generation, index, path, memory_key, key, data))
+
+    def _poll(self):
+        """Thread Tk : créer les PhotoImage des vignettes prêtes."""
+        self._poll_job = None
+        while True:
+            try:
+                generation, index, path, memory_key, key, data = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generation:
+                continue
+            self._pending -= 1
+            photo = self._make_photo(data)
+            if photo is not None:
+                self.photos.put(memory_key, photo)
+                self._labels[index].configure(image=photo)
+        if self._pending > 0:
+            self._poll_job = self.after(POLL_MS, self._poll)
+
+    def _make_photo(self, data):
+        if data is None:
+            return None
+        try:
+            return tk.PhotoImage(data=base64.b64encode(data).decode('ascii'))
+        except tk.TclError:
+            return None